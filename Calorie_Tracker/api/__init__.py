@@ -0,0 +1,18 @@
+"""Headless HTTP API over the backend, database and domain layers.
+
+Run it with `python -m api.server`; make_app is imported on first access so
+that running the server module doesn't import it twice.
+"""
+import importlib
+
+_EXPORTS = {
+    "make_app": ".server",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,371 @@
+"""Headless JSON API for mobile clients, served by Tornado.
+
+Requests are handled on the event loop; database access, password hashing and
+recognition run on a thread pool of API_WORKERS threads, separate from the
+Streamlit process and the recognition job queue. Clients authenticate with
+the same session tokens as the web app, sent as "Authorization: Bearer <token>".
+
+Run from the Calorie_Tracker directory:
+    python -m api.server --port 8600 --fake    # offline model with canned replies
+
+    curl -X POST localhost:8600/api/login -d '{"username": "u", "password": "p"}'
+    curl -X POST "localhost:8600/api/recognitions?method=automatic&save=1" \\
+         -H "Authorization: Bearer $TOKEN" --data-binary @meal.jpg
+
+Endpoints:
+    GET    /api/health
+    POST   /api/login               {"username", "password"} -> {"token", "user"}
+    POST   /api/logout
+    POST   /api/recognitions        raw image body; ?method=automatic|label|visual&save=0|1
+    GET    /api/entries             ?limit=10; entries with "archived": true are read-only
+    POST   /api/entries             {"food_name", "calories", ...} -> entry
+    PATCH  /api/entries/<id>        changed fields -> entry
+    DELETE /api/entries/<id>
+    GET    /api/metrics             weekly total, previous week and daily totals
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+import tornado.web
+
+from backend.latency import Deadline
+from database import CalorieRepository, DatabaseConnection, DatabaseSchema, get_database
+from domain import User
+from utils.auth import HashingPoolBusy, authenticate_user
+from utils.tokens import get_token_store
+from utils.tracing import bind, span
+
+API_WORKERS = int(os.getenv("API_WORKERS", "8"))
+API_PORT = int(os.getenv("API_PORT", "8600"))
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_ENTRIES_LIMIT = 200
+METHODS = ("automatic", "label", "visual")
+SOURCES = ("estimate", "label")
+MAX_ENTRY_ID = 2 ** 63 - 1  # SQLite integers are signed 64-bit
+
+
+class ApiError(tornado.web.HTTPError):
+    """An error reported to the client as {"error": message} with an HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        # kept off the reason phrase, which Tornado replaces with "Unknown" unless it is plain ASCII
+        super().__init__(status)
+        self.message = message
+
+
+_local = threading.local()
+
+
+def _worker_db() -> DatabaseConnection:
+    """One connection per API worker thread, like the job queue workers."""
+    if getattr(_local, "db", None) is None:
+        _local.db = DatabaseConnection(get_database().db_path)
+    return _local.db
+
+
+def _repository() -> CalorieRepository:
+    return CalorieRepository(_worker_db())
+
+
+def _processor():
+    if getattr(_local, "processor", None) is None:
+        from backend import ImageProcessor, RecognizerSelector
+        _local.processor = ImageProcessor(selector=RecognizerSelector(_worker_db()))
+    return _local.processor
+
+
+def _user_json(user: User) -> dict:
+    return {"id": user.id, "username": user.username, "email": user.email}
+
+
+def _entry_json(row) -> dict:
+    return dict(row)
+
+
+def _entry_id(text: str) -> int:
+    """The id from an entry URL; ids beyond what SQLite can store cannot exist."""
+    entry_id = int(text)
+    if entry_id > MAX_ENTRY_ID:
+        raise ApiError(404, "Entry not found")
+    return entry_id
+
+
+def _entry_fields(data: dict, creating: bool) -> dict:
+    """Validate an entry body; only editable columns (plus source and logged_at on create)."""
+    allowed = set(CalorieRepository.EDITABLE_COLUMNS)
+    if creating:
+        allowed |= {"source", "logged_at"}
+    unknown = set(data) - allowed
+    if unknown:
+        raise ApiError(400, f"Unknown or read-only fields: {', '.join(sorted(unknown))}")
+
+    fields = {}
+    for column, value in data.items():
+        if column in ("calories", "quantity"):
+            if value is None and column == "quantity":
+                fields[column] = None
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ApiError(400, f"{column} must be a finite, non-negative number")
+            try:
+                value = float(value)
+            except OverflowError:  # integers beyond float range
+                value = math.inf
+            # json.loads accepts NaN and Infinity; NaN < 0 is False, so check explicitly
+            if not math.isfinite(value) or value < 0:
+                raise ApiError(400, f"{column} must be a finite, non-negative number")
+            fields[column] = value
+        elif column == "source":
+            if value not in SOURCES:
+                raise ApiError(400, f"source must be one of {', '.join(SOURCES)}")
+            fields[column] = value
+        elif column == "logged_at":
+            try:
+                logged_at = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ApiError(400, "logged_at must be an ISO 8601 timestamp")
+            if logged_at.tzinfo is not None:
+                logged_at = logged_at.astimezone().replace(tzinfo=None)  # stored as local time
+            fields[column] = logged_at
+        elif value is not None and not isinstance(value, str):
+            raise ApiError(400, f"{column} must be a string")
+        else:
+            fields[column] = value.lower() if column == "food_type" and value else value
+
+    if "food_name" in fields and not fields["food_name"]:
+        raise ApiError(400, "food_name must not be empty")
+    if creating:
+        for required in ("food_name", "calories"):
+            if required not in fields:
+                raise ApiError(400, f"{required} is required")
+    return fields
+
+
+class ApiHandler(tornado.web.RequestHandler):
+    """Base handler: JSON in and out, token auth, blocking work on the API pool."""
+
+    requires_auth = True
+
+    def initialize(self, executor: ThreadPoolExecutor):
+        self.executor = executor
+        self.user: Optional[User] = None
+        self.token: Optional[str] = None
+
+    async def prepare(self):
+        if not self.requires_auth:
+            return
+        header = self.request.headers.get("Authorization", "")
+        scheme, _, token = header.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise ApiError(401, "Missing bearer token")
+        self.user = await self.run(get_token_store().validate, token.strip())
+        if self.user is None:
+            raise ApiError(401, "Invalid or expired token")
+        self.token = token.strip()
+
+    async def run(self, function, *args):
+        """Run blocking work on the API worker pool, keeping the current trace."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, bind(function), *args)
+
+    def json_body(self) -> dict:
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise ApiError(400, "Body is not valid JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Expected a JSON object")
+        return body
+
+    def send(self, data, status: int = 200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(data, default=str))
+
+    def int_argument(self, name: str, default: int, low: int, high: int) -> int:
+        try:
+            value = int(self.get_query_argument(name, str(default)))
+        except ValueError:
+            raise ApiError(400, f"{name} must be an integer")
+        return min(max(value, low), high)
+
+    def write_error(self, status_code: int, **kwargs):
+        error = kwargs.get("exc_info", (None, None, None))[1]
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": error.message if isinstance(error, ApiError) else self._reason}))
+
+
+class HealthHandler(ApiHandler):
+    requires_auth = False
+
+    def get(self):
+        self.send({"status": "ok"})
+
+
+class LoginHandler(ApiHandler):
+    requires_auth = False
+
+    async def post(self):
+        body = self.json_body()
+        username, password = body.get("username"), body.get("password")
+        if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+            raise ApiError(400, "username and password are required")
+        try:
+            user = await self.run(lambda: authenticate_user(username, password, _worker_db()))
+        except HashingPoolBusy:
+            raise ApiError(503, "The server is busy, please try again in a moment")
+        if user is None:
+            raise ApiError(401, "Invalid username or password")
+        token = await self.run(get_token_store().issue, user)
+        self.send({"token": token, "user": _user_json(user)})
+
+
+class LogoutHandler(ApiHandler):
+    async def post(self):
+        await self.run(get_token_store().revoke, self.token)
+        self.send({"status": "logged out"})
+
+
+class RecognitionsHandler(ApiHandler):
+    async def post(self):
+        method = self.get_query_argument("method", "automatic")
+        if method not in METHODS:
+            raise ApiError(400, f"method must be one of {', '.join(METHODS)}")
+        save = self.get_query_argument("save", "0").lower() in ("1", "true", "yes")
+        image_bytes = self.request.body
+        if not image_bytes:
+            raise ApiError(400, "Send the image as the request body")
+        if len(image_bytes) > MAX_IMAGE_BYTES:
+            raise ApiError(413, "Image is too large")
+
+        with span("api.recognition", user_id=self.user.id, method=method, image_bytes=len(image_bytes)):
+            result, saved = await self.run(self._recognize, image_bytes, method, save)
+        self.send({"result": result.to_dict(), "saved_entry_ids": saved})
+
+    def _recognize(self, image_bytes: bytes, method: str, save: bool):
+        from backend import ImageProcessor, get_image_store
+        if not ImageProcessor.validate_image(image_bytes):
+            raise ApiError(400, "Invalid image file")
+        processor = _processor()
+        deadline = Deadline.after()
+        if method == "label":
+            result = processor.label_recognizer.recognize(image_bytes, deadline)
+        elif method == "visual":
+            result = processor.visual_estimator.recognize(image_bytes, deadline)
+        else:
+            result = processor.process_image(image_bytes, deadline=deadline, user_id=self.user.id)
+
+        saved = []
+        if save and result.success and result.detected_items:
+            image_path = get_image_store().save(image_bytes)
+            entries = result.convert_calorie_entires(user_id=self.user.id, image_path=image_path)
+            with span("insert_entries", rows=len(entries)):
+                saved = _repository().insert_entries(entries)
+        return result, saved
+
+
+class EntriesHandler(ApiHandler):
+    async def get(self):
+        limit = self.int_argument("limit", 10, 1, MAX_ENTRIES_LIMIT)
+        rows = await self.run(lambda: _repository().recent_entries(self.user.id, limit))
+        self.send({"entries": [_entry_json(row) for row in rows]})
+
+    async def post(self):
+        fields = _entry_fields(self.json_body(), creating=True)
+        entry = {"user_id": self.user.id, "source": "estimate", **fields}
+        # the pages parse logged_at with microseconds, which isoformat() drops when they are zero
+        entry["logged_at"] = entry.get("logged_at", datetime.now()).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+        def create():
+            repository = _repository()
+            return repository.get_entry(self.user.id, repository.insert_entry(entry))
+        self.send(_entry_json(await self.run(create)), status=201)
+
+
+class EntryHandler(ApiHandler):
+    async def patch(self, entry_id: str):
+        entry_id = _entry_id(entry_id)
+        fields = _entry_fields(self.json_body(), creating=False)
+
+        def update():
+            repository = _repository()
+            if repository.get_entry(self.user.id, entry_id) is None:
+                return None
+            if fields:
+                repository.apply_changes(self.user.id, {entry_id: fields}, [])
+            return repository.get_entry(self.user.id, entry_id)
+        row = await self.run(update)
+        if row is None:
+            await self.not_found(entry_id)
+        self.send(_entry_json(row))
+
+    async def delete(self, entry_id: str):
+        entry_id = _entry_id(entry_id)
+        deleted = await self.run(lambda: _repository().apply_changes(self.user.id, {}, [entry_id]))
+        if not deleted:
+            await self.not_found(entry_id)
+        self.set_status(204)
+        self.finish()
+
+    async def not_found(self, entry_id: int):
+        """Raise 409 for an archived entry, which is listed but read-only, else 404."""
+        if await self.run(lambda: _repository().is_archived(self.user.id, entry_id)):
+            raise ApiError(409, "Archived entries are read-only")
+        raise ApiError(404, "Entry not found")
+
+
+class MetricsHandler(ApiHandler):
+    async def get(self):
+        summary = await self.run(lambda: _repository().weekly_summary(self.user.id))
+        self.send({
+            "weekly_total": summary["total"],
+            "previous_weekly_total": summary["previous_total"],
+            "daily": [{"day": row["day"], "calories": row["daily_total"]} for row in summary["daily"]],
+        })
+
+
+def make_app(executor: Optional[ThreadPoolExecutor] = None) -> tornado.web.Application:
+    """Build the API application; the executor defaults to API_WORKERS threads."""
+    executor = executor or ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+    args = {"executor": executor}
+    return tornado.web.Application([
+        (r"/api/health", HealthHandler, args),
+        (r"/api/login", LoginHandler, args),
+        (r"/api/logout", LogoutHandler, args),
+        (r"/api/recognitions", RecognitionsHandler, args),
+        (r"/api/entries", EntriesHandler, args),
+        (r"/api/entries/(\d+)", EntryHandler, args),
+        (r"/api/metrics", MetricsHandler, args),
+    ], max_body_size=MAX_IMAGE_BYTES + 1024)
+
+
+async def serve(port: int, workers: int):
+    app = make_app(ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api"))
+    app.listen(port)
+    print(f"Calorie API listening on http://localhost:{port} with {workers} workers")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the headless Calorie Tracker API.")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Threads for blocking work")
+    parser.add_argument("--db", default="calories.db", help="Path to the SQLite database")
+    parser.add_argument("--fake", action="store_true",
+                        help="Use the offline fake model (same as CALORIE_FAKE_GENAI=1)")
+    args = parser.parse_args()
+
+    if args.fake:
+        os.environ["CALORIE_FAKE_GENAI"] = "1"
+    DatabaseSchema.initialize_database(get_database(args.db))
+    asyncio.run(serve(args.port, args.workers))
+
+
+if __name__ == "__main__":
+    main()
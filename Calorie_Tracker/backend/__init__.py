@@ -1,4 +1,30 @@
-"""Backend module with image recognition and processing."""
-from .image_recognition import ImageProcessor, LabelRecognizer, VisualEstimator
+"""Backend module with image recognition and processing.
 
-__all__ = ["ImageProcessor", "LabelRecognizer", "VisualEstimator"]
+Names are imported from their submodules on first access, so importing the
+package stays cheap for pages that never touch image recognition.
+"""
+import importlib
+
+_EXPORTS = {
+    "ImageProcessor": ".image_recognition",
+    "GenAIRecognizer": ".image_recognition",
+    "LabelRecognizer": ".image_recognition",
+    "VisualEstimator": ".image_recognition",
+    "Deadline": ".latency",
+    "HedgePolicy": ".latency",
+    "RecognizerSelector": ".recognizer_selection",
+    "RecognitionJobQueue": ".recognition_jobs",
+    "get_job_queue": ".recognition_jobs",
+    "SimilarityIndex": ".similarity",
+    "get_similarity_index": ".similarity",
+    "ImageStore": ".image_store",
+    "get_image_store": ".image_store",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,139 @@
+"""Offline stand-in for google.genai.Client, for load tests and development.
+
+Enable with CALORIE_FAKE_GENAI=1. Replies are canned JSON chosen from the
+image bytes, so the same photo always gives the same items, after a simulated
+latency of CALORIE_FAKE_GENAI_LATENCY seconds (default 0.5) per request plus
+CALORIE_FAKE_GENAI_IMAGE_LATENCY (default 0.05) for every further image in a
+batched request. CALORIE_FAKE_GENAI_MODELS ("model=seconds,...") gives
+models their own latency, for exercising the model router.
+"""
+import hashlib
+import json
+import os
+import random
+import time
+from typing import Dict, Optional
+
+FAKE_LATENCY = float(os.getenv("CALORIE_FAKE_GENAI_LATENCY", "0.5"))
+FAKE_IMAGE_LATENCY = float(os.getenv("CALORIE_FAKE_GENAI_IMAGE_LATENCY", "0.05"))
+FAKE_MODEL_LATENCY = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (
+        pair.partition("=") for pair in os.getenv("CALORIE_FAKE_GENAI_MODELS", "").split(",") if "=" in pair
+    )
+}
+
+MENU = [
+    {"calories": 350, "food_name": "Oatmeal with berries", "food_type": "grain", "quantity": 1, "unit": "bowl"},
+    {"calories": 165, "food_name": "Grilled chicken breast", "food_type": "protein", "quantity": 100, "unit": "grams"},
+    {"calories": 95, "food_name": "Apple", "food_type": "fruit", "quantity": 1, "unit": "piece"},
+    {"calories": 210, "food_name": "Brown rice", "food_type": "grain", "quantity": 1, "unit": "cups"},
+    {"calories": 50, "food_name": "Steamed broccoli", "food_type": "vegetable", "quantity": 1, "unit": "cups"},
+    {"calories": 150, "food_name": "Greek yogurt", "food_type": "dairy", "quantity": 1, "unit": "cups"},
+]
+
+
+class FakeResponse:
+    """The part of a genai response the recognizers read."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModels:
+    """Implements models.generate_content with a simulated delay."""
+
+    def __init__(
+        self,
+        latency: float,
+        jitter: float,
+        failure_rate: float,
+        seed: Optional[int],
+        image_latency: float = FAKE_IMAGE_LATENCY,
+        slot_failure_rate: float = 0.0,
+        model_latency: Optional[Dict[str, float]] = None,
+        model_failure_rate: Optional[Dict[str, float]] = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.image_latency = image_latency
+        self.slot_failure_rate = slot_failure_rate  # share of images left out of batched replies
+        self.model_latency = FAKE_MODEL_LATENCY if model_latency is None else model_latency
+        self.model_failure_rate = model_failure_rate or {}
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.calls_by_model: Dict[str, int] = {}
+
+    def generate_content(self, model: str, contents: list, config=None) -> FakeResponse:
+        self.calls += 1
+        self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+        images = _images(contents)
+        latency = self.model_latency.get(model, self.latency)
+        delay = max(0.0, latency + self._random.uniform(-self.jitter, self.jitter))
+        delay += self.image_latency * max(0, len(images) - 1)
+        timeout = _timeout_seconds(config)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake model call timed out after {timeout:.1f} s")
+        time.sleep(delay)
+        if self._random.random() < self.model_failure_rate.get(model, self.failure_rate):
+            raise RuntimeError(f"Fake model call to {model} failed")
+
+        if len(images) == 1 and "results" not in _schema_properties(config):
+            return FakeResponse(json.dumps(_canned_result(images[0])))
+        return FakeResponse(json.dumps({
+            "results": [
+                {"image": number, **_canned_result(image_bytes)}
+                for number, image_bytes in enumerate(images, start=1)
+                if self._random.random() >= self.slot_failure_rate
+            ],
+        }))
+
+
+class FakeGenAIClient:
+    """Drop-in for genai.Client as far as the recognizers are concerned."""
+
+    def __init__(
+        self,
+        latency: float = FAKE_LATENCY,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+        image_latency: float = FAKE_IMAGE_LATENCY,
+        slot_failure_rate: float = 0.0,
+        model_latency: Optional[Dict[str, float]] = None,
+        model_failure_rate: Optional[Dict[str, float]] = None
+    ):
+        self.models = FakeModels(
+            latency, jitter, failure_rate, seed, image_latency, slot_failure_rate, model_latency, model_failure_rate
+        )
+
+
+def _timeout_seconds(config) -> Optional[float]:
+    http_options = getattr(config, "http_options", None)
+    timeout = getattr(http_options, "timeout", None)
+    return timeout / 1000 if timeout else None  # genai timeouts are milliseconds
+
+
+def _schema_properties(config) -> dict:
+    schema = getattr(config, "response_json_schema", None) or {}
+    return schema.get("properties", {})
+
+
+def _canned_result(image_bytes: bytes) -> dict:
+    digest = hashlib.sha256(image_bytes).digest()
+    items = [MENU[(digest[i] + i) % len(MENU)] for i in range(1 + digest[0] % 3)]
+    return {
+        "detected_items": items,
+        "estimated_calories": sum(item["calories"] for item in items),
+        "confidence_score": 0.5 + (digest[1] % 50) / 100,
+    }
+
+
+def _images(contents: list) -> list:
+    images = [
+        part.inline_data.data for part in contents
+        if getattr(part, "inline_data", None) is not None and part.inline_data.data
+    ]
+    return images or [b""]
@@ -1,163 +1,252 @@
-"""Image recognition module for calorie extraction."""
+"""Image recognition module for calorie extraction.
+
+google.genai and PIL are imported inside the methods that use them; both are
+slow to import and most page loads never recognize an image.
+"""
 from abc import ABC, abstractmethod
-from PIL import Image
-from domain import ImageRecognitionResult, FoodItemDetection
-from google import genai
-from google.genai import types
+from domain import ImageRecognitionResult
+from .latency import Deadline, HedgePolicy, call_with_deadline
+from .model_router import ModelRouter, RouteDecision, get_model_router, latency_key
+from .recognition_schema import (
+    BATCH_RESPONSE_SCHEMA,
+    PROMPTS,
+    RESPONSE_SCHEMA,
+    batch_prompt,
+    parse_batch_response,
+    parse_response,
+)
+from .recognizer_selection import CONFIDENCE_THRESHOLD, RecognizerSelector, classify_image, is_confident
+from utils.tracing import span
 import os
 import io
-import json
+import time
+from functools import partial
+from operator import attrgetter
+from typing import List, Optional, Sequence
+
+# most images packed into one batched request
+RECOGNITION_BATCH_SIZE = int(os.getenv("RECOGNITION_BATCH_SIZE", "8"))
+
+def create_client():
+    """genai client for the recognizers; CALORIE_FAKE_GENAI=1 selects the offline fake."""
+    if os.getenv("CALORIE_FAKE_GENAI", "").lower() in ("1", "true", "yes"):
+        from .fake_genai import FakeGenAIClient
+        return FakeGenAIClient()
+    from google import genai
+    return genai.Client(api_key=os.getenv("GOOGLE_AI_API_KEY"))
+
 
 # base method for the other types of img recognizers to inherit from
 class ImageRecognizer(ABC):
     """Abstract base class for image recognition strategies."""
     
     @abstractmethod
-    def recognize(self, image_bytes: bytes) -> ImageRecognitionResult:
-        """Recognize food in image and return result."""
+    def recognize(self, image_bytes: bytes, deadline: Optional[Deadline] = None) -> ImageRecognitionResult:
+        """Recognize food in image and return result, giving up at the deadline."""
         pass
 
 
-class LabelRecognizer(ImageRecognizer):
-    """Recognizes nutritional labels in images."""
-
-    def __init__(self):
-        self.client = genai.Client(api_key=os.getenv("GOOGLE_AI_API_KEY"))
-            
-    def recognize(self, image_bytes: bytes) -> ImageRecognitionResult:
+class GenAIRecognizer(ImageRecognizer):
+    """Sends the image with a method-specific prompt and the shared response schema."""
+    
+    method: str = None  # also selects the prompt in recognition_schema.PROMPTS
+    
+    def __init__(self, hedge_policy: Optional[HedgePolicy] = None, router: Optional[ModelRouter] = None):
+        self.client = create_client()
+        self.hedge_policy = hedge_policy or HedgePolicy()
+        self.router = router or get_model_router()
+    
+    def recognize(self, image_bytes: bytes, deadline: Optional[Deadline] = None) -> ImageRecognitionResult:
         """
-        Attempt to extract calorie information from a nutritional label.
+        Recognize food in an image.
         
         Args:
             image_bytes: Raw image bytes
+            deadline: When to give up; defaults to RECOGNITION_TIMEOUT from now
             
         Returns:
-            ImageRecognitionResult with extracted calories
+            ImageRecognitionResult; success is False if the call or the reply failed
         """
-        try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[
-                    """Analyze this food label and respond in this exact JSON format, no other text:
-                    {
-                        "detected_items": [
-                            {
-                                "calories": 350,
-                                "food_name": "Grilled Chicken Breast",
-                                "food_type": "protein",
-                                "quantity": 1,
-                                "unit": "serving",
-                                "source": "estimation",
-                                "notes": "Approximately 200g, lightly seasoned"
-                            }
-                        ],
-                        "estimated_calories": 500,
-                        "confidence_score": 0.8
-                    }""",
-                    types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
-                ])
-
-            # cleaning the response because sometimes there's symbols indicating it's a code block 
-            # returned from AI response
-            raw = response.text.strip()
-            if raw.startswith("```"):
-                raw = raw.split("```")[1]
-                if raw.startswith("json"):
-                    raw = raw[4:]
-            data = json.loads(raw.strip())
-            
-            result = ImageRecognitionResult(
-                success=True,
-                method="label_recognition",
-                detected_items=[FoodItemDetection(**item) for item in data["detected_items"]],
-                estimated_calories=data["estimated_calories"],
-                confidence_score=data["confidence_score"]
-            )
-            return result
-        
-        except Exception as e:
-            return ImageRecognitionResult(
-                success=False,
-                method="label_recognition",
-                detected_items=[],
-                error_message=str(e)
-            )
-
-
-class VisualEstimator(ImageRecognizer):
-    """Estimates calories based on visual food detection and generic formulas."""
-    def __init__(self):
-        self.client = genai.Client(api_key=os.getenv("GOOGLE_AI_API_KEY"))
+        deadline = deadline or Deadline.after()
+        with span(f"recognize.{self.method}", image_bytes=len(image_bytes)) as current:
+            decision = self._route([image_bytes], deadline)
+            current.set(model=decision.model, difficulty=decision.difficulty)
+            started = time.monotonic()
+            try:
+                response = call_with_deadline(
+                    latency_key(self.method, decision.model),
+                    lambda timeout: self._generate(image_bytes, decision.model, timeout),
+                    deadline,
+                    self.hedge_policy
+                )
+                with span("parse_response"):
+                    items, estimated_calories, confidence_score = parse_response(response.text)
+                self.router.record(decision, time.monotonic() - started)
+                current.set(items=len(items), confidence=confidence_score)
+                return self._result(items, estimated_calories, confidence_score)
             
-    def recognize(self, image_bytes: bytes) -> ImageRecognitionResult:
+            except Exception as e:
+                self.router.record(decision, time.monotonic() - started, e)
+                current.set(error=str(e) or type(e).__name__)
+                return self._failure(e)
+    
+    def recognize_batch(
+        self,
+        images: Sequence[bytes],
+        deadline: Optional[Deadline] = None,
+        batch_size: int = RECOGNITION_BATCH_SIZE
+    ) -> List[ImageRecognitionResult]:
         """
-        Estimate calories based on detected food items.
+        Recognize several images, up to batch_size of them per model request.
+        
+        One request carries the prompt once for all its images, so a batch costs
+        fewer round trips and prompt tokens than recognizing the images one by
+        one, but no result is ready before the whole request is. Images the
+        reply has no usable result for (or all of them, if the request fails)
+        are retried one at a time.
         
         Args:
-            image_bytes: Raw image bytes
+            images: Raw image bytes
+            deadline: Shared by every request and retry; defaults to RECOGNITION_TIMEOUT from now
+            batch_size: Most images per request
             
         Returns:
-            ImageRecognitionResult with estimated calories
+            One ImageRecognitionResult per image, in order
         """
-        try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
+        deadline = deadline or Deadline.after()
+        results: List[Optional[ImageRecognitionResult]] = [None] * len(images)
+        with span(f"recognize_batch.{self.method}", images=len(images)) as current:
+            retries = []
+            for start in range(0, len(images), max(1, batch_size)):
+                chunk = images[start:start + max(1, batch_size)]
+                if len(chunk) == 1:
+                    retries.append(start)
+                    continue
+                decision = self._route(chunk, deadline)
+                started = time.monotonic()
+                try:
+                    response = call_with_deadline(
+                        latency_key(self.method, decision.model, batch=True),
+                        lambda timeout, chunk=chunk, model=decision.model: self._generate_batch(chunk, model, timeout),
+                        deadline,
+                        self.hedge_policy
+                    )
+                    with span("parse_batch_response"):
+                        slots = parse_batch_response(response.text, len(chunk))
+                    self.router.record(decision, time.monotonic() - started)
+                except Exception as e:
+                    self.router.record(decision, time.monotonic() - started, e)
+                    current.set(error=str(e) or type(e).__name__)
+                    slots = [e] * len(chunk)
+                for position, slot in enumerate(slots, start=start):
+                    if isinstance(slot, Exception):
+                        results[position] = self._failure(slot)
+                        retries.append(position)
+                    else:
+                        results[position] = self._result(*slot)
+            
+            current.set(retried=len(retries))
+            for position in retries:
+                if results[position] is not None and deadline.expired():
+                    continue  # keep the batch's error
+                results[position] = self.recognize(images[position], deadline)
+        return results
+    
+    def _route(self, images: Sequence[bytes], deadline: Deadline) -> RouteDecision:
+        with span("route_model", images=len(images)) as current:
+            decision = self.router.route(self.method, images, deadline.remaining())
+            current.set(model=decision.model, reason=decision.reason)
+            return decision
+    
+    def _result(self, items, estimated_calories, confidence_score) -> ImageRecognitionResult:
+        return ImageRecognitionResult(
+            success=True,
+            method=self.method,
+            detected_items=items,
+            estimated_calories=estimated_calories,
+            confidence_score=confidence_score
+        )
+    
+    def _failure(self, error: Exception) -> ImageRecognitionResult:
+        return ImageRecognitionResult(
+            success=False,
+            method=self.method,
+            detected_items=[],
+            error_message=str(error) or type(error).__name__
+        )
+    
+    def _generate(self, image_bytes: bytes, model: str, timeout: float):
+        from google.genai import types
+        with span("generate_content", model=model, timeout=round(timeout, 3)):
+            return self.client.models.generate_content(
+                model=model,
                 contents=[
-                    """Analyze this food image and respond in this exact JSON format, no other text:
-                    {
-                        "detected_items": [
-                            {
-                                "calories": 350,
-                                "food_name": "Grilled Chicken Breast",
-                                "food_type": "protein",
-                                "quantity": 1,
-                                "unit": "serving",
-                                "source": "estimation",
-                                "notes": "Approximately 200g, lightly seasoned"
-                            }
-                        ],
-                        "estimated_calories": 500,
-                        "confidence_score": 0.8
-                    }""",
+                    PROMPTS[self.method],
                     types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
-                ])
-            
-            raw = response.text.strip()
-            if raw.startswith("```"):
-                raw = raw.split("```")[1]
-                if raw.startswith("json"):
-                    raw = raw[4:]
-            data = json.loads(raw.strip())
+                ],
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_json_schema=RESPONSE_SCHEMA,
+                    http_options=types.HttpOptions(timeout=max(1, int(timeout * 1000)))  # milliseconds
+                ))
+    
+    def _generate_batch(self, images: Sequence[bytes], model: str, timeout: float):
+        from google.genai import types
+        contents = [batch_prompt(self.method, len(images))]
+        for number, image_bytes in enumerate(images, start=1):
+            contents += [f"Image {number}:", types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg")]
+        with span("generate_content", model=model, images=len(images), timeout=round(timeout, 3)):
+            return self.client.models.generate_content(
+                model=model,
+                contents=contents,
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_json_schema=BATCH_RESPONSE_SCHEMA,
+                    http_options=types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+                ))
+
+
+class LabelRecognizer(GenAIRecognizer):
+    """Recognizes nutritional labels in images."""
+    
+    method = "label_recognition"
+
+
+class VisualEstimator(GenAIRecognizer):
+    """Estimates calories based on visual food detection and generic formulas."""
+    
+    method = "visual_estimation"
+
+
+def _result_quality(result: ImageRecognitionResult) -> tuple:
+    """Sort key for picking the better of two results; earlier results win ties."""
+    return (result.success, bool(result.detected_items), result.confidence_score or 0.0)
 
-            result = ImageRecognitionResult(
-                success=True,
-                method="visual_estimation",
-                detected_items=[FoodItemDetection(**item) for item in data["detected_items"]],
-                estimated_calories=data["estimated_calories"],
-                confidence_score=data["confidence_score"]
-                )
-            return result
-        
-        except Exception as e:
-            return ImageRecognitionResult(
-                success=False,
-                method="visual_estimation",
-                detected_items=[],
-                error_message=str(e)
-            )
-            
 
 class ImageProcessor:
     """Main processor for image-based calorie extraction."""
     
-    def __init__(self):
-        self.label_recognizer = LabelRecognizer()
-        self.visual_estimator = VisualEstimator()
+    def __init__(
+        self,
+        hedge_policy: Optional[HedgePolicy] = None,
+        selector: Optional[RecognizerSelector] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        self.label_recognizer = LabelRecognizer(hedge_policy, router)
+        self.visual_estimator = VisualEstimator(hedge_policy, router)
+        self.selector = selector  # without one, automatic mode tries the label recognizer first
+    
+    @property
+    def threshold(self) -> float:
+        """Confidence at which automatic mode stops; the selector scores outcomes by the same rule."""
+        return self.selector.threshold if self.selector is not None else CONFIDENCE_THRESHOLD
     
     def process_image(
         self,
         image_bytes: bytes,
-        prefer_method: str = None
+        prefer_method: str = None,
+        deadline: Optional[Deadline] = None,
+        user_id: Optional[int] = None
     ) -> ImageRecognitionResult:
         """
         Process image to extract or estimate calories.
@@ -165,39 +254,117 @@ class ImageProcessor:
         Args:
             image_bytes: Raw image bytes
             prefer_method: Preferred method ("label" or "visual"), tries preferred first
+            deadline: Shared by the first attempt and the fallback; defaults to RECOGNITION_TIMEOUT
+            user_id: Owner of the image, used by the selector to pick the first recognizer
             
         Returns:
             ImageRecognitionResult
         """
+        deadline = deadline or Deadline.after()
         # Try preferred method first if specified
         if prefer_method == "label":
-            result = self.label_recognizer.recognize(image_bytes)
-            if result.success:
+            result = self.label_recognizer.recognize(image_bytes, deadline)
+            if result.success or deadline.expired():
                 return result
             # Fall back to visual estimation
-            return self.visual_estimator.recognize(image_bytes)
+            return self.visual_estimator.recognize(image_bytes, deadline)
         
         elif prefer_method == "visual":
-            result = self.visual_estimator.recognize(image_bytes)
-            if result.success:
+            result = self.visual_estimator.recognize(image_bytes, deadline)
+            if result.success or deadline.expired():
                 return result
             # Fall back to label recognition
-            return self.label_recognizer.recognize(image_bytes)
+            return self.label_recognizer.recognize(image_bytes, deadline)
+        
+        # Automatic: the second recognizer only runs if the first isn't confident
+        image_kind = None
+        recognizers = [self.label_recognizer, self.visual_estimator]
+        if self.selector is not None:
+            with span("classify_image"):
+                image_kind = classify_image(image_bytes)
+            order = self.selector.order(user_id, image_kind)
+            recognizers.sort(key=lambda recognizer: order.index(recognizer.method))
         
-        # Try both methods and return best result
-        label_result = self.label_recognizer.recognize(image_bytes)
-        visual_result = self.visual_estimator.recognize(image_bytes)
+        results = []
+        for recognizer in recognizers:
+            started = time.monotonic()
+            result = recognizer.recognize(image_bytes, deadline)
+            if self.selector is not None:
+                self.selector.record(user_id, image_kind, result, time.monotonic() - started)
+            results.append(result)
+            if is_confident(result, self.threshold) or deadline.expired():
+                break
+        return max(results, key=_result_quality)
+    
+    def process_batch(
+        self,
+        images: Sequence[bytes],
+        prefer_method: str = None,
+        deadline: Optional[Deadline] = None,
+        user_id: Optional[int] = None
+    ) -> List[ImageRecognitionResult]:
+        """
+        process_image for several images, with batched requests.
+        
+        Each image's first recognizer is chosen as in process_image, and the
+        images that share one are recognized together; the images that need
+        their second recognizer are then batched the same way.
+        
+        Returns:
+            One ImageRecognitionResult per image, in order
+        """
+        deadline = deadline or Deadline.after()
+        pairs = {
+            "label": (self.label_recognizer, self.visual_estimator),
+            "visual": (self.visual_estimator, self.label_recognizer),
+        }
+        if prefer_method in pairs:
+            orders = [pairs[prefer_method]] * len(images)
+            image_kinds = [None] * len(images)
+            done = attrgetter("success")
+        else:
+            image_kinds, orders = [], []
+            for image_bytes in images:
+                recognizers = [self.label_recognizer, self.visual_estimator]
+                image_kind = None
+                if self.selector is not None:
+                    with span("classify_image"):
+                        image_kind = classify_image(image_bytes)
+                    order = self.selector.order(user_id, image_kind)
+                    recognizers.sort(key=lambda recognizer: order.index(recognizer.method))
+                image_kinds.append(image_kind)
+                orders.append(recognizers)
+            done = partial(is_confident, threshold=self.threshold)
         
-        # Prefer label recognition if successful
-        if label_result.success:
-            return label_result
-        return visual_result
+        results: List[List[ImageRecognitionResult]] = [[] for _ in images]
+        pending = list(range(len(images)))
+        for attempt in range(2):
+            for recognizer in (self.label_recognizer, self.visual_estimator):
+                group = [position for position in pending if orders[position][attempt] is recognizer]
+                if not group:
+                    continue
+                started = time.monotonic()
+                batch = recognizer.recognize_batch([images[position] for position in group], deadline)
+                # a batch's latency is shared by its images
+                latency = (time.monotonic() - started) / len(group)
+                for position, result in zip(group, batch):
+                    if self.selector is not None and prefer_method not in pairs:
+                        self.selector.record(user_id, image_kinds[position], result, latency)
+                    results[position].append(result)
+            if deadline.expired():
+                break
+            pending = [position for position in pending if not done(results[position][-1])]
+        return [max(attempts, key=_result_quality) for attempts in results]
     
-    def validate_image(self, image_bytes: bytes) -> bool:
+    @staticmethod
+    def validate_image(image_bytes: bytes) -> bool:
         """Validate that bytes contain a valid image."""
-        try:
-            image = Image.open(io.BytesIO(image_bytes))
-            image.verify()
-            return True
-        except Exception:
-            return False
+        from PIL import Image
+        with span("validate_image", image_bytes=len(image_bytes)) as current:
+            try:
+                image = Image.open(io.BytesIO(image_bytes))
+                image.verify()
+                return True
+            except Exception:
+                current.set(valid=False)
+                return False
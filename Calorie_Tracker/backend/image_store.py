@@ -0,0 +1,168 @@
+"""Content-addressed on-disk store for uploaded food images.
+
+Images are saved as <root>/<first two hex digits>/<sha256>.<ext>, so uploading
+the same photo twice stores it once. A small thumbnail is written next to each
+image at save time. Run from the Calorie_Tracker directory to remove images
+that no calorie entry or recent job references:
+    python -m backend.image_store --gc
+"""
+import argparse
+import base64
+import hashlib
+import io
+import mmap
+import os
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from database import DatabaseConnection, get_database
+
+IMAGE_DIR = os.getenv("CALORIE_IMAGE_DIR", "images")
+THUMBNAIL_SIZE = (160, 160)
+GC_GRACE_PERIOD = timedelta(hours=1)  # never collect files younger than this
+JOB_RETENTION = timedelta(days=1)  # finished jobs keep their image for review this long
+
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+
+@lru_cache(maxsize=None)
+def _thumbnail_format() -> Tuple[str, str, str]:
+    """(PIL format, file suffix, MIME type) for thumbnails; imports PIL on first use."""
+    from PIL import features
+    if features.check("webp"):
+        return "WEBP", ".thumb.webp", "image/webp"
+    return "JPEG", ".thumb.jpg", "image/jpeg"
+
+
+class ImageStore:
+    """Saves images by content hash and serves thumbnails via memory-mapped reads."""
+
+    def __init__(self, root: str = IMAGE_DIR):
+        self.root = root
+
+    def save(self, image_bytes: bytes) -> str:
+        """
+        Store an image and its thumbnail if not already present.
+
+        Returns:
+            Path relative to the store root, suitable for calories.image_path
+        """
+        from PIL import Image
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        image = Image.open(io.BytesIO(image_bytes))
+        extension = EXTENSIONS.get(image.format, "img")
+        image_path = f"{digest[:2]}/{digest}.{extension}"
+
+        full_path = self._full_path(image_path)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            self._write_atomic(full_path, image_bytes)
+        if not os.path.exists(self._full_path(self.thumbnail_path(image_path))):
+            self._write_thumbnail(image, image_path)
+        return image_path
+
+    @staticmethod
+    def thumbnail_path(image_path: str) -> str:
+        """Relative thumbnail path for a stored image."""
+        return os.path.splitext(image_path)[0] + _thumbnail_format()[1]
+
+    def read_image(self, image_path: str) -> Optional[bytes]:
+        """Read a full-size image, or None if it is missing."""
+        try:
+            with open(self._full_path(image_path), "rb") as image_file:
+                return image_file.read()
+        except FileNotFoundError:
+            return None
+
+    def thumbnail_data_uri(self, image_path: Optional[str]) -> Optional[str]:
+        """Thumbnail as a data URI for st.column_config.ImageColumn, read via mmap."""
+        if not image_path:
+            return None
+        try:
+            with open(self._full_path(self.thumbnail_path(image_path)), "rb") as thumb_file:
+                with mmap.mmap(thumb_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    encoded = base64.b64encode(mapped).decode("ascii")
+        except (FileNotFoundError, ValueError):
+            return None
+        return f"data:{_thumbnail_format()[2]};base64,{encoded}"
+
+    def collect_garbage(self, db: Optional[DatabaseConnection] = None) -> int:
+        """Delete stored images (and thumbnails) that no row references. Returns files removed."""
+        db = db or get_database()
+        referenced = {
+            row[0] for row in db.fetch_all(
+                # archived entries keep their images too
+                "SELECT DISTINCT image_path FROM all_calories WHERE image_path IS NOT NULL"
+            )
+        }
+        referenced.update(
+            row[0] for row in db.fetch_all(
+                """
+                SELECT DISTINCT image_path FROM recognition_jobs
+                WHERE image_path IS NOT NULL
+                  AND (status IN ('queued', 'running') OR finished_at >= ?)
+                """,
+                (datetime.now() - JOB_RETENTION,)
+            )
+        )
+        keep = referenced | {self.thumbnail_path(path) for path in referenced}
+
+        removed = 0
+        cutoff = time.time() - GC_GRACE_PERIOD.total_seconds()
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                full_path = os.path.join(directory, name)
+                relative = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                if relative in keep or os.path.getmtime(full_path) > cutoff:
+                    continue
+                os.remove(full_path)
+                removed += 1
+        return removed
+
+    def _full_path(self, image_path: str) -> str:
+        return os.path.join(self.root, image_path)
+
+    def _write_thumbnail(self, image, image_path: str):
+        from PIL import ImageOps
+        thumbnail = ImageOps.exif_transpose(image).convert("RGB")
+        thumbnail.thumbnail(THUMBNAIL_SIZE)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format=_thumbnail_format()[0], quality=70)
+        self._write_atomic(self._full_path(self.thumbnail_path(image_path)), buffer.getvalue())
+
+    @staticmethod
+    def _write_atomic(full_path: str, data: bytes):
+        # concurrent uploads of the same image race to the same name; the rename is atomic
+        temp_path = f"{full_path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(temp_path, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, full_path)
+
+
+# Global image store instance
+_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    """Get global image store instance."""
+    global _store
+    if _store is None:
+        _store = ImageStore()
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the image store.")
+    parser.add_argument("--gc", action="store_true", help="Delete unreferenced images")
+    parser.add_argument("--db", default="calories.db", help="Path to the SQLite database")
+    args = parser.parse_args()
+
+    if args.gc:
+        removed = get_image_store().collect_garbage(get_database(args.db))
+        print(f"Removed {removed} unreferenced files from {IMAGE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Deadlines, per-method latency histograms and hedged model calls.
+
+Every recognition carries a Deadline; the remaining time becomes the HTTP
+timeout of each model call. With hedging enabled (RECOGNITION_HEDGE=1), a call
+still running after the RECOGNITION_HEDGE_PERCENTILE latency of its method is
+duplicated and whichever reply arrives first wins.
+"""
+import bisect
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from utils.tracing import bind
+
+RECOGNITION_TIMEOUT = float(os.getenv("RECOGNITION_TIMEOUT", "60"))
+HEDGE_ENABLED = os.getenv("RECOGNITION_HEDGE", "").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("RECOGNITION_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = 20  # don't hedge until the histogram has this many calls
+HEDGE_WORKERS = int(os.getenv("RECOGNITION_HEDGE_WORKERS", "8"))
+
+# log-spaced bucket upper bounds from 50 ms to ~2 minutes
+BUCKETS = [0.05 * 1.25 ** i for i in range(36)]
+HISTOGRAM_WINDOW = 1000  # counts are halved past this, so old calls fade out
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call cannot finish before its deadline."""
+
+
+class Deadline:
+    """Absolute point in time (monotonic clock) by which work must finish."""
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float = RECOGNITION_TIMEOUT) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self):
+        """Raise DeadlineExceeded if no time is left."""
+        if self.expired():
+            raise DeadlineExceeded("Recognition deadline exceeded")
+
+
+class LatencyHistogram:
+    """Thread-safe latency histogram weighted towards recent calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: List[float] = [0.0] * (len(BUCKETS) + 1)
+        self._total = 0.0
+        self.calls = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+            self._total += 1
+            self.calls += 1
+            if self._total > HISTOGRAM_WINDOW:
+                self._counts = [count / 2 for count in self._counts]
+                self._total /= 2
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given percentile, or None if empty."""
+        with self._lock:
+            if not self._total:
+                return None
+            target = self._total * percent / 100
+            running = 0.0
+            for index, count in enumerate(self._counts):
+                running += count
+                if running >= target:
+                    return BUCKETS[min(index, len(BUCKETS) - 1)]
+            return BUCKETS[-1]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "calls": self.calls,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def get_latency_histogram(method: str) -> LatencyHistogram:
+    """Get the process-wide histogram for a recognition method."""
+    with _histograms_lock:
+        if method not in _histograms:
+            _histograms[method] = LatencyHistogram()
+        return _histograms[method]
+
+
+def latency_summary() -> Dict[str, dict]:
+    """Percentiles for every method seen so far."""
+    with _histograms_lock:
+        methods = dict(_histograms)
+    return {method: histogram.summary() for method, histogram in methods.items()}
+
+
+class HedgePolicy:
+    """Decides when a slow call gets a duplicate."""
+
+    def __init__(
+        self,
+        enabled: bool = HEDGE_ENABLED,
+        percentile: float = HEDGE_PERCENTILE,
+        min_samples: int = HEDGE_MIN_SAMPLES
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+
+    def hedge_after(self, method: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None to never hedge."""
+        if not self.enabled:
+            return None
+        histogram = get_latency_histogram(method)
+        if histogram.calls < self.min_samples:
+            return None
+        return histogram.percentile(self.percentile)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        return _executor
+
+
+def call_with_deadline(
+    method: str,
+    call: Callable[[float], T],
+    deadline: Deadline,
+    policy: Optional[HedgePolicy] = None
+) -> T:
+    """
+    Run call(timeout_seconds) within the deadline, hedging it if the policy says so.
+
+    The call receives the time it has left and must pass it on as its own
+    timeout. Successful call latencies are recorded in the method's histogram.
+
+    Raises:
+        DeadlineExceeded: if no attempt finished in time
+        Exception: the primary attempt's error if every attempt failed
+    """
+    deadline.check()
+    hedge_after = (policy or HedgePolicy()).hedge_after(method)
+    histogram = get_latency_histogram(method)
+
+    def timed():
+        started = time.monotonic()
+        response = call(deadline.remaining())
+        histogram.record(time.monotonic() - started)
+        return response
+
+    if hedge_after is None or hedge_after >= deadline.remaining():
+        return timed()
+
+    executor = _get_executor()
+    timed = bind(timed)  # keep the caller's trace on the hedge threads
+    attempts = [executor.submit(timed)]
+    done, _ = wait(attempts, timeout=hedge_after)
+    if not done and not deadline.expired():
+        attempts.append(executor.submit(timed))
+
+    pending = set(attempts)
+    while pending:
+        done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                # the slower attempt is left to finish; its HTTP timeout bounds it
+                return future.result()
+    if all(future.done() for future in attempts):
+        raise attempts[0].exception()
+    raise DeadlineExceeded(f"{method} did not finish before the deadline")
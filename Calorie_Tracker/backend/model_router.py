@@ -0,0 +1,199 @@
+"""Chooses the model for each recognition request.
+
+RECOGNITION_MODELS lists the models to use, cheapest and fastest first. A
+request starts at the tier its image calls for: label-like shots go to the
+first model, ordinary plates to the middle one and cluttered plates (as many
+edges as printed text, but colorful) to the last; a batch goes by its hardest
+image. From there the router steps down to faster models while a model's
+recent p90 latency does not fit the time the request has left, and passes over
+models whose recent calls mostly failed.
+
+Latency comes from the per-method, per-model histograms call_with_deadline
+keeps; errors are counted here. Every call is also recorded in model_routes
+with the decision, its reason and the outcome. With CALORIE_FAKE_GENAI=1 the
+models are simulated offline (see fake_genai).
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+from database import DatabaseConnection, get_database
+from .latency import get_latency_histogram
+from .recognizer_selection import EDGE_THRESHOLD, classify_features, image_features
+
+DEFAULT_MODELS = "gemini-2.5-flash-lite,gemini-2.5-flash,gemini-2.5-pro"
+RECOGNITION_MODELS = [
+    model.strip() for model in os.getenv("RECOGNITION_MODELS", DEFAULT_MODELS).split(",") if model.strip()
+]
+CLUTTER_THRESHOLD = EDGE_THRESHOLD  # mean edge strength of a cluttered plate
+LATENCY_PERCENTILE = 90
+MIN_LATENCY_SAMPLES = 10  # until a model has this many calls it is assumed to fit any budget
+ERROR_WINDOW = 20  # most recent calls per model counted for its error rate
+ERROR_MEMORY = 120.0  # seconds; older failures are forgotten, so a failing model gets retried
+MIN_ERROR_SAMPLES = 5
+MAX_ERROR_RATE = float(os.getenv("RECOGNITION_MAX_ERROR_RATE", "0.5"))
+
+DIFFICULTIES = ("easy", "normal", "hard")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouteDecision:
+    """The model picked for one request, and why."""
+
+    method: str
+    model: str
+    difficulty: str
+    images: int = 1
+    image_bytes: int = 0
+    budget: Optional[float] = None  # seconds the request had left
+    reason: str = ""
+
+
+def latency_key(method: str, model: str, batch: bool = False) -> str:
+    """Name of the latency histogram for a method's calls to a model."""
+    return f"{method}.batch.{model}" if batch else f"{method}.{model}"
+
+
+def image_difficulty(image_bytes: bytes) -> str:
+    """How hard an image is to read: "easy" for label-like shots, "hard" for cluttered plates, else "normal"."""
+    features = image_features(image_bytes)
+    if classify_features(features) == "text":
+        return "easy"
+    if features is not None and features[0] > CLUTTER_THRESHOLD:
+        return "hard"
+    return "normal"
+
+
+class ModelRouter:
+    """Picks a model per request from difficulty, latency budget and live model health."""
+
+    def __init__(self, models: Optional[Sequence[str]] = None, db_path: Optional[str] = None, log: bool = True):
+        self.models = list(models or RECOGNITION_MODELS)
+        self.db_path = db_path  # defaults to the global database's
+        self.log = log
+        self._lock = threading.Lock()
+        self._outcomes: Dict[str, Deque[Tuple[float, bool]]] = {}
+        self._local = threading.local()
+
+    def route(self, method: str, images: Sequence[bytes], budget: Optional[float] = None) -> RouteDecision:
+        """
+        Choose the model for a request.
+
+        Args:
+            method: Recognizer method, e.g. "visual_estimation"
+            images: The image bytes the request carries
+            budget: Seconds the caller can wait, usually its deadline's remaining time
+
+        Returns:
+            RouteDecision
+        """
+        size = sum(len(image_bytes) for image_bytes in images)
+        if len(self.models) == 1:
+            return RouteDecision(method, self.models[0], "normal", len(images), size, budget, "only model")
+
+        level = max(DIFFICULTIES.index(image_difficulty(image_bytes)) for image_bytes in images)
+        target = round(level * (len(self.models) - 1) / (len(DIFFICULTIES) - 1))
+        # the tier the images call for, then faster ones, then stronger ones
+        order = self.models[target::-1] + self.models[target + 1:]
+        healthy = [model for model in order if self.error_rate(model) <= MAX_ERROR_RATE] or order
+        notes = [f"{model} failing" for model in order if model not in healthy]
+
+        batch = len(images) > 1
+        chosen = None
+        for model in healthy:
+            expected = self.expected_latency(method, model, batch)
+            if budget is None or expected is None or expected <= budget:
+                chosen = model
+                break
+            notes.append(f"{model} p{LATENCY_PERCENTILE} {expected:.1f}s over budget")
+        if chosen is None:
+            chosen = min(healthy, key=lambda model: self.expected_latency(method, model, batch))
+            notes.append("none fits the budget, using the fastest")
+
+        return RouteDecision(
+            method, chosen, DIFFICULTIES[level], len(images), size, budget,
+            "; ".join([f"{DIFFICULTIES[level]} -> {self.models[target]}"] + notes)
+        )
+
+    def record(self, decision: RouteDecision, latency_seconds: float, error: Optional[Exception] = None):
+        """Count a call's outcome towards its model's error rate and log it in model_routes."""
+        with self._lock:
+            outcomes = self._outcomes.setdefault(decision.model, deque(maxlen=ERROR_WINDOW))
+            outcomes.append((time.monotonic(), error is not None))
+        if not self.log:
+            return
+        try:
+            self._db().execute(
+                """
+                INSERT INTO model_routes
+                    (method, model, difficulty, images, image_bytes, budget_ms, reason,
+                     success, latency_ms, error_message)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    decision.method,
+                    decision.model,
+                    decision.difficulty,
+                    decision.images,
+                    decision.image_bytes,
+                    None if decision.budget is None else int(decision.budget * 1000),
+                    decision.reason,
+                    int(error is None),
+                    int(latency_seconds * 1000),
+                    None if error is None else (str(error) or type(error).__name__),
+                )
+            )
+        except Exception:
+            logger.exception("Could not record the route for %s", decision.model)
+
+    def error_rate(self, model: str) -> float:
+        """Share of the model's recent calls that failed; 0 with too few recent calls."""
+        cutoff = time.monotonic() - ERROR_MEMORY
+        with self._lock:
+            recent = [failed for at, failed in self._outcomes.get(model, ()) if at >= cutoff]
+        if len(recent) < MIN_ERROR_SAMPLES:
+            return 0.0
+        return sum(recent) / len(recent)
+
+    def expected_latency(self, method: str, model: str, batch: bool = False) -> Optional[float]:
+        """Recent p90 latency of the method's calls to the model, or None with too few calls."""
+        histogram = get_latency_histogram(latency_key(method, model, batch))
+        if histogram.calls < MIN_LATENCY_SAMPLES:
+            return None
+        return histogram.percentile(LATENCY_PERCENTILE)
+
+    def summary(self, methods: Sequence[str] = ("label_recognition", "visual_estimation")) -> Dict[str, dict]:
+        """Error rate and expected latency per model, for the metrics views."""
+        return {
+            model: {
+                "error_rate": self.error_rate(model),
+                **{method: self.expected_latency(method, model) for method in methods},
+            }
+            for model in self.models
+        }
+
+    def _db(self) -> DatabaseConnection:
+        # calls come from page, job and API threads; each logs on its own connection
+        if getattr(self._local, "db", None) is None:
+            self._local.db = DatabaseConnection(self.db_path or get_database().db_path)
+        return self._local.db
+
+
+# Global router instance
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Get the process-wide model router, shared by every recognizer."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
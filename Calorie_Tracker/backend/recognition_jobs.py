@@ -0,0 +1,317 @@
+"""Background queue that runs image recognition off the request path."""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from database import DatabaseConnection, CalorieRepository, get_database
+from domain import ImageRecognitionResult
+from .image_recognition import RECOGNITION_BATCH_SIZE, ImageProcessor
+from .image_store import get_image_store
+from .recognizer_selection import RecognizerSelector
+from .similarity import get_similarity_index
+from utils.tracing import bind, span
+
+RECOGNITION_WORKERS = int(os.getenv("RECOGNITION_WORKERS", "4"))
+STALE_JOB_AFTER = timedelta(minutes=10)  # running jobs older than this are retried
+
+METHODS = ("automatic", "label", "visual")
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionJobQueue:
+    """
+    Stores uploads in the recognition_jobs table and processes them on a worker pool.
+
+    Workers use their own database connections and save the recognized entries
+    themselves (unless the job is held for review), so a job finishes even if
+    the user leaves the page.
+    """
+
+    def __init__(self, db_path: str = "calories.db", workers: int = RECOGNITION_WORKERS):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recognition")
+        self._local = threading.local()
+
+    def shutdown(self, wait: bool = True):
+        """Stop the workers; with wait, after the jobs already submitted finish."""
+        self._executor.shutdown(wait=wait)
+
+    def enqueue(
+        self,
+        user_id: int,
+        image_bytes: bytes,
+        method: str = "automatic",
+        auto_save: bool = True
+    ) -> int:
+        """Queue an image and return the job id immediately."""
+        return self.enqueue_many(user_id, [image_bytes], method, auto_save)[0]
+
+    def enqueue_many(
+        self,
+        user_id: int,
+        images: List[bytes],
+        method: str = "automatic",
+        auto_save: bool = True,
+        batch: bool = False
+    ) -> List[int]:
+        """
+        Queue several images at once; they are recognized concurrently.
+
+        Args:
+            user_id: Owner of the images
+            images: Raw image bytes, one job each
+            method: "automatic", "label" or "visual"
+            auto_save: Save detected entries when done; otherwise keep them for review
+            batch: Send up to RECOGNITION_BATCH_SIZE images per model request; fewer
+                requests and prompt tokens, but a job only finishes with its whole batch
+
+        Returns:
+            Job ids in the order of images
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown recognition method: {method}")
+        # the image store dedupes repeated uploads and keeps the photo for the entries
+        image_paths = [get_image_store().save(image_bytes) for image_bytes in images]
+        job_ids = []
+        with get_database().transaction() as cursor:
+            for image_path in image_paths:
+                cursor.execute(
+                    "INSERT INTO recognition_jobs (user_id, method, auto_save, image_path) VALUES (?, ?, ?, ?)",
+                    (user_id, method, int(auto_save), image_path)
+                )
+                job_ids.append(cursor.lastrowid)
+        if batch and len(job_ids) > 1:
+            run_batch = bind(self._run_batch)  # the jobs continue the uploader's trace
+            for start in range(0, len(job_ids), RECOGNITION_BATCH_SIZE):
+                self._executor.submit(run_batch, job_ids[start:start + RECOGNITION_BATCH_SIZE])
+            return job_ids
+        run = bind(self._run)
+        for job_id in job_ids:
+            self._executor.submit(run, job_id)
+        return job_ids
+
+    def get_job(self, job_id: int):
+        """Fetch a job's status row (without the image)."""
+        return get_database().fetch_one(
+            """
+            SELECT id, user_id, status, method, auto_save, image_path, result, error_message,
+                   created_at, started_at, finished_at
+            FROM recognition_jobs WHERE id = ?
+            """,
+            (job_id,)
+        )
+
+    def get_jobs(self, job_ids: List[int]) -> list:
+        """Fetch several jobs' status rows in the given order."""
+        if not job_ids:
+            return []
+        rows = get_database().fetch_all(
+            f"""
+            SELECT id, user_id, status, method, auto_save, image_path, result, error_message,
+                   created_at, started_at, finished_at
+            FROM recognition_jobs WHERE id IN ({", ".join("?" for _ in job_ids)})
+            """,
+            tuple(job_ids)
+        )
+        by_id = {row["id"]: row for row in rows}
+        return [by_id[job_id] for job_id in job_ids if job_id in by_id]
+
+    def jobs_for_user(self, user_id: int, limit: int = 5) -> list:
+        """Fetch a user's most recent jobs, newest first."""
+        return get_database().fetch_all(
+            """
+            SELECT id, status, method, auto_save, image_path, result, error_message,
+                   created_at, finished_at
+            FROM recognition_jobs
+            WHERE user_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (user_id, limit)
+        )
+
+    @staticmethod
+    def parse_result(job) -> Optional[ImageRecognitionResult]:
+        """Decode the stored result of a finished job."""
+        if not job or not job["result"]:
+            return None
+        return ImageRecognitionResult.from_dict(json.loads(job["result"]))
+
+    def recover(self) -> int:
+        """Resubmit queued jobs and running jobs left behind by a stopped process."""
+        stale_before = datetime.now() - STALE_JOB_AFTER
+        db = get_database()
+        db.execute(
+            "UPDATE recognition_jobs SET status = 'queued' WHERE status = 'running' AND started_at < ?",
+            (stale_before,)
+        )
+        rows = db.fetch_all("SELECT id FROM recognition_jobs WHERE status = 'queued' ORDER BY id")
+        for row in rows:
+            self._executor.submit(self._run, row["id"])
+        return len(rows)
+
+    def _worker_db(self) -> DatabaseConnection:
+        if getattr(self._local, "db", None) is None:
+            self._local.db = DatabaseConnection(self.db_path)
+        return self._local.db
+
+    def _worker_processor(self) -> ImageProcessor:
+        if getattr(self._local, "processor", None) is None:
+            self._local.processor = ImageProcessor(selector=RecognizerSelector(self._worker_db()))
+        return self._local.processor
+
+    def _run(self, job_id: int):
+        """Claim, process and finish one job on a worker thread."""
+        with span("recognition_job", job_id=job_id) as current:
+            self._process(job_id, current)
+
+    def _run_batch(self, job_ids: List[int]):
+        """Claim several jobs of one enqueue_many call and recognize their images together."""
+        with span("recognition_batch", jobs=len(job_ids)) as current:
+            loaded = []
+            for job_id in job_ids:
+                if not self._claim(job_id):
+                    continue
+                try:
+                    loaded.append((job_id, *self._load(job_id)))
+                except Exception as e:
+                    self._fail(job_id, e)
+            current.set(claimed=len(loaded))
+            if not loaded:
+                return
+
+            # jobs queued together share the user and the method
+            first = loaded[0][1]
+            current.set(user_id=first["user_id"], method=first["method"])
+            try:
+                results = self._recognize_batch(
+                    [image_bytes for _, _, image_bytes in loaded], first["method"], first["user_id"]
+                )
+            except Exception as e:
+                current.set(error=str(e))
+                for job_id, _, _ in loaded:
+                    self._fail(job_id, e)
+                return
+            for (job_id, job, image_bytes), result in zip(loaded, results):
+                try:
+                    self._finish(job_id, job, image_bytes, result)
+                except Exception as e:
+                    self._fail(job_id, e)
+
+    def _process(self, job_id: int, current):
+        if not self._claim(job_id):
+            current.set(claimed=False)
+            return
+
+        try:
+            job, image_bytes = self._load(job_id)
+            current.set(user_id=job["user_id"], method=job["method"])
+            result = self._recognize(image_bytes, job["method"], job["user_id"])
+            self._finish(job_id, job, image_bytes, result)
+        except Exception as e:
+            current.set(error=str(e))
+            self._fail(job_id, e)
+
+    def _claim(self, job_id: int) -> bool:
+        """Mark a queued job running; False if another worker or process got it first."""
+        # the status check makes the claim safe if several processes share the table
+        return bool(self._worker_db().execute(
+            "UPDATE recognition_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+            (datetime.now(), job_id)
+        ).rowcount)
+
+    def _load(self, job_id: int):
+        """A claimed job's row and image bytes."""
+        job = self._worker_db().fetch_one(
+            "SELECT user_id, method, auto_save, image, image_path FROM recognition_jobs WHERE id = ?",
+            (job_id,)
+        )
+        if job["image_path"]:
+            with span("read_image"):
+                image_bytes = get_image_store().read_image(job["image_path"])
+        else:
+            image_bytes = job["image"]  # queued before the image store existed
+        if image_bytes is None:
+            raise FileNotFoundError(f"Stored image {job['image_path']} is missing")
+        return job, bytes(image_bytes)
+
+    def _finish(self, job_id: int, job, image_bytes: bytes, result: ImageRecognitionResult):
+        """Save a job's entries (unless held for review) and its result."""
+        entries = []
+        if result.success and job["auto_save"]:
+            with span("convert_calorie_entires"):
+                entries = result.convert_calorie_entires(user_id=job["user_id"], image_path=job["image_path"])
+
+        with span("insert_entries", rows=len(entries)), self._worker_db().transaction() as cursor:
+            cursor.executemany(CalorieRepository.INSERT_SQL, CalorieRepository.insert_params(entries))
+            cursor.execute(
+                """
+                UPDATE recognition_jobs
+                SET status = ?, result = ?, error_message = ?, finished_at = ?, image = NULL
+                WHERE id = ?
+                """,
+                (
+                    "done" if result.success else "failed",
+                    json.dumps(result.to_dict(), default=str),
+                    result.error_message,
+                    datetime.now(),
+                    job_id
+                )
+            )
+        # only saved results are offered again; review jobs are fingerprinted when accepted
+        if entries:
+            self._remember(job["user_id"], image_bytes, result, job["image_path"])
+
+    def _fail(self, job_id: int, error: Exception):
+        self._worker_db().execute(
+            """
+            UPDATE recognition_jobs
+            SET status = 'failed', error_message = ?, finished_at = ?, image = NULL
+            WHERE id = ?
+            """,
+            (str(error), datetime.now(), job_id)
+        )
+
+    def _remember(self, user_id: int, image_bytes: bytes, result: ImageRecognitionResult, image_path: str):
+        """Add a recognized image to the similarity index; never fails the job."""
+        try:
+            with span("fingerprint"):
+                get_similarity_index().add(user_id, image_bytes, result, image_path, db=self._worker_db())
+        except Exception:
+            logger.exception("Could not fingerprint image %s", image_path)
+    
+    def _recognize(self, image_bytes: bytes, method: str, user_id: int) -> ImageRecognitionResult:
+        processor = self._worker_processor()
+        if method == "label":
+            return processor.label_recognizer.recognize(image_bytes)
+        if method == "visual":
+            return processor.visual_estimator.recognize(image_bytes)
+        return processor.process_image(image_bytes, user_id=user_id)
+
+    def _recognize_batch(self, images: List[bytes], method: str, user_id: int) -> List[ImageRecognitionResult]:
+        processor = self._worker_processor()
+        if method == "label":
+            return processor.label_recognizer.recognize_batch(images)
+        if method == "visual":
+            return processor.visual_estimator.recognize_batch(images)
+        return processor.process_batch(images, user_id=user_id)
+
+
+# Global job queue instance
+_queue: Optional[RecognitionJobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> RecognitionJobQueue:
+    """Get global recognition job queue, resuming unfinished jobs on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = RecognitionJobQueue(get_database().db_path)
+            _queue.recover()
+        return _queue
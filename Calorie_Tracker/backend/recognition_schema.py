@@ -0,0 +1,215 @@
+"""Prompt, response schema and validator shared by the genai recognizers.
+
+The schema is sent with the request (JSON mode), so the model replies with a
+bare JSON object. The validator is still needed: it coerces loosely typed
+values ("350 kcal", "0.8") and drops keys FoodItemDetection doesn't know,
+instead of failing the whole result.
+"""
+import json
+import re
+from dataclasses import fields
+from typing import Callable, List, Optional, Tuple, Union
+
+from domain import FOOD_TYPES, FoodItemDetection
+
+PROMPT_TEMPLATE = """Analyze this {subject} and list every food item you can identify.
+For each item give its calories, name, food type (one of: {food_types}), quantity and unit.
+{instructions}
+Also give the total estimated calories and your confidence from 0 to 1."""
+
+PROMPTS = {
+    "label_recognition": PROMPT_TEMPLATE.format(
+        subject="food label",
+        food_types=", ".join(FOOD_TYPES),
+        instructions="Read the values printed on the label; use one serving unless the label says otherwise."
+    ),
+    "visual_estimation": PROMPT_TEMPLATE.format(
+        subject="food image",
+        food_types=", ".join(FOOD_TYPES),
+        instructions="Estimate portion sizes from the photo and note your assumptions in notes."
+    ),
+}
+
+BATCH_INSTRUCTIONS = """
+You are given {count} images, each preceded by its number ("Image 1:" to "Image {count}:").
+Analyze every image on its own and return one entry in results per image, with
+its number in image. Never combine items from different images."""
+
+
+def batch_prompt(method: str, count: int) -> str:
+    """Prompt for one request carrying `count` numbered images."""
+    return PROMPTS[method] + BATCH_INSTRUCTIONS.format(count=count)
+
+
+ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "calories": {"type": "number"},
+        "food_name": {"type": "string"},
+        "food_type": {"type": "string", "enum": list(FOOD_TYPES)},
+        "quantity": {"type": "number"},
+        "unit": {"type": "string"},
+        "notes": {"type": "string"},
+        "confidence": {"type": "number"},
+    },
+    "required": ["calories", "food_name", "quantity", "unit"],
+}
+
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "detected_items": {"type": "array", "items": ITEM_SCHEMA},
+        "estimated_calories": {"type": "number"},
+        "confidence_score": {"type": "number"},
+    },
+    "required": ["detected_items"],
+}
+
+BATCH_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"image": {"type": "integer"}, **RESPONSE_SCHEMA["properties"]},
+                "required": ["image", *RESPONSE_SCHEMA["required"]],
+            },
+        },
+    },
+    "required": ["results"],
+}
+
+ParsedResult = Tuple[List[FoodItemDetection], Optional[float], Optional[float]]
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class ResponseValidationError(ValueError):
+    """Raised when a reply has no usable JSON object."""
+
+
+def _to_float(value) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value).replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def _to_str(value) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def _to_food_type(value) -> Optional[str]:
+    # replies outside the schema's enum, e.g. "Snack", are kept as "other"
+    text = _to_str(value)
+    if text is None:
+        return None
+    text = text.lower()
+    return text if text in FOOD_TYPES else "other"
+
+
+def _compile_item_validator() -> Callable[[dict], Optional[FoodItemDetection]]:
+    """Build the per-item coercion table once from FoodItemDetection's fields."""
+    coercers = {
+        field.name: _to_float if field.type in (float, Optional[float]) else _to_str
+        for field in fields(FoodItemDetection)
+    }
+    coercers["food_type"] = _to_food_type
+    defaults = {"quantity": 1.0, "unit": "serving"}
+    required = ("calories", "food_name")
+    items = tuple(coercers.items())
+
+    def validate_item(raw: dict) -> Optional[FoodItemDetection]:
+        if not isinstance(raw, dict):
+            return None
+        values = {}
+        for name, coerce in items:
+            value = coerce(raw.get(name))
+            values[name] = defaults.get(name) if value is None else value
+        if any(values[name] is None for name in required):
+            return None
+        return FoodItemDetection(**values)
+
+    return validate_item
+
+
+validate_item = _compile_item_validator()
+
+
+def _load_object(text: str) -> dict:
+    raw = (text or "").strip()
+    # JSON mode replies are bare, but older models may still wrap them in a code fence
+    if raw.startswith("```"):
+        raw = raw.strip("`")
+        if raw.startswith("json"):
+            raw = raw[4:]
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ResponseValidationError(f"Model reply is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise ResponseValidationError("Model reply is not a JSON object")
+    return data
+
+
+def _parse_result(data: dict) -> ParsedResult:
+    raw_items = data.get("detected_items")
+    items = [item for item in map(validate_item, raw_items if isinstance(raw_items, list) else [])
+             if item is not None]
+
+    estimated = _to_float(data.get("estimated_calories"))
+    if estimated is None and items:
+        estimated = sum(item.calories for item in items)
+    confidence = _to_float(data.get("confidence_score"))
+    if confidence is not None:
+        confidence = min(max(confidence, 0.0), 1.0)
+    return items, estimated, confidence
+
+
+def parse_response(text: str) -> ParsedResult:
+    """
+    Parse and validate a model reply.
+
+    Items missing calories or a name are dropped rather than failing the reply.
+
+    Returns:
+        (detected items, estimated total calories, confidence score)
+
+    Raises:
+        ResponseValidationError: if the reply contains no JSON object
+    """
+    return _parse_result(_load_object(text))
+
+
+def parse_batch_response(text: str, count: int) -> List[Union[ParsedResult, ResponseValidationError]]:
+    """
+    Split a reply to a batch of `count` images into per-image results.
+
+    A slot the reply leaves out, or fills with something that is not an
+    object, gets a ResponseValidationError instead of a result, so the caller
+    can retry just that image. Entries for unknown image numbers are ignored;
+    if an image has several entries the first one counts.
+
+    Raises:
+        ResponseValidationError: if the reply contains no JSON object
+    """
+    entries = _load_object(text).get("results")
+    slots: List[Union[ParsedResult, ResponseValidationError, None]] = [None] * count
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        number = _to_float(entry.get("image"))
+        if number is None or number != int(number) or not 1 <= number <= count:
+            continue
+        if slots[int(number) - 1] is None:
+            slots[int(number) - 1] = _parse_result(entry)
+    return [
+        slot if slot is not None else ResponseValidationError(f"Model reply has no result for image {number}")
+        for number, slot in enumerate(slots, start=1)
+    ]
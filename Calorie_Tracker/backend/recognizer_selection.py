@@ -0,0 +1,151 @@
+"""Chooses which recognizer to call first in automatic mode.
+
+Each automatic recognition is recorded in recognition_outcomes with the image
+kind ("text" for label-like photos, "plate" for meals), the method, whether it
+succeeded, its confidence and latency. The method with the best smoothed rate
+of confident results for the user and image kind goes first; the other one is
+only called when the first result is not confident enough. Since only the
+methods that are called get recorded, a small share of recognitions
+(EXPLORATION_RATE) tries the runner-up first, so a ranking can't lock in on
+a method that was merely good enough early on.
+"""
+import io
+import os
+import random
+from typing import List, Optional, Tuple
+
+from database import DatabaseConnection, get_database
+from domain import ImageRecognitionResult
+
+CONFIDENCE_THRESHOLD = float(os.getenv("RECOGNITION_CONFIDENCE_THRESHOLD", "0.6"))
+EXPLORATION_RATE = float(os.getenv("RECOGNITION_EXPLORATION_RATE", "0.05"))
+USER_WINDOW = 200  # most recent outcomes per user and image kind
+GLOBAL_WINDOW = 1000  # most recent outcomes per image kind across users
+USER_WEIGHT = 10  # pseudo-counts the all-users rate contributes to a user's rate
+GLOBAL_WEIGHT = 20  # pseudo-counts the prior contributes to the all-users rate
+
+METHODS = ("label_recognition", "visual_estimation")
+# chance of a confident result before any outcomes are recorded
+PRIORS = {
+    "text": {"label_recognition": 0.7, "visual_estimation": 0.5},
+    "plate": {"label_recognition": 0.2, "visual_estimation": 0.8},
+}
+
+# heuristic thresholds on a 128px grayscale/HSV copy of the image
+EDGE_THRESHOLD = 0.10  # mean edge strength; printed text has many sharp edges
+SATURATION_THRESHOLD = 0.30  # labels are mostly black on white, food is colorful
+
+
+def image_features(image_bytes: bytes) -> Optional[Tuple[float, float]]:
+    """(mean edge strength, mean saturation), both 0-1, of a small copy; None if unreadable."""
+    from PIL import Image, ImageFilter, ImageStat
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.draft("RGB", (256, 256))  # JPEG decoders downscale while decoding
+        image = image.convert("RGB")
+        image.thumbnail((128, 128))
+    except Exception:
+        return None
+    edges = ImageStat.Stat(image.convert("L").filter(ImageFilter.FIND_EDGES)).mean[0] / 255
+    saturation = ImageStat.Stat(image.convert("HSV")).mean[1] / 255
+    return edges, saturation
+
+
+def classify_features(features: Optional[Tuple[float, float]]) -> str:
+    """Image kind for image_features' result: label-like ("text") or a meal ("plate")."""
+    if features is None:
+        return "plate"
+    edges, saturation = features
+    if edges > EDGE_THRESHOLD and saturation < SATURATION_THRESHOLD:
+        return "text"
+    return "plate"
+
+
+def classify_image(image_bytes: bytes) -> str:
+    """Cheap local guess whether an image shows a label ("text") or a meal ("plate")."""
+    return classify_features(image_features(image_bytes))
+
+
+def is_confident(result: ImageRecognitionResult, threshold: float = CONFIDENCE_THRESHOLD) -> bool:
+    """A successful result with items whose confidence (if reported) meets the threshold."""
+    if not result.success or not result.detected_items:
+        return False
+    return result.confidence_score is None or result.confidence_score >= threshold
+
+
+class RecognizerSelector:
+    """Orders recognizers by their recorded success for a user and image kind."""
+
+    def __init__(
+        self,
+        db: Optional[DatabaseConnection] = None,
+        threshold: float = CONFIDENCE_THRESHOLD,
+        exploration_rate: float = EXPLORATION_RATE,
+        seed: Optional[int] = None
+    ):
+        self.db = db or get_database()
+        self.threshold = threshold
+        self.exploration_rate = exploration_rate
+        self._random = random.Random(seed)
+
+    def order(self, user_id: Optional[int], image_kind: str) -> List[str]:
+        """Methods to try, most likely to give a confident result first, except when exploring."""
+        scores = {method: self.success_rate(user_id, image_kind, method) for method in METHODS}
+        ranked = sorted(METHODS, key=lambda method: -scores[method])
+        if self._random.random() < self.exploration_rate:
+            ranked[0], ranked[1] = ranked[1], ranked[0]
+        return ranked
+
+    def success_rate(self, user_id: Optional[int], image_kind: str, method: str) -> float:
+        """Smoothed rate of confident results: user history shrunk towards all users, then the prior."""
+        prior = PRIORS.get(image_kind, PRIORS["plate"])[method]
+        good, total = self._counts(
+            "image_kind = ? AND method = ?", (image_kind, method), GLOBAL_WINDOW
+        )
+        global_rate = (good + prior * GLOBAL_WEIGHT) / (total + GLOBAL_WEIGHT)
+        if user_id is None:
+            return global_rate
+        good, total = self._counts(
+            "user_id = ? AND image_kind = ? AND method = ?", (user_id, image_kind, method), USER_WINDOW
+        )
+        return (good + global_rate * USER_WEIGHT) / (total + USER_WEIGHT)
+
+    def record(
+        self,
+        user_id: Optional[int],
+        image_kind: str,
+        result: ImageRecognitionResult,
+        latency_seconds: float
+    ):
+        """Store the outcome of one recognizer call."""
+        self.db.execute(
+            """
+            INSERT INTO recognition_outcomes
+                (user_id, image_kind, method, success, confident, confidence_score, item_count, latency_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                user_id,
+                image_kind,
+                result.method,
+                int(result.success),
+                int(is_confident(result, self.threshold)),
+                result.confidence_score,
+                len(result.detected_items),
+                int(latency_seconds * 1000),
+            )
+        )
+
+    def _counts(self, where: str, params: tuple, window: int):
+        row = self.db.fetch_one(
+            f"""
+            SELECT COALESCE(SUM(confident), 0), COUNT(*) FROM (
+                SELECT confident FROM recognition_outcomes
+                WHERE {where}
+                ORDER BY id DESC
+                LIMIT ?
+            )
+            """,
+            params + (window,)
+        )
+        return row[0], row[1]
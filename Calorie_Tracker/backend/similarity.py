@@ -0,0 +1,258 @@
+"""Per-user near-duplicate index over recognized images.
+
+Each successfully recognized image is stored in image_fingerprints with a
+64-bit difference hash (dHash) of its grayscale layout and a 64-bin
+hue/saturation histogram (low-saturation pixels go to four brightness bins,
+so a change of exposure moves little of the mass). A new upload whose hash
+and histogram are both close to an earlier image gets that image's result
+offered as an instant suggestion. Each process keeps a user's fingerprints in
+NumPy arrays and, when the change feed reports new fingerprints for the user
+(from any process), reads only the rows newer than the last one it has seen.
+
+Thresholds were tuned with benchmarks/bench_similarity.py; a match is only a
+suggestion the user has to confirm, so some false hits are acceptable.
+"""
+import io
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from database import DatabaseConnection, get_change_feed, get_database
+from domain import ImageRecognitionResult
+
+HASH_SIZE = 8  # 8x8 = 64-bit dHash
+HUE_BINS = 15
+SATURATION_BINS = 4
+GRAY_BINS = 4  # pixels with saturation below GRAY_SATURATION, by brightness
+GRAY_SATURATION = 48
+HISTOGRAM_SIZE = HUE_BINS * SATURATION_BINS + GRAY_BINS  # 64
+MAX_HAMMING_DISTANCE = 8  # of 64 bits
+MAX_HISTOGRAM_DISTANCE = 0.15  # total variation distance, 0..1
+MAX_FINGERPRINTS_PER_USER = 1000  # most recent kept in memory and searched
+MAX_CACHED_USERS = 256
+
+
+@dataclass
+class Fingerprint:
+    """Perceptual hash and color histogram of one image."""
+
+    dhash: int  # unsigned 64-bit
+    histogram: "numpy.ndarray"  # float32, sums to 1
+
+
+@dataclass
+class SimilarMatch:
+    """An earlier image close enough to reuse its recognition result."""
+
+    result: ImageRecognitionResult
+    image_path: Optional[str]
+    hamming_distance: int
+    histogram_distance: float
+    created_at: Optional[str] = None
+
+
+def fingerprint(image_bytes: bytes) -> Fingerprint:
+    """Compute the dHash and color histogram of an image."""
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("RGB", (128, 128))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+
+    gray = np.asarray(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    dhash = int(np.packbits(bits).view(">u8")[0])
+
+    hsv = np.asarray(image.resize((64, 64), Image.BILINEAR).convert("HSV"), dtype=np.int32).reshape(-1, 3)
+    hue, saturation, value = hsv[:, 0], hsv[:, 1], hsv[:, 2]
+    chroma_codes = (hue * HUE_BINS // 256) * SATURATION_BINS + \
+        (saturation - GRAY_SATURATION) * SATURATION_BINS // (256 - GRAY_SATURATION)
+    gray_codes = HUE_BINS * SATURATION_BINS + value * GRAY_BINS // 256
+    codes = np.where(saturation >= GRAY_SATURATION, chroma_codes, gray_codes)
+    histogram = np.bincount(codes, minlength=HISTOGRAM_SIZE).astype(np.float32)
+    return Fingerprint(dhash, histogram / histogram.sum())
+
+
+def _popcount(values):
+    """Bits set in each element of a uint64 array."""
+    import numpy as np
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class _UserIndex:
+    """In-memory fingerprints of one user, newest last."""
+
+    def __init__(self):
+        import numpy as np
+        self.last_id = 0
+        self.stale = True  # rows may have been added since last_id was read
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.histograms = np.zeros((0, HISTOGRAM_SIZE), dtype=np.float32)
+        self.lock = threading.Lock()
+
+    def extend(self, rows):
+        import numpy as np
+        if not rows:
+            return
+        self.ids = np.concatenate([self.ids, np.array([row["id"] for row in rows], dtype=np.int64)])
+        self.hashes = np.concatenate([
+            self.hashes,
+            np.array([row["dhash"] for row in rows], dtype=np.int64).view(np.uint64)
+        ])
+        self.histograms = np.concatenate([
+            self.histograms,
+            np.frombuffer(b"".join(row["histogram"] for row in rows), dtype=np.float32)
+            .reshape(len(rows), -1)
+        ])
+        if len(self.ids) > MAX_FINGERPRINTS_PER_USER:
+            self.ids = self.ids[-MAX_FINGERPRINTS_PER_USER:]
+            self.hashes = self.hashes[-MAX_FINGERPRINTS_PER_USER:]
+            self.histograms = self.histograms[-MAX_FINGERPRINTS_PER_USER:]
+        self.last_id = int(self.ids[-1])
+
+
+class SimilarityIndex:
+    """Finds a user's earlier image that looks like a new upload."""
+
+    def __init__(self):
+        self._users: "OrderedDict[int, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._feeds = set()  # paths of the databases whose change feed marks indexes stale
+        self._feeds_lock = threading.Lock()  # not _lock: the feed calls invalidate under its own lock
+        self.lookups = 0
+        self.hits = 0
+
+    def add(
+        self,
+        user_id: int,
+        image_bytes: bytes,
+        result: ImageRecognitionResult,
+        image_path: Optional[str] = None,
+        db: Optional[DatabaseConnection] = None
+    ) -> int:
+        """Fingerprint a recognized image and store it with its result. Returns the row id."""
+        import numpy as np
+        fp = fingerprint(image_bytes)
+        cursor = (db or get_database()).execute(
+            """
+            INSERT INTO image_fingerprints (user_id, image_path, dhash, histogram, result)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                user_id,
+                image_path,
+                int(np.uint64(fp.dhash).astype(np.int64)),  # SQLite integers are signed
+                fp.histogram.astype(np.float32).tobytes(),
+                json.dumps(result.to_dict(), default=str),
+            )
+        )
+        return cursor.lastrowid
+
+    def lookup(
+        self,
+        user_id: int,
+        image_bytes: bytes,
+        db: Optional[DatabaseConnection] = None
+    ) -> Optional[SimilarMatch]:
+        """Closest earlier image within both distance thresholds, or None."""
+        import numpy as np
+        db = db or get_database()
+        fp = fingerprint(image_bytes)
+        index = self._refresh(user_id, db)
+
+        with index.lock:
+            hashes, histograms, ids = index.hashes, index.histograms, index.ids
+        self.lookups += 1
+        if not len(ids):
+            return None
+
+        hamming = _popcount(hashes ^ np.uint64(fp.dhash))
+        histogram_distance = np.abs(histograms - fp.histogram).sum(axis=1) / 2
+        close = (hamming <= MAX_HAMMING_DISTANCE) & (histogram_distance <= MAX_HISTOGRAM_DISTANCE)
+        if not close.any():
+            return None
+
+        score = np.where(close, hamming / 64 + histogram_distance, np.inf)
+        best = int(np.argmin(score))
+        row = db.fetch_one(
+            "SELECT image_path, result, created_at FROM image_fingerprints WHERE id = ?",
+            (int(ids[best]),)
+        )
+        if row is None:
+            return None
+        self.hits += 1
+        return SimilarMatch(
+            result=ImageRecognitionResult.from_dict(json.loads(row["result"])),
+            image_path=row["image_path"],
+            hamming_distance=int(hamming[best]),
+            histogram_distance=float(histogram_distance[best]),
+            created_at=row["created_at"]
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def invalidate(self, user_ids=None):
+        """Mark the indexes of these users, or of every user, as missing new fingerprints."""
+        with self._lock:
+            indexes = list(self._users.values()) if user_ids is None else \
+                [self._users[user_id] for user_id in user_ids if user_id in self._users]
+        for index in indexes:
+            index.stale = True
+
+    def _refresh(self, user_id: int, db: DatabaseConnection) -> _UserIndex:
+        """Load fingerprints added since this process last looked (by any process)."""
+        feed = get_change_feed(db.db_path)
+        with self._feeds_lock:
+            if feed.db_path not in self._feeds:
+                feed.subscribe("images", self.invalidate)
+                self._feeds.add(feed.db_path)
+        feed.poll()
+
+        with self._lock:
+            index = self._users.pop(user_id, None) or _UserIndex()
+            self._users[user_id] = index
+            while len(self._users) > MAX_CACHED_USERS:
+                self._users.popitem(last=False)
+
+        with index.lock:
+            if not index.stale:
+                return index
+            # cleared before reading, so a fingerprint added meanwhile marks it stale again
+            index.stale = False
+            try:
+                rows = db.fetch_all(
+                    """
+                    SELECT id, dhash, histogram FROM (
+                        SELECT id, dhash, histogram FROM image_fingerprints
+                        WHERE user_id = ? AND id > ?
+                        ORDER BY id DESC
+                        LIMIT ?
+                    ) ORDER BY id
+                    """,
+                    (user_id, index.last_id, MAX_FINGERPRINTS_PER_USER)
+                )
+            except Exception:
+                index.stale = True
+                raise
+            index.extend(rows)
+        return index
+
+
+# Global similarity index instance
+_index: Optional[SimilarityIndex] = None
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """Get global similarity index instance."""
+    global _index
+    if _index is None:
+        _index = SimilarityIndex()
+    return _index
@@ -0,0 +1 @@
+"""Benchmarks and load tools, run from the Calorie_Tracker directory."""
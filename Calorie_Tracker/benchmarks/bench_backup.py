@@ -0,0 +1,98 @@
+"""Benchmark online backups: duration, restarts and the write latency they cause.
+
+Fills a temporary database with synthetic entries, then commits a small write
+every --write-every seconds from another connection, first without a backup
+running and then during snapshots taken with several step sizes (-1 copies
+everything in one step). --wal runs the same in WAL journal mode. Run from the
+Calorie_Tracker directory:
+    python -m benchmarks.bench_backup --users 200 --days 120 [--wal]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from database import DatabaseConnection, DatabaseSchema, synthetic
+from database.backup import SnapshotStore
+
+
+class Writer:
+    """Commits one small insert every `every` seconds and records each commit's latency."""
+
+    def __init__(self, db_path: str, every: float):
+        self.db_path = db_path
+        self.every = every
+        self.latencies = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self):
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            connection.execute(
+                "INSERT INTO calories (user_id, calories, food_name, logged_at) "
+                "VALUES (1, 100, 'probe', '2026-01-01 12:00:00.000000')"
+            )
+            connection.commit()
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            self._stop.wait(self.every)
+        connection.close()
+
+
+def describe_latencies(latencies) -> str:
+    latencies = sorted(latencies)
+    return (f"p50 {statistics.median(latencies):6.2f}  p99 {latencies[int(len(latencies) * 0.99) - 1]:7.2f}  "
+            f"max {latencies[-1]:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark online backups against concurrent writes.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--write-every", type=float, default=0.02, help="Seconds between writes")
+    parser.add_argument("--pages", type=int, nargs="+", default=[32, 128, 1024, -1], help="Step sizes to compare")
+    parser.add_argument("--wal", action="store_true", help="Put the database in WAL journal mode first")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        db = DatabaseConnection(db_path)
+        DatabaseSchema.initialize_database(db)
+        stats = synthetic.load(db, args.users, args.days, drop_indexes=True)
+        if args.wal:
+            db.fetch_one("PRAGMA journal_mode=wal")
+        db.close()
+        print(f"{stats.entries} entries, {os.path.getsize(db_path) / 1e6:.1f} MB")
+
+        with Writer(db_path, args.write_every) as writer:
+            time.sleep(2)
+        print(f"{'no backup':<14}{'':>40}  write ms {describe_latencies(writer.latencies)}")
+
+        store = SnapshotStore(os.path.join(workdir, "backups"))
+        print(f"{'pages/step':<14}{'seconds':>8}{'steps':>7}{'restarts':>9}{'longest ms':>11}{'new MB':>8}"
+              f"  write ms")
+        for pages in args.pages:
+            with Writer(db_path, args.write_every) as writer:
+                snapshot = store.snapshot(db_path, pages=pages)
+            backup = snapshot.stats
+            single = "*" if backup.single_step else ""
+            print(f"{pages:<14}{backup.seconds:>8.2f}{backup.steps:>7}{backup.restarts:>8}{single:1}"
+                  f"{backup.longest_step_ms:>11.1f}{backup.new_bytes / 1e6:>8.2f}"
+                  f"  {describe_latencies(writer.latencies)}")
+        print("* finished in a single step after too many restarts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark batched recognition against one request per image.
+
+Runs the visual estimator on the offline fake model: every request costs
+--latency seconds plus --image-latency for each further image it carries,
+roughly how a hosted model's fixed overhead compares with its per-image work.
+Reports requests, prompt characters sent, wall time and time to first result.
+Run from the Calorie_Tracker directory:
+    python -m benchmarks.bench_batching --images 64 --batch-size 8 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.fake_genai import FakeGenAIClient
+from backend.image_recognition import VisualEstimator
+
+
+def run(images, workers: int, batch_size: int, client: FakeGenAIClient):
+    """(wall seconds, seconds to first result, prompt characters) recognizing the images on `workers` threads."""
+    estimator = VisualEstimator()
+    estimator.client = client
+    prompts = []
+    generate = client.models.generate_content
+
+    def counted(model, contents, config=None):
+        prompts.append(len(contents[0]))
+        return generate(model, contents, config)
+
+    client.models.generate_content = counted
+    chunks = [images[start:start + batch_size] for start in range(0, len(images), batch_size)]
+    started = time.perf_counter()
+    first = []
+
+    def recognize(chunk):
+        results = estimator.recognize_batch(chunk, batch_size=batch_size)
+        first.append(time.perf_counter() - started)
+        return results
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = [result for batch in executor.map(recognize, chunks) for result in batch]
+    assert all(result.success for result in results)
+    return time.perf_counter() - started, min(first), sum(prompts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched image recognition requests.")
+    parser.add_argument("--images", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per batched request")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per request")
+    parser.add_argument("--image-latency", type=float, default=0.05, help="Seconds per further image in a request")
+    parser.add_argument("--slot-failure-rate", type=float, default=0.0, help="Share of images a batched reply leaves out")
+    args = parser.parse_args()
+
+    os.environ["CALORIE_FAKE_GENAI"] = "1"  # the recognizers are handed their own fake clients below
+    from google.genai import types  # noqa: F401  imported by the first request otherwise, and slow
+    images = [n.to_bytes(4, "big") * 64 for n in range(args.images)]
+    print(f"{'mode':<12}{'requests':>10}{'prompt chars':>14}{'wall s':>9}{'first s':>9}{'images/s':>10}")
+    for label, batch_size in (("per image", 1), (f"batch of {args.batch_size}", args.batch_size)):
+        client = FakeGenAIClient(
+            latency=args.latency,
+            image_latency=args.image_latency,
+            slot_failure_rate=args.slot_failure_rate if batch_size > 1 else 0.0,
+            seed=1
+        )
+        wall, first, prompt = run(images, args.workers, batch_size, client)
+        print(f"{label:<12}{client.models.calls:>10}{prompt:>14}{wall:>9.2f}{first:>9.2f}{args.images / wall:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark the cross-process cache: read latency, hit rate and stale reads.
+
+Loads synthetic users into a temporary database and starts a second process
+that logs an entry for a random user every --write-every seconds, as another
+server process would. Meanwhile this process reads weekly summaries of those
+users uncached, through the coherent cache, and through a plain dict that is
+never invalidated. After the writer stops, every cached summary is compared
+with a fresh one; the coherent cache should hold none that are stale. Run
+from the Calorie_Tracker directory:
+    python -m benchmarks.bench_coherence --users 200 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from database import CalorieRepository, DatabaseConnection, DatabaseSchema, get_change_feed, synthetic
+from database.coherence import get_shared_cache
+
+
+def write(db_path: str, user_ids, every: float, seconds: float, seed: int):
+    """Log entries for random users from another process."""
+    rng = random.Random(seed)
+    repository = CalorieRepository(DatabaseConnection(db_path))
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        repository.insert_entry({
+            "user_id": rng.choice(user_ids),
+            "calories": rng.randint(50, 900),
+            "food_name": "probe",
+            "logged_at": datetime.now().isoformat(sep=" "),
+        })
+        time.sleep(every)
+
+
+def describe(latencies) -> str:
+    latencies = sorted(latencies)
+    return f"p50 {statistics.median(latencies) * 1000:7.3f}  p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cache coherence against writes from another process.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seconds", type=float, default=10.0, help="How long the other process writes")
+    parser.add_argument("--write-every", type=float, default=0.01, help="Seconds between its writes")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        db = DatabaseConnection(db_path)
+        DatabaseSchema.initialize_database(db)
+        stats = synthetic.load(db, args.users, args.days, seed=args.seed, drop_indexes=True)
+        user_ids = [row[0] for row in db.fetch_all("SELECT id FROM users")]
+        print(f"{stats.entries} entries for {stats.users} users")
+
+        repository = CalorieRepository(db)
+        feed = get_change_feed(db_path)
+        feed.poll()
+        started = time.perf_counter()
+        for _ in range(10000):
+            feed.poll()
+        print(f"poll with nothing committed: {(time.perf_counter() - started) / 10000 * 1e6:.1f} us")
+
+        writer = multiprocessing.get_context("spawn").Process(
+            target=write, args=(db_path, user_ids, args.write_every, args.seconds, args.seed)
+        )
+        writer.start()
+        rng = random.Random(args.seed)
+        plain = {}
+        timings = {"uncached": [], "coherent cache": [], "plain dict": []}
+        while writer.is_alive():
+            user_id = rng.choice(user_ids)
+            now = datetime.now().replace(second=0, microsecond=0)
+            for label, read in (
+                ("uncached", lambda: repository.weekly_summary(user_id, now)),
+                ("coherent cache", lambda: repository.weekly_summary(user_id)),
+                ("plain dict", lambda: plain.get(user_id) or plain.setdefault(
+                    user_id, repository.weekly_summary(user_id, now))),
+            ):
+                started = time.perf_counter()
+                read()
+                timings[label].append(time.perf_counter() - started)
+        writer.join()
+
+        cache = get_shared_cache("weekly_summary", "entries", db_path)
+        hits = cache.hits
+        stale_coherent = 0
+        for user_id in user_ids:
+            summary = repository.weekly_summary(user_id)
+            now = datetime.now().replace(second=0, microsecond=0)
+            stale_coherent += summary["total"] != repository.weekly_summary(user_id, now)["total"]
+        end_hits = cache.hits - hits
+        stale_plain = sum(value["total"] != repository.weekly_summary(user_id, now)["total"]
+                          for user_id, value in plain.items())
+
+        print(f"{'reads':<16}{'count':>7}  ms")
+        for label, latencies in timings.items():
+            print(f"{label:<16}{len(latencies):>7}  {describe(latencies)}")
+        print(f"coherent cache: hit rate {cache.hits / max(1, cache.hits + cache.misses):.0%}, "
+              f"{feed.scans} of {feed.polls} polls found commits, "
+              f"after the writes {end_hits} of {len(user_ids)} reads hit, {stale_coherent} stale")
+        print(f"plain dict: {stale_plain} of {len(plain)} stale")
+
+
+if __name__ == "__main__":
+    main()
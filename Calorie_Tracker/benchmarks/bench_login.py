@@ -0,0 +1,54 @@
+"""Benchmark password verifications (logins) per second at different pool sizes.
+
+Run from the Calorie_Tracker directory:
+    python -m benchmarks.bench_login --pool-sizes 0 1 2 4 --sessions 16 --logins 64
+
+Pool size 0 hashes inline on the calling thread, like the original code.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.auth import PasswordManager, configure_hashing_pool, DEFAULT_ITERATIONS
+
+
+def run_logins(password_hash: str, sessions: int, logins: int):
+    """Verify `logins` passwords from `sessions` concurrent threads."""
+    def login(_):
+        started = time.perf_counter()
+        assert PasswordManager.verify_password("benchmark-password", password_hash)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as sessions_pool:
+        latencies = list(sessions_pool.map(login, range(logins)))
+    return time.perf_counter() - started, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput.")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent login threads")
+    parser.add_argument("--logins", type=int, default=64, help="Logins per pool size")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    args = parser.parse_args()
+
+    print(f"PBKDF2 iterations: {args.iterations}, sessions: {args.sessions}, logins: {args.logins}")
+    print(f"{'pool':>6} {'logins/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for pool_size in args.pool_sizes:
+        pool = configure_hashing_pool(pool_size)
+        password_hash = PasswordManager.hash_password("benchmark-password", args.iterations)
+        # warm up so worker start-up isn't counted
+        run_logins(password_hash, max(pool_size, 1), max(pool_size, 1))
+
+        elapsed, latencies = run_logins(password_hash, args.sessions, args.logins)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{pool_size:>6} {args.logins / elapsed:>10.1f} "
+              f"{statistics.median(latencies) * 1000:>10.1f} {p95 * 1000:>10.1f}")
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
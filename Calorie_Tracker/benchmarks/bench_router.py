@@ -0,0 +1,116 @@
+"""Exercise the model router offline: tiers by difficulty, budgets and an outage.
+
+Sends synthetic label shots, plain plates and cluttered plates through the
+visual estimator on the fake model, where every configured model has its own
+latency, under a generous and two tight latency budgets; then fails the
+strongest model and repeats. Prints the models chosen per difficulty and
+budget, how often the budget was missed, and the model_routes log. Run from
+the Calorie_Tracker directory:
+    python -m benchmarks.bench_router --requests 40
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.fake_genai import FakeGenAIClient
+from backend.image_recognition import VisualEstimator
+from backend.latency import Deadline
+from backend.model_router import ModelRouter, image_difficulty
+from database import DatabaseConnection, DatabaseSchema
+
+MODELS = ["gemini-2.5-flash-lite", "gemini-2.5-flash", "gemini-2.5-pro"]
+LATENCY = {"gemini-2.5-flash-lite": 0.05, "gemini-2.5-flash": 0.15, "gemini-2.5-pro": 0.6}
+
+
+def encode(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def label_shot(rng: random.Random) -> bytes:
+    """Black rows of "text" on a white card."""
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (480, 640), (245, 245, 240))
+    draw = ImageDraw.Draw(image)
+    for row in range(40, 600, 22):
+        x = 30
+        while x < 430:
+            width = rng.randint(8, 40)
+            draw.rectangle((x, row, x + width, row + 12), fill=(20, 20, 20))
+            x += width + rng.randint(6, 12)
+    return encode(image)
+
+
+def plate(rng: random.Random, cluttered: bool) -> bytes:
+    """A soft-focus plate with a few foods, or a sharp, busy table of them."""
+    from PIL import Image, ImageDraw, ImageFilter
+    image = Image.new("RGB", (640, 480), tuple(rng.randint(60, 200) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((120, 60, 520, 420), fill=(250, 250, 250))
+    for _ in range(rng.randint(150, 250) if cluttered else rng.randint(2, 5)):
+        x, y = rng.randint(0, 640), rng.randint(0, 480)
+        size = rng.randint(3, 12) if cluttered else rng.randint(30, 70)
+        draw.ellipse((x - size, y - size, x + size, y + size), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return encode(image if cluttered else image.filter(ImageFilter.GaussianBlur(3)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise the model router on the fake model.")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per image kind and budget")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["CALORIE_FAKE_GENAI"] = "1"  # the estimator is handed its own fake client below
+    rng = random.Random(args.seed)
+    images = {
+        "label shot": [label_shot(rng) for _ in range(5)],
+        "plain plate": [plate(rng, cluttered=False) for _ in range(5)],
+        "cluttered plate": [plate(rng, cluttered=True) for _ in range(5)],
+    }
+    for kind, samples in images.items():
+        print(f"{kind:<16} difficulty {Counter(map(image_difficulty, samples)).most_common()}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        DatabaseSchema.initialize_database(DatabaseConnection(db_path))
+        router = ModelRouter(MODELS, db_path=db_path)
+        estimator = VisualEstimator(router=router)
+        estimator.client = FakeGenAIClient(model_latency=LATENCY, jitter=0.02, seed=args.seed)
+
+        def phase(title: str):
+            print(f"\n{title}")
+            print(f"{'images':<16}{'budget s':>9}  {'models':<60}{'missed':>7}")
+            for budget in (10.0, 0.4, 0.1):
+                for kind, samples in images.items():
+                    def request(n):
+                        deadline = Deadline.after(budget)
+                        result = estimator.recognize(samples[n % len(samples)], deadline)
+                        return result.success and not deadline.expired()
+
+                    before = Counter(estimator.client.models.calls_by_model)
+                    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                        met = list(executor.map(request, range(args.requests)))
+                    used = Counter(estimator.client.models.calls_by_model) - before
+                    models = ", ".join(f"{model.replace('gemini-2.5-', '')} {count}" for model, count in used.items())
+                    print(f"{kind:<16}{budget:>9.1f}  {models:<60}{met.count(False):>7}")
+
+        phase("All models healthy")
+        estimator.client.models.model_failure_rate = {"gemini-2.5-pro": 1.0}
+        phase("gemini-2.5-pro failing")
+
+        print("\nmodel_routes:")
+        for row in DatabaseConnection(db_path).fetch_all(
+            "SELECT model, difficulty, COUNT(*), SUM(success), AVG(latency_ms) FROM model_routes "
+            "GROUP BY model, difficulty ORDER BY model, difficulty"
+        ):
+            print(f"  {row[0]:<24}{row[1]:<8}{row[2]:>5} calls {row[3]:>5} ok  avg {row[4]:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark entry search: the calories_fts index against LIKE scans.
+
+Loads synthetic entries (about a million rows by default) into a temporary
+database, then runs the same searches through EntrySearch and through the
+LIKE query it replaces, for one user (what the search box does) and across
+all users. Run from the Calorie_Tracker directory:
+    python -m benchmarks.bench_search --users 750 --days 180 --queries 100
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from database import DatabaseConnection, DatabaseSchema, EntrySearch
+from database import synthetic
+from database.search import SEARCHED_COLUMNS
+
+LIKE_FILTER = "(food_name LIKE :term OR food_type LIKE :term OR notes LIKE :term)"
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.95) - 1)]
+
+
+def timed(run, queries):
+    """Latencies in ms of run(user_id, word) over the queries."""
+    latencies = []
+    for user_id, word in queries:
+        started = time.perf_counter()
+        run(user_id, word)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full-text entry search against LIKE.")
+    parser.add_argument("--users", type=int, default=750, help="Synthetic users to create")
+    parser.add_argument("--days", type=int, default=180, help="Days of entries per user")
+    parser.add_argument("--queries", type=int, default=100, help="Searches of each kind")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = sorted({
+        word.lower()
+        for foods in synthetic.FOODS.values()
+        for name, food_type, *_ in foods
+        for word in (name.split() + [food_type])
+    })
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = DatabaseConnection(os.path.join(workdir, "bench.db"))
+        DatabaseSchema.initialize_database(db)
+        stats = synthetic.load(db, args.users, args.days, seed=args.seed, drop_indexes=True)
+        print(f"Loaded {stats.entries} entries for {stats.users} users in {stats.seconds:.1f} s")
+
+        user_ids = [row[0] for row in db.fetch_all("SELECT id FROM users")]
+        queries = [(rng.choice(user_ids), rng.choice(words)) for _ in range(args.queries)]
+        # partial words, e.g. "chick" for chicken, fall back to a prefix search
+        partial = [(user_id, word[:rng.randint(3, max(3, len(word) - 1))]) for user_id, word in queries]
+        search = EntrySearch(db)
+
+        def fts_user(user_id, word):
+            search.search(user_id, word, page_size=args.page_size)
+
+        def like_user(user_id, word):
+            params = {"user_id": user_id, "term": f"%{word}%", "limit": args.page_size}
+            db.fetch_one(f"SELECT COUNT(*) FROM calories WHERE user_id = :user_id AND {LIKE_FILTER}", params)
+            db.fetch_all(
+                f"SELECT * FROM calories WHERE user_id = :user_id AND {LIKE_FILTER} "
+                "ORDER BY logged_at DESC LIMIT :limit",
+                params
+            )
+
+        def fts_all(user_id, word):
+            query = f'{SEARCHED_COLUMNS} : ("{word}"*)'
+            db.fetch_one("SELECT COUNT(*) FROM calories_fts WHERE calories_fts MATCH ?", (query,))
+            db.fetch_all(
+                "SELECT rowid FROM calories_fts WHERE calories_fts MATCH ? ORDER BY rowid DESC LIMIT ?",
+                (query, args.page_size)
+            )
+
+        def like_all(user_id, word):
+            params = {"term": f"%{word}%", "limit": args.page_size}
+            db.fetch_one(f"SELECT COUNT(*) FROM calories WHERE {LIKE_FILTER}", params)
+            db.fetch_all(f"SELECT * FROM calories WHERE {LIKE_FILTER} ORDER BY logged_at DESC LIMIT :limit", params)
+
+        print(f"{'search':<24}{'p50 ms':>10}{'p95 ms':>10}")
+        for label, run, batch in (
+            ("one user, FTS5", fts_user, queries),
+            ("one user, FTS5 prefix", fts_user, partial),
+            ("one user, LIKE", like_user, queries),
+            ("all users, FTS5", fts_all, partial),
+            # full-table scans; a handful is enough for a stable median
+            ("all users, LIKE", like_all, partial[:10]),
+        ):
+            p50, p95 = percentiles(timed(run, batch))
+            print(f"{label:<24}{p50:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
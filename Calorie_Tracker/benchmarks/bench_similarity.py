@@ -0,0 +1,103 @@
+"""Benchmark near-duplicate lookups: latency, hit rate and false hits.
+
+Builds a user with synthetic "meal" photos in a temporary database, then looks
+up re-shot versions of those meals (shifted, rescaled, recompressed, brighter)
+and unrelated meals. Run from the Calorie_Tracker directory:
+    python -m benchmarks.bench_similarity --images 500 --queries 200
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from backend.similarity import SimilarityIndex
+from database import DatabaseConnection, DatabaseSchema
+from domain import FoodItemDetection, ImageRecognitionResult
+
+
+def meal(seed: int):
+    """A plate with a few colored blobs on a tinted table, deterministic per seed."""
+    from PIL import Image, ImageDraw, ImageFilter
+    rng = random.Random(seed)
+    image = Image.new("RGB", (640, 480), tuple(rng.randint(40, 220) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    cx, cy, r = rng.randint(200, 440), rng.randint(160, 320), rng.randint(140, 230)
+    draw.ellipse((cx - r, cy - r * 0.8, cx + r, cy + r * 0.8),
+                 fill=tuple(rng.randint(200, 255) for _ in range(3)))
+    for _ in range(rng.randint(2, 6)):
+        x, y, s = cx + rng.randint(-r // 2, r // 2), cy + rng.randint(-r // 3, r // 3), rng.randint(25, 80)
+        draw.ellipse((x - s, y - s, x + s, y + s), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return image.filter(ImageFilter.GaussianBlur(3))
+
+
+def reshoot(image, rng: random.Random) -> bytes:
+    """Same meal photographed again: small shift and zoom, exposure change, new JPEG."""
+    from PIL import ImageEnhance
+    width, height = image.size
+    dx, dy = rng.randint(-20, 20), rng.randint(-20, 20)
+    zoom = rng.uniform(0.0, 0.06)
+    box = (
+        max(0, int(width * zoom) + dx), max(0, int(height * zoom) + dy),
+        min(width, int(width * (1 - zoom)) + dx), min(height, int(height * (1 - zoom)) + dy)
+    )
+    shot = ImageEnhance.Brightness(image.crop(box).resize(image.size)).enhance(rng.uniform(0.9, 1.1))
+    return encode(shot, quality=rng.randint(70, 95))
+
+
+def encode(image, quality: int = 90) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate image index.")
+    parser.add_argument("--images", type=int, default=500, help="Images already recognized for the user")
+    parser.add_argument("--queries", type=int, default=200, help="Lookups of each kind")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    result = ImageRecognitionResult(
+        success=True,
+        method="visual_estimation",
+        detected_items=[FoodItemDetection(calories=350, food_name="Oatmeal", quantity=1, unit="bowl")]
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = DatabaseConnection(os.path.join(workdir, "bench.db"))
+        DatabaseSchema.initialize_database(db)
+        db.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@example.com', 'x')")
+        user_id = db.fetch_one("SELECT id FROM users")[0]
+
+        index = SimilarityIndex()
+        started = time.perf_counter()
+        for seed in range(args.images):
+            index.add(user_id, encode(meal(seed)), result, db=db)
+        print(f"Indexed {args.images} images in {time.perf_counter() - started:.1f} s")
+
+        def timed_lookups(images):
+            latencies, hits = [], 0
+            for image_bytes in images:
+                started = time.perf_counter()
+                hits += index.lookup(user_id, image_bytes, db=db) is not None
+                latencies.append((time.perf_counter() - started) * 1000)
+            return hits, latencies
+
+        repeats = [reshoot(meal(rng.randrange(args.images)), rng) for _ in range(args.queries)]
+        novel = [encode(meal(args.images + 1000 + n)) for n in range(args.queries)]
+        repeat_hits, repeat_latencies = timed_lookups(repeats)
+        novel_hits, novel_latencies = timed_lookups(novel)
+
+    latencies = sorted(repeat_latencies + novel_latencies)
+    print(f"Hit rate on re-shot meals:   {repeat_hits / args.queries:.1%}")
+    print(f"False hits on new meals:     {novel_hits / args.queries:.1%}")
+    print(f"Lookup latency (fingerprint + search): p50 {statistics.median(latencies):.2f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
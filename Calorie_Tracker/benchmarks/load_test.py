@@ -0,0 +1,456 @@
+"""Concurrent-session load test: a scaling curve of page latency, DB waits and errors.
+
+Each simulated user signs up once, then repeatedly logs in, saves a manual
+entry, recognizes a photo with the offline fake model (CALORIE_FAKE_GENAI)
+and opens the metrics page. Everything runs against a fresh database in a
+temporary directory.
+
+Two drivers:
+  apptest  Runs the real pages with Streamlit's AppTest. AppTest can only run
+           one script at a time per process, so every session is its own
+           process sharing the SQLite file; contention shows up as SQLite
+           lock waits and CPU, not as contention on in-process globals.
+  threads  Every session is a thread in one process making the same calls
+           the pages make (password check, token, inserts, job queue,
+           metrics queries) through the shared get_database() connection,
+           the way one Streamlit server process serves its sessions.
+
+Run from the Calorie_Tracker directory:
+    python -m benchmarks.load_test --driver threads --sessions 1 2 4 8 16
+    python -m benchmarks.load_test --driver apptest --sessions 1 2 4 --output curve.json
+    python -m benchmarks.load_test --sessions 1 4 8 --check curve.json   # exit 1 on regression
+
+The file upload widget can't be driven from AppTest, so the apptest driver
+queues the photo through the same job queue call the upload button makes and
+then reruns the Log Calories page until the job finishes.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "load-test-1"
+JOB_TIMEOUT = 60  # seconds to wait for a recognition job
+SESSION_TIMEOUT = 600  # seconds an apptest session process may run before it counts as failed
+DB_STALL_MS = 100  # database calls slower than this count as stalls (mostly lock waits)
+DB_METHODS = ("execute", "execute_many", "fetch_one", "fetch_all")
+
+
+class Recorder:
+    """Thread-safe collection of step latencies, database call times and errors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps: Dict[str, List[float]] = defaultdict(list)
+        self.db_calls: List[float] = []
+        self.lock_errors = 0
+        self.errors: List[str] = []
+
+    def step(self, name: str, seconds: float):
+        with self._lock:
+            self.steps[name].append(seconds)
+
+    def db_call(self, seconds: float):
+        with self._lock:
+            self.db_calls.append(seconds)
+
+    def error(self, message: str):
+        with self._lock:
+            self.errors.append(message)
+            if "locked" in message:
+                self.lock_errors += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "steps": dict(self.steps),
+            "db_calls": self.db_calls,
+            "lock_errors": self.lock_errors,
+            "errors": self.errors,
+        }
+
+
+_recorder: Recorder = None  # receives the timings of the instrumented database calls
+
+
+def instrument_database(recorder: Recorder):
+    """Time every DatabaseConnection call, including those of job worker threads."""
+    import sqlite3
+    from database import DatabaseConnection
+
+    global _recorder
+    first = _recorder is None
+    _recorder = recorder
+    if not first:
+        return
+
+    def wrap(method):
+        def timed(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                _recorder.error(f"sqlite: {e}")
+                raise
+            finally:
+                _recorder.db_call(time.perf_counter() - started)
+        return timed
+
+    for name in DB_METHODS:
+        setattr(DatabaseConnection, name, wrap(getattr(DatabaseConnection, name)))
+
+
+def photo(seed: int) -> bytes:
+    """A small JPEG that differs per seed."""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 240), ((seed * 53) % 256, (seed * 97) % 256, (seed * 29) % 256)).save(
+        buffer, format="JPEG"
+    )
+    return buffer.getvalue()
+
+
+def wait_for_job(job_id: int, rerun=None) -> str:
+    """Poll a recognition job until it finishes; `rerun` is called between polls."""
+    from backend import get_job_queue
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while time.monotonic() < deadline:
+        status = get_job_queue().get_job(job_id)["status"]
+        if status in ("done", "failed"):
+            return status
+        if rerun:
+            rerun()
+        time.sleep(0.1)
+    return "timeout"
+
+
+# --- apptest driver -------------------------------------------------------
+
+def _page(name: str) -> str:
+    return os.path.join(APP_ROOT, name)
+
+
+def _timed_run(recorder: Recorder, step: str, app):
+    started = time.perf_counter()
+    app.run()
+    recorder.step(step, time.perf_counter() - started)
+    for exception in app.exception:
+        recorder.error(f"{step}: {exception.value}")
+    return app
+
+
+def _button(app, label: str):
+    return next(button for button in app.button if button.label == label)
+
+
+def apptest_session(session: int, iterations: int, run_id: str) -> dict:
+    """One simulated browser session driven through the real pages."""
+    from streamlit.testing.v1 import AppTest
+    from backend import get_job_queue
+
+    recorder = Recorder()
+    instrument_database(recorder)
+    username = f"load_{run_id}_{session}"
+    auth_keys = ("current_user", "authenticated", "session_token")
+
+    def app(page: str, state: dict = None):
+        test = AppTest.from_file(_page(page), default_timeout=JOB_TIMEOUT)
+        for key, value in (state or {}).items():
+            test.session_state[key] = value
+        return test
+
+    try:
+        signup = _timed_run(recorder, "login page", app("pages/1_Login.py"))
+        _button(signup, "Sign Up").click()
+        _timed_run(recorder, "login page", signup)
+        for index, value in enumerate((username, f"{username}@example.com", PASSWORD, PASSWORD)):
+            signup.text_input[index].input(value)
+        _button(signup, "Submit").click()
+        _timed_run(recorder, "sign up", signup)
+
+        for iteration in range(iterations):
+            login = _timed_run(recorder, "login page", app("pages/1_Login.py"))
+            login.text_input[0].input(username)
+            login.text_input[1].input(PASSWORD)
+            _button(login, "Login").click()
+            _timed_run(recorder, "login", login)
+            if not login.session_state["authenticated"]:
+                recorder.error("login: not authenticated")
+                continue
+            state = {key: login.session_state[key] for key in auth_keys}
+
+            log_page = _timed_run(recorder, "log calories", app("pages/3_Log_Calories.py", state))
+            log_page.text_input[0].input(f"Load test meal {iteration}")
+            log_page.number_input[0].set_value(250.0)
+            _button(log_page, "Save Entry").click()
+            _timed_run(recorder, "save entry", log_page)
+
+            started = time.perf_counter()
+            job_id = get_job_queue().enqueue(state["current_user"].id, photo(session * 1000 + iteration))
+            status = wait_for_job(job_id, lambda: _timed_run(recorder, "log calories", log_page))
+            recorder.step("recognition", time.perf_counter() - started)
+            if status != "done":
+                recorder.error(f"recognition: job {status}")
+
+            _timed_run(recorder, "metrics", app("pages/4_User_Metrics.py", state))
+    except Exception:
+        recorder.error(traceback.format_exc(limit=3))
+    return recorder.to_dict()
+
+
+def run_apptest(sessions: int, iterations: int, run_id: str) -> List[dict]:
+    context = multiprocessing.get_context("spawn")
+    pipes, processes = [], []
+    for session in range(sessions):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_session_process,
+                                  args=(sender, os.getcwd(), session, iterations, run_id))
+        process.start()
+        pipes.append(receiver)
+        processes.append(process)
+    deadline = time.monotonic() + SESSION_TIMEOUT
+    results = []
+    for session, (receiver, process) in enumerate(zip(pipes, processes)):
+        results.append(_receive(session, receiver, process, deadline))
+    for process in processes:
+        process.join()
+    return results
+
+
+def _receive(session: int, receiver, process, deadline: float) -> dict:
+    """A session process's results, or a failed session if it dies or hangs first."""
+    while not receiver.poll(1):
+        if not process.is_alive():
+            # it may have sent its results just before exiting
+            if receiver.poll(0):
+                break
+            failed = Recorder()
+            failed.error(f"session {session}: process exited with code {process.exitcode}")
+            return failed.to_dict()
+        if time.monotonic() > deadline:
+            process.terminate()
+            failed = Recorder()
+            failed.error(f"session {session}: no result after {SESSION_TIMEOUT} s")
+            return failed.to_dict()
+    return receiver.recv()
+
+
+def _session_process(sender, workdir: str, session: int, iterations: int, run_id: str):
+    os.chdir(workdir)
+    sys.path.insert(0, APP_ROOT)
+    from backend import get_job_queue
+    from utils.auth import get_hashing_pool
+    queue = get_job_queue()
+    try:
+        sender.send(apptest_session(session, iterations, run_id))
+    finally:
+        sender.close()
+        # stop the workers rather than leave PBKDF2 processes holding the parent's stdout
+        queue.shutdown()
+        get_hashing_pool().shutdown()
+
+
+# --- threads driver -------------------------------------------------------
+
+def thread_session(session: int, iterations: int, run_id: str, recorder: Recorder):
+    """One simulated session making the pages' backend calls on the shared connection."""
+    from datetime import datetime
+    from backend import get_job_queue
+    from database import CalorieRepository, get_database
+    from domain import User
+    from utils import PasswordManager
+    from utils.tokens import get_token_store
+
+    def step(name, function, *args):
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        except Exception as e:
+            recorder.error(f"{name}: {type(e).__name__}: {e}")
+        finally:
+            recorder.step(name, time.perf_counter() - started)
+
+    db = get_database()
+    username = f"load_{run_id}_{session}"
+
+    def sign_up():
+        db.execute(
+            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+            (username, f"{username}@example.com", PasswordManager.hash_password(PASSWORD))
+        )
+
+    def login():
+        row = db.fetch_one("SELECT id, username, email, password_hash FROM users WHERE username = ?", (username,))
+        if not PasswordManager.verify_password(PASSWORD, row[3]):
+            raise ValueError("password rejected")
+        user = User(id=row[0], username=row[1], email=row[2])
+        get_token_store().issue(user)
+        return user
+
+    def save_entry(user, iteration):
+        CalorieRepository(db).insert_entries([{
+            "user_id": user.id, "calories": 250.0, "food_name": f"Load test meal {iteration}",
+            "food_type": "other", "quantity": 1.0, "unit": "serving(s)", "source": "estimate",
+            "logged_at": datetime.now(),
+        }])
+        CalorieRepository(db).recent_entries(user.id)
+
+    def recognize(user, iteration):
+        job_id = get_job_queue().enqueue(user.id, photo(session * 1000 + iteration))
+        status = wait_for_job(job_id)
+        if status != "done":
+            raise RuntimeError(f"job {status}")
+
+    def metrics(user):
+        # the metrics page's queries, through the same cache and archive-aware reads
+        repository = CalorieRepository(db)
+        repository.weekly_summary(user.id)
+        repository.recent_entries(user.id, limit=50)
+
+    step("sign up", sign_up)
+    for iteration in range(iterations):
+        user = step("login", login)
+        if user is None:
+            continue
+        step("save entry", save_entry, user, iteration)
+        step("recognition", recognize, user, iteration)
+        step("metrics", metrics, user)
+
+
+def run_threads(sessions: int, iterations: int, run_id: str) -> List[dict]:
+    recorder = Recorder()
+    instrument_database(recorder)
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        for future in [pool.submit(thread_session, session, iterations, run_id, recorder)
+                       for session in range(sessions)]:
+            future.result()
+    return [recorder.to_dict()]
+
+
+# --- reporting ------------------------------------------------------------
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def summarize(sessions: int, results: List[dict], elapsed: float) -> dict:
+    steps: Dict[str, List[float]] = defaultdict(list)
+    db_calls, errors, lock_errors = [], [], 0
+    for result in results:
+        for name, samples in result["steps"].items():
+            steps[name].extend(samples)
+        db_calls.extend(result["db_calls"])
+        errors.extend(result["errors"])
+        lock_errors += result["lock_errors"]
+    return {
+        "sessions": sessions,
+        "elapsed_s": elapsed,
+        "steps_per_s": sum(len(samples) for samples in steps.values()) / elapsed,
+        "steps": {
+            name: {"count": len(samples),
+                   "p50_ms": statistics.median(samples) * 1000,
+                   "p95_ms": _percentile(samples, 95) * 1000}
+            for name, samples in sorted(steps.items())
+        },
+        "db_calls": len(db_calls),
+        "db_p95_ms": _percentile(db_calls, 95) * 1000,
+        "db_stalls": sum(1 for seconds in db_calls if seconds * 1000 > DB_STALL_MS),
+        "db_stall_s": sum(seconds for seconds in db_calls if seconds * 1000 > DB_STALL_MS),
+        "lock_errors": lock_errors,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+    }
+
+
+def print_summary(summary: dict):
+    print(f"\n{summary['sessions']} sessions: {summary['elapsed_s']:.1f} s, "
+          f"{summary['steps_per_s']:.1f} steps/s, {summary['errors']} errors "
+          f"({summary['lock_errors']} lock errors)")
+    print(f"  db: {summary['db_calls']} calls, p95 {summary['db_p95_ms']:.1f} ms, "
+          f"{summary['db_stalls']} stalls > {DB_STALL_MS} ms ({summary['db_stall_s']:.2f} s waiting)")
+    for name, stats in summary["steps"].items():
+        print(f"  {name:14} n={stats['count']:4}  p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms")
+    for sample in summary["error_samples"]:
+        print(f"  error: {sample.strip().splitlines()[-1]}")
+
+
+def check_regressions(curve: List[dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Compare p95 step latencies and error counts with a saved curve."""
+    with open(baseline_path) as baseline_file:
+        baseline = {point["sessions"]: point for point in json.load(baseline_file)["curve"]}
+    failures = []
+    for point in curve:
+        reference = baseline.get(point["sessions"])
+        if reference is None:
+            continue
+        if point["errors"] > reference["errors"]:
+            failures.append(f"{point['sessions']} sessions: {point['errors']} errors "
+                            f"(baseline {reference['errors']})")
+        for name, stats in point["steps"].items():
+            limit = reference["steps"].get(name, {}).get("p95_ms")
+            if limit and stats["p95_ms"] > limit * tolerance:
+                failures.append(f"{point['sessions']} sessions: {name} p95 {stats['p95_ms']:.0f} ms "
+                                f"> {tolerance}x baseline {limit:.0f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Calorie Tracker pages.")
+    parser.add_argument("--driver", choices=("apptest", "threads"), default="apptest")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Concurrent session counts to measure, one curve point each")
+    parser.add_argument("--iterations", type=int, default=3, help="Scenario repetitions per session")
+    parser.add_argument("--model-latency", type=float, default=0.3, help="Fake model latency in seconds")
+    parser.add_argument("--output", help="Write the curve as JSON")
+    parser.add_argument("--check", help="Baseline curve JSON; exit 1 if this run regresses")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed p95 growth for --check")
+    args = parser.parse_args()
+
+    # set before the app modules are imported, here and in spawned sessions
+    os.environ["CALORIE_FAKE_GENAI"] = "1"
+    os.environ["CALORIE_FAKE_GENAI_LATENCY"] = str(args.model_latency)
+    sys.path.insert(0, APP_ROOT)
+    # spawned sessions start in the temporary directory and must still import this module
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [APP_ROOT, os.getenv("PYTHONPATH")]))
+
+    curve = []
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # calories.db and images/ are relative to the working directory
+        from database import DatabaseSchema, get_database
+        DatabaseSchema.initialize_database(get_database())
+        run = run_apptest if args.driver == "apptest" else run_threads
+
+        for sessions in args.sessions:
+            started = time.perf_counter()
+            results = run(sessions, args.iterations, f"{sessions}_{int(time.time())}")
+            summary = summarize(sessions, results, time.perf_counter() - started)
+            print_summary(summary)
+            curve.append(summary)
+        os.chdir(APP_ROOT)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"driver": args.driver, "iterations": args.iterations,
+                       "model_latency": args.model_latency, "curve": curve}, output, indent=2)
+    if args.check:
+        failures = check_regressions(curve, args.check, args.tolerance)
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Import-time report and cold-start budget for the Streamlit entry points.
+
+Each entry point is executed in a fresh interpreter under `-X importtime` with
+a run name other than "__main__", so page bodies guarded by
+`if __name__ == "__main__"` don't render and only the imports are measured.
+
+Run from the Calorie_Tracker directory:
+    python -m benchmarks.startup_budget             # check budgets, exit 1 on failure
+    python -m benchmarks.startup_budget --report    # also rewrite importtime_report.txt
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(APP_ROOT, "benchmarks", "startup_budget.json")
+REPORT_FILE = os.path.join(APP_ROOT, "benchmarks", "importtime_report.txt")
+
+
+def measure(entry_point: str, workdir: str) -> Tuple[float, Dict[str, int], List[str]]:
+    """
+    Import an entry point once in a fresh interpreter.
+
+    Returns:
+        (total import milliseconds, cumulative microseconds per top-level import,
+         every module name imported)
+    """
+    script = (
+        "import runpy, sys; "
+        f"sys.path.insert(0, {APP_ROOT!r}); "
+        f"runpy.run_path({os.path.join(APP_ROOT, entry_point)!r}, run_name='__startup_budget__')"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=workdir,  # main.py creates calories.db in the working directory
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    top_level: Dict[str, int] = {}
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append(name.strip())
+        # nested imports are indented under the module that triggered them
+        if not name[1:].startswith(" "):
+            top_level[name.strip()] = int(cumulative)
+    return sum(top_level.values()) / 1000, top_level, modules
+
+
+def run(entry_points: List[str], runs: int) -> Dict[str, dict]:
+    """Median import time and the slowest imports for each entry point."""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for entry_point in entry_points:
+            samples = [measure(entry_point, workdir) for _ in range(runs)]
+            median_ms = statistics.median(sample[0] for sample in samples)
+            _, top_level, modules = samples[-1]
+            results[entry_point] = {
+                "median_ms": median_ms,
+                "slowest": sorted(top_level.items(), key=lambda item: -item[1])[:10],
+                "modules": set(modules),
+            }
+    return results
+
+
+def write_report(results: Dict[str, dict]):
+    lines = [
+        "Import-time report for the Streamlit entry points",
+        f"Python {sys.version.split()[0]}, median of fresh-interpreter runs",
+        "Regenerate with: python -m benchmarks.startup_budget --report",
+        "",
+    ]
+    for entry_point, result in results.items():
+        lines.append(f"{entry_point}: {result['median_ms']:.0f} ms")
+        for name, cumulative in result["slowest"]:
+            lines.append(f"    {cumulative / 1000:8.1f} ms  {name}")
+        lines.append("")
+    with open(REPORT_FILE, "w") as report:
+        report.write("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the cold-start import budget.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per entry point")
+    parser.add_argument("--report", action="store_true", help="Rewrite importtime_report.txt")
+    args = parser.parse_args()
+
+    with open(BUDGET_FILE) as budget_file:
+        budget = json.load(budget_file)
+
+    results = run(list(budget["budgets_ms"]), args.runs)
+    if args.report:
+        write_report(results)
+
+    failures = []
+    for entry_point, result in results.items():
+        limit = budget["budgets_ms"][entry_point]
+        status = "ok" if result["median_ms"] <= limit else "OVER BUDGET"
+        print(f"{entry_point:32} {result['median_ms']:7.0f} ms  (budget {limit} ms)  {status}")
+        if result["median_ms"] > limit:
+            failures.append(f"{entry_point} takes {result['median_ms']:.0f} ms, budget {limit} ms")
+        for module in budget["lazy_modules"]:
+            if module in result["modules"]:
+                failures.append(f"{entry_point} imports {module} at startup")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 """Database module with connection and schema management."""
 from .connection import DatabaseConnection, get_database
 from .schema import DatabaseSchema
+from .calorie_repository import CalorieRepository
+from .search import EntrySearch
+from .coherence import CoherentCache, get_change_feed
 
-__all__ = ["DatabaseConnection", "get_database", "DatabaseSchema"]
+__all__ = ["DatabaseConnection", "get_database", "DatabaseSchema", "CalorieRepository", "EntrySearch",
+           "CoherentCache", "get_change_feed"]
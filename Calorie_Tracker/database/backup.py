@@ -0,0 +1,434 @@
+"""Online backups of the database as incremental, verifiable snapshots.
+
+A snapshot copies the live database with SQLite's online backup API, a few
+pages per step with a pause between steps. In WAL mode (CALORIE_JOURNAL_MODE=wal)
+the copy holds one read transaction throughout: it sees a single consistent
+state of the database while writers keep committing to the WAL, so nobody
+waits on the backup. In the default rollback mode each step takes a short
+read lock and writes from other connections make SQLite restart the copy;
+after MAX_RESTARTS the copy is finished in a single step (a read lock held for
+the whole copy) so a busy database still gets backed up.
+
+The copy is stored as content-addressed, compressed chunks of CHUNK_PAGES
+pages plus a JSON manifest, so a snapshot only writes the chunks that changed
+since any earlier snapshot. Run from the Calorie_Tracker directory:
+    python -m database.backup snapshot
+    python -m database.backup schedule --every 3600 --keep 48
+    python -m database.backup list | verify <id> | restore <id> [--to PATH] | prune --keep 48
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+
+BACKUP_DIR = os.getenv("CALORIE_BACKUP_DIR", "backups")
+PAGES_PER_STEP = int(os.getenv("CALORIE_BACKUP_PAGES", "128"))
+STEP_PAUSE = float(os.getenv("CALORIE_BACKUP_PAUSE", "0.005"))  # seconds between steps
+MAX_RESTARTS = 3
+CHUNK_PAGES = 16
+
+
+class BackupError(Exception):
+    """Raised when a snapshot is missing, damaged or cannot be restored."""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+@dataclass
+class BackupStats:
+    """How a snapshot went and how much it could have held up writers."""
+
+    seconds: float = 0.0
+    journal_mode: str = ""  # the source's; "wal" copies never restart or block writers
+    steps: int = 0
+    restarts: int = 0
+    single_step: bool = False  # finished in one step after too many restarts
+    longest_step_ms: float = 0.0  # the longest a writer could have waited on the copy
+    new_chunks: int = 0
+    new_bytes: int = 0  # compressed bytes written for this snapshot
+
+
+@dataclass
+class Snapshot:
+    """Manifest of one snapshot: which chunks make up the database file."""
+
+    id: str
+    created_at: str
+    source: str
+    page_size: int
+    page_count: int
+    sha256: str
+    chunks: List[str]
+    chunk_pages: int = CHUNK_PAGES
+    stats: BackupStats = field(default_factory=BackupStats)
+
+    @property
+    def size(self) -> int:
+        return self.page_size * self.page_count
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Snapshot":
+        return cls(**{**data, "stats": BackupStats(**data.get("stats", {}))})
+
+
+def online_copy(
+    source_path: str,
+    target_path: str,
+    pages: int = PAGES_PER_STEP,
+    pause: float = STEP_PAUSE,
+    max_restarts: int = MAX_RESTARTS
+) -> BackupStats:
+    """
+    Copy a live database with the backup API, `pages` pages per step.
+
+    Returns:
+        BackupStats with the timing fields filled in
+    """
+    stats = BackupStats()
+    started = time.perf_counter()
+    last = {"remaining": None, "at": started}
+
+    def progress(status, remaining, total):
+        # the backup API only pauses when a step finds the database busy; pausing here
+        # after every step is what lets writers in between
+        stats.longest_step_ms = max(stats.longest_step_ms, (time.perf_counter() - last["at"]) * 1000)
+        stats.steps += 1
+        if last["remaining"] is not None and remaining > last["remaining"]:
+            stats.restarts += 1
+            if stats.restarts > max_restarts:
+                raise _TooManyRestarts()
+        if remaining:
+            time.sleep(pause)
+        last.update(remaining=remaining, at=time.perf_counter())
+
+    source = sqlite3.connect(source_path)
+    try:
+        stats.journal_mode = source.execute("PRAGMA journal_mode").fetchone()[0].lower()
+        target = sqlite3.connect(target_path)
+        try:
+            try:
+                if stats.journal_mode == "wal":
+                    # a read transaction pins one snapshot of the database for every step;
+                    # in rollback mode the same lock would stall writers for the whole copy
+                    source.execute("BEGIN")
+                    source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                source.backup(target, pages=pages, progress=progress, sleep=pause)
+            except _TooManyRestarts:
+                step_started = time.perf_counter()
+                source.backup(target, sleep=pause)
+                stats.single_step = True
+                stats.steps += 1
+                stats.longest_step_ms = max(stats.longest_step_ms, (time.perf_counter() - step_started) * 1000)
+            # a copy of a WAL database is in WAL mode too; keep snapshots as plain single files
+            target.execute("PRAGMA journal_mode=delete")
+        finally:
+            target.close()
+            if source.in_transaction:
+                source.rollback()
+    finally:
+        source.close()
+    stats.longest_step_ms = round(stats.longest_step_ms, 2)
+    stats.seconds = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def integrity_problems(path: str) -> List[str]:
+    """PRAGMA integrity_check messages for a database file; empty if it is sound."""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+    finally:
+        connection.close()
+    return [] if rows == ["ok"] else rows
+
+
+class SnapshotStore:
+    """Snapshots under a directory: snapshots/<id>.json manifests and chunks/<hash> pages."""
+
+    def __init__(self, directory: str = BACKUP_DIR):
+        self.directory = directory
+        self.snapshot_dir = os.path.join(directory, "snapshots")
+        self.chunk_dir = os.path.join(directory, "chunks")
+
+    def snapshot(self, db_path: str, pages: int = PAGES_PER_STEP, verify: bool = True) -> Snapshot:
+        """
+        Back up a live database and store it as a snapshot.
+
+        Args:
+            db_path: Database to back up; other connections keep writing meanwhile
+            pages: Pages copied per step
+            verify: Run an integrity check on the copy before storing it
+
+        Raises:
+            BackupError: if the copy fails its integrity check
+        """
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        snapshot_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        copy_path = os.path.join(self.directory, f"{snapshot_id}.db.tmp")
+        try:
+            stats = online_copy(db_path, copy_path, pages)
+            if verify:
+                problems = integrity_problems(copy_path)
+                if problems:
+                    raise BackupError(f"Copy of {db_path} failed its integrity check: {problems[:3]}")
+
+            connection = sqlite3.connect(copy_path)
+            page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+            connection.close()
+            chunks = []
+            digest = hashlib.sha256()
+            with open(copy_path, "rb") as copy:
+                for block in iter(lambda: copy.read(page_size * CHUNK_PAGES), b""):
+                    digest.update(block)
+                    chunk = hashlib.sha256(block).hexdigest()
+                    written = self._put_chunk(chunk, block)
+                    stats.new_chunks += written > 0
+                    stats.new_bytes += written
+                    chunks.append(chunk)
+            page_count = os.path.getsize(copy_path) // page_size
+        finally:
+            if os.path.exists(copy_path):
+                os.remove(copy_path)
+
+        snapshot = Snapshot(
+            id=snapshot_id,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+            source=os.path.abspath(db_path),
+            page_size=page_size,
+            page_count=page_count,
+            sha256=digest.hexdigest(),
+            chunks=chunks,
+            stats=stats,
+        )
+        self._write_atomic(self._manifest_path(snapshot_id), json.dumps(snapshot.to_dict(), indent=1).encode())
+        return snapshot
+
+    def list(self) -> List[Snapshot]:
+        """Every snapshot, oldest first."""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return [self.load(name[:-5]) for name in sorted(os.listdir(self.snapshot_dir)) if name.endswith(".json")]
+
+    def load(self, snapshot_id: str) -> Snapshot:
+        """Read a snapshot's manifest; "latest" names the newest one."""
+        if snapshot_id == "latest":
+            snapshots = self.list()
+            if not snapshots:
+                raise BackupError(f"No snapshots in {self.directory}")
+            return snapshots[-1]
+        try:
+            with open(self._manifest_path(snapshot_id)) as manifest:
+                return Snapshot.from_dict(json.load(manifest))
+        except FileNotFoundError:
+            raise BackupError(f"No snapshot {snapshot_id} in {self.directory}") from None
+
+    def verify(self, snapshot_id: str) -> List[str]:
+        """Problems with a snapshot: missing or corrupt chunks, a wrong checksum or integrity errors."""
+        snapshot = self.load(snapshot_id)
+        path = os.path.join(self.directory, f"{snapshot.id}.verify.tmp")
+        try:
+            try:
+                self._assemble(snapshot, path)
+            except BackupError as e:
+                return [str(e)]
+            return integrity_problems(path)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def restore(self, snapshot_id: str, target_path: str) -> Snapshot:
+        """
+        Rebuild a snapshot into target_path after checking it.
+
+        An existing target is overwritten through the backup API, so open
+        connections to it see the restored data instead of a replaced file.
+
+        Raises:
+            BackupError: if the snapshot is missing, damaged or fails its integrity check
+        """
+        snapshot = self.load(snapshot_id)
+        path = f"{target_path}.restore.tmp"
+        try:
+            self._assemble(snapshot, path)
+            problems = integrity_problems(path)
+            if problems:
+                raise BackupError(f"Snapshot {snapshot.id} failed its integrity check: {problems[:3]}")
+            if os.path.exists(target_path):
+                source = sqlite3.connect(path)
+                target = sqlite3.connect(target_path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+            else:
+                os.replace(path, target_path)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+        return snapshot
+
+    def prune(self, keep: int) -> int:
+        """Delete all but the newest `keep` snapshots and the chunks only they used; returns snapshots deleted."""
+        snapshots = self.list()
+        doomed = snapshots[:max(0, len(snapshots) - keep)]
+        for snapshot in doomed:
+            os.remove(self._manifest_path(snapshot.id))
+        used = {chunk for snapshot in snapshots[len(doomed):] for chunk in snapshot.chunks}
+        for prefix in os.listdir(self.chunk_dir) if os.path.isdir(self.chunk_dir) else []:
+            for name in os.listdir(os.path.join(self.chunk_dir, prefix)):
+                if name not in used:
+                    os.remove(os.path.join(self.chunk_dir, prefix, name))
+        return len(doomed)
+
+    def _assemble(self, snapshot: Snapshot, path: str):
+        digest = hashlib.sha256()
+        with open(path, "wb") as output:
+            for chunk in snapshot.chunks:
+                try:
+                    with open(self._chunk_path(chunk), "rb") as stored:
+                        block = zlib.decompress(stored.read())
+                except (FileNotFoundError, zlib.error) as e:
+                    raise BackupError(f"Chunk {chunk} of snapshot {snapshot.id} is unreadable: {e}") from e
+                if hashlib.sha256(block).hexdigest() != chunk:
+                    raise BackupError(f"Chunk {chunk} of snapshot {snapshot.id} is corrupt")
+                digest.update(block)
+                output.write(block)
+        if digest.hexdigest() != snapshot.sha256:
+            raise BackupError(f"Snapshot {snapshot.id} does not match its checksum")
+
+    def _put_chunk(self, chunk: str, block: bytes) -> int:
+        """Store a chunk unless it already is; returns the bytes written."""
+        path = self._chunk_path(chunk)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(block, 1)
+        self._write_atomic(path, data)
+        return len(data)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        partial = f"{path}.{threading.get_ident()}.part"
+        with open(partial, "wb") as output:
+            output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(partial, path)
+
+    def _chunk_path(self, chunk: str) -> str:
+        return os.path.join(self.chunk_dir, chunk[:2], chunk)
+
+    def _manifest_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{snapshot_id}.json")
+
+
+class BackupScheduler:
+    """Takes a snapshot every `interval` seconds on a daemon thread, keeping the newest `keep`."""
+
+    def __init__(self, db_path: str, store: Optional[SnapshotStore] = None, interval: float = 3600, keep: int = 48):
+        self.db_path = db_path
+        self.store = store or SnapshotStore()
+        self.interval = interval
+        self.keep = keep
+        self.last: Optional[Snapshot] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "BackupScheduler":
+        self._thread = threading.Thread(target=self._loop, name="backup", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.last = self.store.snapshot(self.db_path)
+                self.last_error = None
+                self.store.prune(self.keep)
+                print(describe(self.last), flush=True)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Backup failed: {e}", flush=True)
+            self._stop.wait(self.interval)
+
+
+def describe(snapshot: Snapshot) -> str:
+    stats = snapshot.stats
+    return (
+        f"{snapshot.id}  {snapshot.size / 1e6:.1f} MB in {stats.seconds:.2f} s, {stats.steps} steps "
+        f"({stats.journal_mode or 'unknown'} mode, "
+        f"longest {stats.longest_step_ms:.1f} ms, {stats.restarts} restarts"
+        f"{', single step' if stats.single_step else ''}), "
+        f"{stats.new_chunks}/{len(snapshot.chunks)} chunks new ({stats.new_bytes / 1e6:.2f} MB written)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up, verify and restore the calories database.")
+    parser.add_argument("--db", default="calories.db", help="Path to the SQLite database")
+    parser.add_argument("--dir", default=BACKUP_DIR, help="Snapshot directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot = commands.add_parser("snapshot", help="Take a snapshot now")
+    snapshot.add_argument("--pages", type=int, default=PAGES_PER_STEP, help="Pages copied per step")
+    schedule = commands.add_parser("schedule", help="Take snapshots periodically until interrupted")
+    schedule.add_argument("--every", type=float, default=3600, help="Seconds between snapshots")
+    schedule.add_argument("--keep", type=int, default=48, help="Snapshots to keep")
+    commands.add_parser("list", help="List snapshots")
+    verify = commands.add_parser("verify", help="Check a snapshot's chunks, checksum and integrity")
+    verify.add_argument("id", nargs="?", default="latest")
+    restore = commands.add_parser("restore", help="Rebuild a snapshot into a database file")
+    restore.add_argument("id", nargs="?", default="latest")
+    restore.add_argument("--to", help="Target file (default: --db)")
+    prune = commands.add_parser("prune", help="Delete old snapshots and unused chunks")
+    prune.add_argument("--keep", type=int, required=True)
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.dir)
+    try:
+        if args.command == "snapshot":
+            print(describe(store.snapshot(args.db, args.pages)))
+        elif args.command == "schedule":
+            scheduler = BackupScheduler(args.db, store, args.every, args.keep).start()
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                scheduler.stop()
+        elif args.command == "list":
+            for item in store.list():
+                print(describe(item))
+        elif args.command == "verify":
+            problems = store.verify(args.id)
+            print("ok" if not problems else "\n".join(problems))
+            raise SystemExit(1 if problems else 0)
+        elif args.command == "restore":
+            restored = store.restore(args.id, args.to or args.db)
+            print(f"Restored snapshot {restored.id} ({restored.created_at}) into {args.to or args.db}")
+        elif args.command == "prune":
+            print(f"Deleted {store.prune(args.keep)} snapshots")
+    except BackupError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Calorie entry queries and batched writes."""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from domain import CalorieBatch
+from .coherence import get_shared_cache
+from .connection import DatabaseConnection, get_database
+from .retention import ALL_CALORIES_VIEW, hot_boundary, needs_archives
+
+
+class CalorieRepository:
+    """
+    Reads and writes rows of the calories table for one user at a time.
+    
+    Reads whose date range reaches back past the retention boundary also read
+    the archive tables (through the all_calories view); writes and edits only
+    touch the hot table.
+    """
+    
+    EDITABLE_COLUMNS = ("calories", "food_name", "food_type", "quantity", "unit", "notes")
+    INSERT_COLUMNS = ("user_id", "calories", "food_name", "food_type",
+                      "quantity", "unit", "source", "image_path", "notes", "logged_at")
+    INSERT_SQL = (
+        f"INSERT INTO calories ({', '.join(INSERT_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in INSERT_COLUMNS)})"
+    )
+    
+    def __init__(self, db: Optional[DatabaseConnection] = None):
+        self.db = db or get_database()
+    
+    @staticmethod
+    def insert_params(entries: List[dict]) -> List[tuple]:
+        """Turn entry dicts (e.g. from convert_calorie_entires) into INSERT_SQL parameters."""
+        return [tuple(entry.get(column) for column in CalorieRepository.INSERT_COLUMNS)
+                for entry in entries]
+    
+    def insert_entries(self, entries: List[dict]) -> List[int]:
+        """Insert several entries in one transaction and return their ids."""
+        if not entries:
+            return []
+        with self.db.transaction() as cursor:
+            cursor.executemany(self.INSERT_SQL, self.insert_params(entries))
+            # the transaction holds the write lock, so AUTOINCREMENT handed out consecutive ids
+            last = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last - len(entries) + 1, last + 1))
+    
+    def insert_entry(self, entry: dict) -> int:
+        """Insert one entry and return its id."""
+        with self.db.transaction() as cursor:
+            cursor.execute(self.INSERT_SQL, self.insert_params([entry])[0])
+            return cursor.lastrowid
+    
+    def insert_batch(self, batch: CalorieBatch) -> int:
+        """Insert a columnar batch in one transaction, streaming rows into executemany."""
+        self.db.execute_many(self.INSERT_SQL, batch.iter_params(self.INSERT_COLUMNS))
+        return len(batch)
+    
+    def recent_entries(self, user_id: int, limit: int = 10) -> list:
+        """
+        Fetch a user's most recent entries, newest first.
+        
+        Each row has an `archived` flag; archived entries are read-only, since
+        get_entry and apply_changes only reach the hot table.
+        """
+        query = """
+            SELECT id, food_name, calories, quantity, unit, food_type,
+                   source, notes, image_path, logged_at, {archived} AS archived
+            FROM {table}
+            WHERE user_id = ?
+            ORDER BY logged_at DESC
+            LIMIT ?
+            """
+        rows = self.db.fetch_all(query.format(archived="0", table="calories"), (user_id, limit))
+        if len(rows) < limit and hot_boundary(self.db) is not None:
+            # a user who hasn't logged recently may only have archived entries;
+            # moved rows keep their ids, so a row is archived if the hot table lacks its id
+            archived = f"{ALL_CALORIES_VIEW}.id NOT IN (SELECT id FROM calories WHERE user_id = ?)"
+            rows = self.db.fetch_all(
+                query.format(archived=archived, table=ALL_CALORIES_VIEW), (user_id, user_id, limit)
+            )
+        return rows
+    
+    def entries_between(self, user_id: int, start, end=None) -> list:
+        """A user's entries logged in [start, end), oldest first; reads archives only if needed."""
+        table = ALL_CALORIES_VIEW if needs_archives(self.db, start) else "calories"
+        return self.db.fetch_all(
+            f"""
+            SELECT id, food_name, calories, quantity, unit, food_type,
+                   source, notes, image_path, logged_at
+            FROM {table}
+            WHERE user_id = ? AND logged_at >= ? AND logged_at < ?
+            ORDER BY logged_at ASC
+            """,
+            (user_id, str(start), str(end or "9999"))
+        )
+    
+    def daily_totals(self, user_id: int, since) -> list:
+        """
+        Calories per day since a timestamp, as rows of (day, daily_total).
+        
+        Archived days come from the daily_totals table rather than the archives,
+        and are counted whole even if `since` falls within one.
+        """
+        query = """
+            SELECT DATE(logged_at) as day, SUM(calories) as daily_total
+            FROM calories
+            WHERE user_id = ? AND logged_at >= ?
+            GROUP BY DATE(logged_at)
+            """
+        params = (user_id, str(since))
+        if needs_archives(self.db, since):
+            # late inserts can leave a few hot rows on archived days, so sum both
+            query = f"""
+            SELECT day, SUM(daily_total) as daily_total FROM (
+                {query}
+                UNION ALL
+                SELECT day, calories FROM daily_totals WHERE user_id = ? AND day >= ?
+            ) GROUP BY day
+            """
+            params += (user_id, str(since)[:10])
+        return self.db.fetch_all(query + " ORDER BY day ASC", params)
+    
+    def get_entry(self, user_id: int, entry_id: int):
+        """Fetch one of a user's editable (not archived) entries, or None."""
+        return self.db.fetch_one(
+            """
+            SELECT id, food_name, calories, quantity, unit, food_type,
+                   source, notes, image_path, logged_at, 0 AS archived
+            FROM calories
+            WHERE id = ? AND user_id = ?
+            """,
+            (entry_id, user_id)
+        )
+    
+    def is_archived(self, user_id: int, entry_id: int) -> bool:
+        """Whether one of the user's entries has been moved to an archive table."""
+        if hot_boundary(self.db) is None:
+            return False
+        return self.db.fetch_one(
+            f"SELECT 1 FROM {ALL_CALORIES_VIEW} WHERE id = ? AND user_id = ? "
+            "AND id NOT IN (SELECT id FROM calories WHERE id = ?)",
+            (entry_id, user_id, entry_id)
+        ) is not None
+    
+    def weekly_summary(self, user_id: int, now: Optional[datetime] = None) -> dict:
+        """
+        Calories of the last seven days, the seven before, and per day.
+        
+        Without `now` the week ends at the current minute, and the summary is
+        cached until the minute is over or the user's entries change in any process.
+        
+        Returns:
+            {"total": float, "previous_total": float, "daily": rows of (day, daily_total)}
+        """
+        if now is None:
+            now = datetime.now().replace(second=0, microsecond=0)
+            cache = get_shared_cache("weekly_summary", "entries", self.db.db_path)
+            return cache.load(user_id, (user_id, now), lambda: self.weekly_summary(user_id, now))
+        seven_days_ago = (now - timedelta(days=7)).isoformat()
+        fourteen_days_ago = (now - timedelta(days=14)).isoformat()
+        table = ALL_CALORIES_VIEW if needs_archives(self.db, fourteen_days_ago) else "calories"
+        totals = self.db.fetch_one(
+            f"""
+            SELECT SUM(CASE WHEN logged_at >= ? THEN calories END) AS total_calories,
+                   SUM(CASE WHEN logged_at < ? THEN calories END) AS previous_calories
+            FROM {table}
+            WHERE user_id = ? AND logged_at >= ?
+            """,
+            (seven_days_ago, seven_days_ago, user_id, fourteen_days_ago)
+        )
+        daily = self.daily_totals(user_id, seven_days_ago)
+        return {
+            "total": totals["total_calories"] or 0,
+            "previous_total": totals["previous_calories"] or 0,
+            "daily": daily,
+        }
+    
+    def apply_changes(
+        self,
+        user_id: int,
+        updates: Dict[int, dict],
+        deleted_ids: List[int]
+    ) -> int:
+        """
+        Apply edited columns and deletions by entry id in one transaction.
+        
+        Args:
+            user_id: Owner of the entries; rows of other users are never touched
+            updates: Mapping of entry id to {column: new value} for changed cells only
+            deleted_ids: Entry ids to delete
+            
+        Returns:
+            Number of rows changed
+        """
+        # group updates that touch the same columns so each shape is one executemany
+        grouped: Dict[tuple, List[tuple]] = {}
+        for entry_id, changes in updates.items():
+            if entry_id in deleted_ids:
+                continue
+            columns = tuple(c for c in self.EDITABLE_COLUMNS if c in changes)
+            if columns:
+                params = tuple(changes[c] for c in columns) + (entry_id, user_id)
+                grouped.setdefault(columns, []).append(params)
+        
+        changed = 0
+        with self.db.transaction() as cursor:
+            for columns, params_seq in grouped.items():
+                assignments = ", ".join(f"{c} = ?" for c in columns)
+                cursor.executemany(
+                    f"UPDATE calories SET {assignments}, updated_at = CURRENT_TIMESTAMP "
+                    "WHERE id = ? AND user_id = ?",
+                    params_seq
+                )
+                changed += cursor.rowcount
+            if deleted_ids:
+                cursor.executemany(
+                    "DELETE FROM calories WHERE id = ? AND user_id = ?",
+                    [(entry_id, user_id) for entry_id in deleted_ids]
+                )
+                changed += cursor.rowcount
+        return changed
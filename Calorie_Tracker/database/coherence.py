@@ -0,0 +1,209 @@
+"""Keeps in-process caches coherent with writes from other processes.
+
+Several server processes can share one database file, so anything a process
+caches goes stale as soon as another one writes. Triggers bump a row of
+user_versions whenever a user's entries, profile (users, sessions) or
+recognized images change, each bump taking the next global version number.
+
+A ChangeFeed watches one database from its own reading connection. PRAGMA
+data_version on that connection changes whenever any other connection, in
+this process or another, commits; while it stays put, every cache is known to
+be current without reading a table. When it moves, one range scan of
+user_versions above the last version seen gives exactly the users whose rows
+changed, and the caches subscribed to those scopes drop them.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from .connection import get_database
+
+SCOPES = ("entries", "profile", "images")
+
+# called with the user ids whose rows changed, or None when any user's may have
+Invalidate = Callable[[Optional[Iterable[int]]], None]
+
+
+class ChangeFeed:
+    """Tells subscribed caches which users' rows other connections have changed."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.polls = 0
+        self.scans = 0  # polls that found a commit and read user_versions
+        self._connection: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._seen = 0  # highest user_versions.version handed to subscribers
+        self._subscribers: Dict[str, List[Invalidate]] = {scope: [] for scope in SCOPES}
+        self._lock = threading.Lock()
+
+    def subscribe(self, scope: str, invalidate: Invalidate):
+        """Call `invalidate` with the users whose rows in `scope` change from now on."""
+        if scope not in self._subscribers:
+            raise ValueError(f"Unknown scope {scope!r}; expected one of {SCOPES}")
+        with self._lock:
+            self._subscribers[scope].append(invalidate)
+
+    def poll(self):
+        """
+        Invalidate whatever other connections changed since the last poll.
+
+        Costs one PRAGMA when nothing was committed. Subscribers are called
+        before poll returns, so a cache that polls before reading never serves
+        a value older than the last commit.
+        """
+        with self._lock:
+            self.polls += 1
+            connection = self._connect()
+            data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            self.scans += 1
+
+            try:
+                latest = connection.execute("SELECT COALESCE(MAX(version), 0) FROM user_versions").fetchone()[0]
+                if latest < self._seen:
+                    # versions went backwards: the file was restored from a backup
+                    changed = None
+                else:
+                    changed = {scope: set() for scope in SCOPES}
+                    for user_id, scope in connection.execute(
+                        "SELECT user_id, scope FROM user_versions WHERE version > ? AND version <= ?",
+                        (self._seen, latest)
+                    ):
+                        changed.setdefault(scope, set()).add(user_id)
+            except sqlite3.OperationalError:
+                # user_versions is created by DatabaseSchema.initialize_database
+                latest, changed = 0, None
+            self._seen = latest
+
+            for scope, subscribers in self._subscribers.items():
+                users = None if changed is None else changed.get(scope)
+                if changed is not None and not users:
+                    continue
+                for invalidate in subscribers:
+                    invalidate(users)
+
+    def _connect(self) -> sqlite3.Connection:
+        # only ever reads; its own commits would not move its data_version
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        return self._connection
+
+
+class CoherentCache:
+    """
+    LRU of values that each belong to one user, dropped when that user's rows change.
+
+    Every read polls the database's ChangeFeed first, so a value is served only
+    while no process has written to its user's rows in `scope` since it was loaded.
+    """
+
+    def __init__(self, scope: str, max_entries: int = 1024, db_path: Optional[str] = None):
+        self.scope = scope
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._values: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        # loads in flight per user, and invalidations they straddled; such results are not kept
+        self._loading: Dict[int, List[int]] = {}
+        self._epoch = 0  # bumped when every user is invalidated
+        self._lock = threading.Lock()
+        self.feed = get_change_feed(db_path)
+        self.feed.subscribe(scope, self.invalidate)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The cached value for a key, or None."""
+        self.feed.poll()
+        with self._lock:
+            cached = self._values.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            self._values.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, user_id: int, key: Hashable, value: Any):
+        """Cache a value known to be current, e.g. one this process has just written."""
+        with self._lock:
+            self._store(user_id, key, value)
+
+    def load(self, user_id: int, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        The cached value for a key, or the loader's result, cached unless it is None.
+
+        A result is not kept if the user's rows changed while it was loading.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            loading = self._loading.setdefault(user_id, [0, 0])  # [loads, invalidations]
+            loading[0] += 1
+            before = (self._epoch, loading[1])
+        try:
+            value = loader()
+            if value is not None:
+                self.feed.poll()
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if not loading[0]:
+                    del self._loading[user_id]
+                if value is not None and (self._epoch, loading[1]) == before:
+                    self._store(user_id, key, value)
+        return value
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def invalidate(self, user_ids: Optional[Iterable[int]] = None):
+        """Drop the values of these users, or of every user."""
+        with self._lock:
+            if user_ids is None:
+                self._epoch += 1
+                self._values.clear()
+                return
+            user_ids = set(user_ids)
+            for user_id in user_ids & self._loading.keys():
+                self._loading[user_id][1] += 1
+            for key in [key for key, (owner, _) in self._values.items() if owner in user_ids]:
+                del self._values[key]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _store(self, user_id: int, key: Hashable, value: Any):
+        self._values[key] = (user_id, value)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_entries:
+            self._values.popitem(last=False)
+
+
+# One change feed per database file, and the caches shared by everything using it
+_feeds: Dict[str, ChangeFeed] = {}
+_caches: Dict[Tuple[str, str], CoherentCache] = {}
+_feeds_lock = threading.RLock()
+
+
+def get_change_feed(db_path: Optional[str] = None) -> ChangeFeed:
+    """Get the change feed of a database file, by default the global database's."""
+    path = os.path.abspath(db_path or get_database().db_path)
+    with _feeds_lock:
+        if path not in _feeds:
+            _feeds[path] = ChangeFeed(path)
+        return _feeds[path]
+
+
+def get_shared_cache(name: str, scope: str, db_path: Optional[str] = None, max_entries: int = 1024) -> CoherentCache:
+    """Get the process-wide cache called `name` for a database file."""
+    path = os.path.abspath(db_path or get_database().db_path)
+    with _feeds_lock:
+        if (name, path) not in _caches:
+            _caches[name, path] = CoherentCache(scope, max_entries, path)
+        return _caches[name, path]
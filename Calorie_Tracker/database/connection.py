@@ -1,20 +1,33 @@
 """Database module for Calorie Tracker."""
 import sqlite3
 import os
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+# e.g. "wal": readers and online backups (database.backup) then never block writers
+JOURNAL_MODE = os.getenv("CALORIE_JOURNAL_MODE", "")
 
 
 class DatabaseConnection:
-    """Manages database connection and operations."""
+    """
+    Manages database connection and operations.
+
+    Every thread shares the one connection, so statements and transactions
+    take turns on it; another thread's commit can't land inside transaction().
+    """
     
     def __init__(self, db_path: str = "calories.db"):
         self.db_path = db_path
         self.connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
     
     def connect(self):
         """Establish database connection."""
         self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
         self.connection.row_factory = sqlite3.Row
+        if JOURNAL_MODE:
+            self.connection.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
         return self.connection
     
     def close(self):
@@ -31,25 +44,47 @@ class DatabaseConnection:
     
     def execute(self, query: str, params: tuple = ()):
         """Execute a query."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
+        with self._lock:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            conn.commit()
         return cursor
     
+    def execute_many(self, query: str, params_seq: Iterable[tuple]):
+        """Execute a query for every parameter tuple in a single transaction."""
+        with self.transaction() as cursor:
+            cursor.executemany(query, params_seq)
+        return cursor
+    
+    @contextmanager
+    def transaction(self):
+        """Run several statements atomically; commit on success, roll back on error."""
+        with self._lock:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    
     def fetch_one(self, query: str, params: tuple = ()):
         """Fetch a single row."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        return cursor.fetchone()
+        with self._lock:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchone()
     
     def fetch_all(self, query: str, params: tuple = ()):
         """Fetch all rows."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        return cursor.fetchall()
+        with self._lock:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
 
 
 # Global database instance
@@ -0,0 +1,207 @@
+"""Cross-user aggregate reporting job.
+
+Streams every calorie entry, hot and archived (the all_calories view), in
+(user_id, id) ordered chunks and folds each chunk into a small mergeable
+aggregate, so memory stays bounded no matter how many rows exist. Results are written to the report_summaries
+table in a single short transaction.
+
+Run from the Calorie_Tracker directory:
+    python -m database.reporting --workers 4
+"""
+import argparse
+import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from .connection import DatabaseConnection, get_database
+from .schema import DatabaseSchema
+
+DEFAULT_CHUNK_SIZE = 5000
+HISTOGRAM_BIN_WIDTH = 10  # calories per histogram bucket
+HISTOGRAM_MAX_CALORIES = 5000  # larger entries land in the last bucket
+HISTOGRAM_BINS = HISTOGRAM_MAX_CALORIES // HISTOGRAM_BIN_WIDTH + 1
+
+
+@dataclass
+class ReportAggregate:
+    """Mergeable partial aggregate over a slice of the calories table."""
+
+    total_users: int = 0
+    active_users: int = 0
+    total_entries: int = 0
+    total_calories: float = 0.0
+    histogram: List[int] = field(default_factory=lambda: [0] * HISTOGRAM_BINS)
+    source_mix: Counter = field(default_factory=Counter)
+    food_type_mix: Counter = field(default_factory=Counter)
+
+    def merge(self, other: "ReportAggregate"):
+        """Fold another aggregate into this one. Slices must not share users."""
+        self.total_users += other.total_users
+        self.active_users += other.active_users
+        self.total_entries += other.total_entries
+        self.total_calories += other.total_calories
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        self.source_mix.update(other.source_mix)
+        self.food_type_mix.update(other.food_type_mix)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Approximate percentile (0-100) from the histogram, bucket upper bound."""
+        if self.total_entries == 0:
+            return None
+        rank = p / 100 * self.total_entries
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank and count:
+                return float(min((index + 1) * HISTOGRAM_BIN_WIDTH, HISTOGRAM_MAX_CALORIES))
+        return float(HISTOGRAM_MAX_CALORIES)
+
+
+class AggregateReportJob:
+    """Nightly operator report over all users' calorie entries."""
+
+    def __init__(
+        self,
+        db_path: str = "calories.db",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        active_days: int = 7
+    ):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.active_since = (datetime.now() - timedelta(days=active_days)).isoformat(" ")
+
+    def _open_reader(self) -> DatabaseConnection:
+        """Open a dedicated read-only connection for one scan."""
+        reader = DatabaseConnection(self.db_path)
+        reader.execute("PRAGMA query_only = ON")
+        return reader
+
+    def user_id_ranges(self, workers: int) -> List[Tuple[int, int]]:
+        """Split the populated user_id space into contiguous ranges."""
+        reader = self._open_reader()
+        try:
+            row = reader.fetch_one("SELECT MIN(user_id), MAX(user_id) FROM all_calories")
+        finally:
+            reader.close()
+        low, high = row[0], row[1]
+        if low is None:
+            return []
+        workers = max(1, min(workers, high - low + 1))
+        step = (high - low + 1) // workers
+        ranges = []
+        for index in range(workers):
+            start = low + index * step
+            end = high if index == workers - 1 else start + step - 1
+            ranges.append((start, end))
+        return ranges
+
+    def scan_range(self, low_user_id: int, high_user_id: int) -> ReportAggregate:
+        """Aggregate every entry whose user_id lies in [low, high]."""
+        aggregate = ReportAggregate()
+        reader = self._open_reader()
+        last_key = (low_user_id, -1)
+        last_user_id = None
+        user_is_active = False
+        try:
+            while True:
+                # fetchall() finishes the statement, so the shared lock is
+                # released between chunks and writers can commit in the gaps
+                rows = reader.fetch_all(
+                    """
+                    SELECT id, user_id, calories, source, food_type, logged_at
+                    FROM all_calories
+                    WHERE (user_id, id) > (?, ?) AND user_id <= ?
+                    ORDER BY user_id, id
+                    LIMIT ?
+                    """,
+                    (last_key[0], last_key[1], high_user_id, self.chunk_size)
+                )
+                if not rows:
+                    break
+                for row in rows:
+                    if row["user_id"] != last_user_id:
+                        aggregate.total_users += 1
+                        last_user_id = row["user_id"]
+                        user_is_active = False
+                    if not user_is_active and row["logged_at"] and str(row["logged_at"]) >= self.active_since:
+                        aggregate.active_users += 1
+                        user_is_active = True
+
+                    calories = row["calories"] or 0.0
+                    aggregate.total_entries += 1
+                    aggregate.total_calories += calories
+                    bucket = int(max(calories, 0) // HISTOGRAM_BIN_WIDTH)
+                    aggregate.histogram[min(bucket, HISTOGRAM_BINS - 1)] += 1
+                    aggregate.source_mix[row["source"] or "unknown"] += 1
+                    aggregate.food_type_mix[(row["food_type"] or "unknown").lower()] += 1
+                last_key = (rows[-1]["user_id"], rows[-1]["id"])
+        finally:
+            reader.close()
+        return aggregate
+
+    def run(self, workers: int = 1) -> ReportAggregate:
+        """Scan the table, optionally in parallel across user_id ranges."""
+        ranges = self.user_id_ranges(workers)
+        result = ReportAggregate()
+        if len(ranges) <= 1:
+            for low, high in ranges:
+                result.merge(self.scan_range(low, high))
+            return result
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            for partial in pool.map(lambda r: self.scan_range(*r), ranges):
+                result.merge(partial)
+        return result
+
+    @staticmethod
+    def save(db: DatabaseConnection, aggregate: ReportAggregate) -> int:
+        """Write one summary row. A single INSERT keeps the write lock brief."""
+        cursor = db.execute(
+            """
+            INSERT INTO report_summaries
+            (total_users, active_users, total_entries, total_calories,
+             calories_p50, calories_p90, calories_p99, source_mix, food_type_mix)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                aggregate.total_users,
+                aggregate.active_users,
+                aggregate.total_entries,
+                aggregate.total_calories,
+                aggregate.percentile(50),
+                aggregate.percentile(90),
+                aggregate.percentile(99),
+                json.dumps(dict(aggregate.source_mix)),
+                json.dumps(dict(aggregate.food_type_mix))
+            )
+        )
+        return cursor.lastrowid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the cross-user calorie report.")
+    parser.add_argument("--db", default="calories.db", help="Path to the SQLite database")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel user_id ranges to scan")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--active-days", type=int, default=7)
+    args = parser.parse_args()
+
+    db = get_database(args.db)
+    DatabaseSchema.initialize_database(db)
+
+    job = AggregateReportJob(args.db, chunk_size=args.chunk_size, active_days=args.active_days)
+    aggregate = job.run(workers=args.workers)
+    report_id = AggregateReportJob.save(db, aggregate)
+
+    print(f"Report {report_id}: {aggregate.total_entries} entries from "
+          f"{aggregate.total_users} users ({aggregate.active_users} active)")
+    print(f"Calories p50/p90/p99: {aggregate.percentile(50)} / "
+          f"{aggregate.percentile(90)} / {aggregate.percentile(99)}")
+    print(f"Source mix: {dict(aggregate.source_mix)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Hot/cold retention for the calories table.
+
+Entries older than the retention window move, a whole month at a time, into
+per-month archive tables (calories_archive_YYYY_MM). Their per-user daily
+totals stay behind in daily_totals, so long-range charts never read the
+archives. The all_calories view unions the hot table with every archive;
+CalorieRepository reads it only when a query starts before the hot boundary,
+so the hot table and its indexes stay small enough to live in the page cache.
+
+Run from the Calorie_Tracker directory (e.g. nightly):
+    python -m database.retention --days 90
+"""
+import argparse
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from .connection import DatabaseConnection, get_database
+from .schema import DatabaseSchema
+
+RETENTION_DAYS = int(os.getenv("CALORIE_RETENTION_DAYS", "90"))
+ARCHIVE_PREFIX = "calories_archive_"
+ALL_CALORIES_VIEW = "all_calories"
+
+
+@dataclass
+class RetentionStats:
+    """What one retention run moved."""
+
+    months: List[str] = field(default_factory=list)
+    rows: int = 0
+    seconds: float = 0.0
+
+
+def archive_table(month: str) -> str:
+    """Archive table name for a "YYYY-MM" month."""
+    return ARCHIVE_PREFIX + month.replace("-", "_")
+
+
+def _next_month(month: str) -> str:
+    year, number = map(int, month.split("-"))
+    return f"{year + number // 12}-{number % 12 + 1:02d}"
+
+
+def hot_boundary(db: DatabaseConnection) -> Optional[str]:
+    """
+    Timestamp before which entries may be archived, or None if nothing is.
+
+    Everything logged at or after the boundary is in the hot table; entries
+    before it are archived, apart from late inserts the next run will move.
+    """
+    row = db.fetch_one("SELECT MAX(hot_from) FROM calorie_archives")
+    return row[0] if row else None
+
+
+def needs_archives(db: DatabaseConnection, since) -> bool:
+    """Whether a query over entries logged at or after `since` must read the archives."""
+    boundary = hot_boundary(db)
+    return boundary is not None and str(since) < boundary
+
+
+def rebuild_view(cursor):
+    """Recreate all_calories as the hot table plus every archive table."""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(calories)")]
+    selects = [f"SELECT {', '.join(columns)} FROM calories"]
+    for (table,) in cursor.execute("SELECT table_name FROM calorie_archives ORDER BY month").fetchall():
+        # archives made before a column was added read it as NULL
+        present = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        selects.append(
+            "SELECT " + ", ".join(c if c in present else f"NULL AS {c}" for c in columns) + f" FROM {table}"
+        )
+    cursor.execute(f"DROP VIEW IF EXISTS {ALL_CALORIES_VIEW}")
+    cursor.execute(f"CREATE VIEW {ALL_CALORIES_VIEW} AS " + " UNION ALL ".join(selects))
+
+
+class RetentionJob:
+    """Moves whole months of old entries out of the hot calories table."""
+
+    def __init__(self, db: Optional[DatabaseConnection] = None, days: int = RETENTION_DAYS):
+        self.db = db or get_database()
+        self.days = days
+
+    def cutoff(self, today: Optional[date] = None) -> str:
+        """Start of the oldest month that stays hot; only months before it are archived."""
+        oldest_hot = (today or date.today()) - timedelta(days=self.days)
+        return f"{oldest_hot.year}-{oldest_hot.month:02d}-01 00:00:00"
+
+    def pending_months(self, today: Optional[date] = None) -> List[str]:
+        """Months ("YYYY-MM") with hot entries older than the cutoff."""
+        cutoff = self.cutoff(today)
+        months = []
+        month_start = None
+        while True:
+            # walk the logged_at index one month at a time instead of grouping the whole range
+            row = self.db.fetch_one(
+                "SELECT MIN(logged_at) FROM calories WHERE logged_at < ? AND logged_at >= ?",
+                (cutoff, month_start or "")
+            )
+            if row[0] is None:
+                return months
+            month = str(row[0])[:7]
+            months.append(month)
+            month_start = f"{_next_month(month)}-01 00:00:00"
+
+    def archive_month(self, month: str) -> int:
+        """Move one month's hot entries into its archive table in one transaction."""
+        table = archive_table(month)
+        start = f"{month}-01 00:00:00"
+        end = f"{_next_month(month)}-01 00:00:00"
+        with self.db.transaction() as cursor:
+            columns = [row for row in cursor.execute("PRAGMA table_info(calories)")]
+            names = ", ".join(row[1] for row in columns)
+            created = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone() is None
+            if created:
+                definitions = ", ".join(
+                    f"{row[1]} {row[2]}" + (" PRIMARY KEY" if row[1] == "id" else "") for row in columns
+                )
+                cursor.execute(f"CREATE TABLE {table} ({definitions})")
+                # per-user date ranges, and (user_id, id) order for the report scan
+                cursor.execute(f"CREATE INDEX idx_{table}_user_logged_at ON {table}(user_id, logged_at)")
+                cursor.execute(f"CREATE INDEX idx_{table}_user_id ON {table}(user_id)")
+
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS archiving (id INTEGER PRIMARY KEY)")
+            cursor.execute("DELETE FROM archiving")
+            cursor.execute(
+                "INSERT INTO archiving SELECT id FROM calories WHERE logged_at >= ? AND logged_at < ?",
+                (start, end)
+            )
+            moved = cursor.execute(
+                f"INSERT INTO {table} ({names}) SELECT {names} FROM calories "
+                "WHERE id IN (SELECT id FROM archiving)"
+            ).rowcount
+            cursor.execute(
+                """
+                INSERT INTO daily_totals (user_id, day, calories, entries)
+                SELECT user_id, DATE(logged_at), SUM(calories), COUNT(*)
+                FROM calories
+                WHERE id IN (SELECT id FROM archiving)
+                GROUP BY user_id, DATE(logged_at)
+                ON CONFLICT(user_id, day) DO UPDATE SET
+                    calories = calories + excluded.calories,
+                    entries = entries + excluded.entries
+                """
+            )
+            cursor.execute("DELETE FROM calories WHERE id IN (SELECT id FROM archiving)")
+            # the delete trigger dropped the moved rows from search; archived entries stay searchable
+            cursor.execute(
+                DatabaseSchema.CALORIES_FTS_INDEX.format(source=table) + " WHERE id IN (SELECT id FROM archiving)"
+            )
+            cursor.execute(
+                """
+                INSERT INTO calorie_archives (month, table_name, rows, hot_from, archived_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(month) DO UPDATE SET
+                    rows = rows + excluded.rows,
+                    archived_at = excluded.archived_at
+                """,
+                (month, table, moved, end, datetime.now())
+            )
+            if created:
+                rebuild_view(cursor)
+        return moved
+
+    def run(self, today: Optional[date] = None, dry_run: bool = False) -> RetentionStats:
+        """Archive every pending month, oldest first."""
+        started = time.perf_counter()
+        stats = RetentionStats(months=self.pending_months(today))
+        if not dry_run:
+            for month in stats.months:
+                stats.rows += self.archive_month(month)
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old calorie entries into monthly archive tables.")
+    parser.add_argument("--db", default="calories.db", help="Path to the SQLite database")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="Days of entries kept hot")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the months that would move")
+    args = parser.parse_args()
+
+    db = get_database(args.db)
+    DatabaseSchema.initialize_database(db)
+
+    stats = RetentionJob(db, args.days).run(dry_run=args.dry_run)
+    if not stats.months:
+        print("Nothing to archive.")
+    elif args.dry_run:
+        print(f"Would archive {len(stats.months)} months: {', '.join(stats.months)}")
+    else:
+        print(f"Archived {stats.rows} entries from {len(stats.months)} months in {stats.seconds:.1f} s")
+        print(f"Hot table now starts at {hot_boundary(db)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -37,6 +37,235 @@ class DatabaseSchema:
     )
     """
     
+    SESSIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        revoked_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """
+    
+    # secrets every process sharing the database must agree on, e.g. the
+    # session token key when SESSION_SECRET is not set (utils.tokens)
+    APP_SECRETS_TABLE = """
+    CREATE TABLE IF NOT EXISTS app_secrets (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+    
+    RECOGNITION_JOBS_TABLE = """
+    CREATE TABLE IF NOT EXISTS recognition_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued'
+            CHECK(status IN ('queued', 'running', 'done', 'failed')),
+        method TEXT NOT NULL DEFAULT 'automatic',
+        auto_save INTEGER NOT NULL DEFAULT 1,
+        image BLOB,
+        image_path TEXT,
+        result TEXT,
+        error_message TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """
+    
+    RECOGNITION_OUTCOMES_TABLE = """
+    CREATE TABLE IF NOT EXISTS recognition_outcomes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        image_kind TEXT NOT NULL,
+        method TEXT NOT NULL,
+        success INTEGER NOT NULL,
+        confident INTEGER NOT NULL,
+        confidence_score REAL,
+        item_count INTEGER NOT NULL DEFAULT 0,
+        latency_ms INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """
+    
+    # one row per model call: the router's choice and how the call went
+    MODEL_ROUTES_TABLE = """
+    CREATE TABLE IF NOT EXISTS model_routes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        method TEXT NOT NULL,
+        model TEXT NOT NULL,
+        difficulty TEXT NOT NULL,
+        images INTEGER NOT NULL DEFAULT 1,
+        image_bytes INTEGER,
+        budget_ms INTEGER,
+        reason TEXT,
+        success INTEGER,
+        latency_ms INTEGER,
+        error_message TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+    
+    IMAGE_FINGERPRINTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS image_fingerprints (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        image_path TEXT,
+        dhash INTEGER NOT NULL,
+        histogram BLOB NOT NULL,
+        result TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """
+    
+    REPORT_SUMMARY_TABLE = """
+    CREATE TABLE IF NOT EXISTS report_summaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        total_users INTEGER NOT NULL,
+        active_users INTEGER NOT NULL,
+        total_entries INTEGER NOT NULL,
+        total_calories REAL NOT NULL,
+        calories_p50 REAL,
+        calories_p90 REAL,
+        calories_p99 REAL,
+        source_mix TEXT,
+        food_type_mix TEXT
+    )
+    """
+    
+    # months moved out of the hot calories table by database.retention
+    CALORIE_ARCHIVES_TABLE = """
+    CREATE TABLE IF NOT EXISTS calorie_archives (
+        month TEXT PRIMARY KEY,
+        table_name TEXT NOT NULL,
+        rows INTEGER NOT NULL DEFAULT 0,
+        hot_from TIMESTAMP NOT NULL,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+    
+    # per-user daily totals of archived entries
+    DAILY_TOTALS_TABLE = """
+    CREATE TABLE IF NOT EXISTS daily_totals (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        calories REAL NOT NULL,
+        entries INTEGER NOT NULL,
+        PRIMARY KEY (user_id, day)
+    )
+    """
+    
+    # hot plus archived entries; the retention job recreates it with each new archive table
+    ALL_CALORIES_VIEW = """
+    CREATE VIEW IF NOT EXISTS all_calories AS SELECT * FROM calories
+    """
+    
+    # full-text index over entries; contentless, kept in sync by the triggers below.
+    # "owner" holds "u<user_id>" so a search only walks that user's postings;
+    # searches never use phrases, so token positions are not stored (detail=column)
+    CALORIES_FTS_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS calories_fts USING fts5(
+        owner, food_name, food_type, notes,
+        content='', detail=column, tokenize='porter unicode61', prefix='2 3'
+    )
+    """
+    
+    # INSERT ... SELECT that indexes rows of the calories table (or an archive) in calories_fts
+    CALORIES_FTS_INDEX = (
+        "INSERT INTO calories_fts (rowid, owner, food_name, food_type, notes) "
+        "SELECT id, 'u' || user_id, food_name, food_type, notes FROM {source}"
+    )
+    
+    CALORIES_FTS_TRIGGERS = [
+        """
+        CREATE TRIGGER IF NOT EXISTS calories_fts_insert AFTER INSERT ON calories BEGIN
+            INSERT INTO calories_fts (rowid, owner, food_name, food_type, notes)
+            VALUES (new.id, 'u' || new.user_id, new.food_name, new.food_type, new.notes);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS calories_fts_delete AFTER DELETE ON calories BEGIN
+            INSERT INTO calories_fts (calories_fts, rowid, owner, food_name, food_type, notes)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.food_name, old.food_type, old.notes);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS calories_fts_update
+        AFTER UPDATE OF user_id, food_name, food_type, notes ON calories BEGIN
+            INSERT INTO calories_fts (calories_fts, rowid, owner, food_name, food_type, notes)
+            VALUES ('delete', old.id, 'u' || old.user_id, old.food_name, old.food_type, old.notes);
+            INSERT INTO calories_fts (rowid, owner, food_name, food_type, notes)
+            VALUES (new.id, 'u' || new.user_id, new.food_name, new.food_type, new.notes);
+        END
+        """,
+    ]
+    
+    # per-user change counters that keep in-process caches coherent across processes
+    # (database.coherence); every bump takes the next global version, so "what changed
+    # since version v" is a range scan of idx_user_versions_version
+    USER_VERSIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS user_versions (
+        user_id INTEGER NOT NULL,
+        scope TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        PRIMARY KEY (user_id, scope)
+    ) WITHOUT ROWID
+    """
+    
+    # bumps the version of (user_id, scope) for every row of a SELECT of user ids
+    USER_VERSIONS_BUMP = (
+        "INSERT INTO user_versions (user_id, scope, version) "
+        "SELECT user_id, '{scope}', (SELECT COALESCE(MAX(version), 0) + 1 FROM user_versions) "
+        "FROM ({source}) WHERE true "
+        "ON CONFLICT (user_id, scope) DO UPDATE SET version = excluded.version"
+    )
+    
+    # (table, event, changed user id, scope): the writes each cache scope depends on
+    USER_VERSION_TRIGGERS = [
+        ("calories", "INSERT", "new.user_id", "entries"),
+        ("calories", "UPDATE", "new.user_id", "entries"),
+        ("calories", "DELETE", "old.user_id", "entries"),
+        ("users", "UPDATE", "new.id", "profile"),
+        ("users", "DELETE", "old.id", "profile"),
+        ("sessions", "UPDATE", "new.user_id", "profile"),
+        ("sessions", "DELETE", "old.user_id", "profile"),
+        ("image_fingerprints", "INSERT", "new.user_id", "images"),
+        ("image_fingerprints", "DELETE", "old.user_id", "images"),
+    ]
+    
+    # Columns added after a table first shipped, applied to existing databases
+    ADDED_COLUMNS = {
+        "recognition_jobs": {
+            "auto_save": "INTEGER NOT NULL DEFAULT 1",
+            "image_path": "TEXT",
+        },
+    }
+    
+    @staticmethod
+    def add_missing_columns(cursor: sqlite3.Cursor):
+        """Add columns from ADDED_COLUMNS that an older database lacks."""
+        for table, columns in DatabaseSchema.ADDED_COLUMNS.items():
+            existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+            for column, definition in columns.items():
+                if column not in existing:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
+    @staticmethod
+    def user_version_trigger(table: str, event: str, user_id: str, scope: str) -> str:
+        """CREATE TRIGGER statement for one entry of USER_VERSION_TRIGGERS."""
+        bump = DatabaseSchema.USER_VERSIONS_BUMP.format(scope=scope, source=f"SELECT {user_id} AS user_id")
+        return (
+            f"CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} "
+            f"AFTER {event} ON {table} BEGIN {bump}; END"
+        )
+    
     @staticmethod
     def initialize_database(db: DatabaseConnection):
         """Initialize database schema."""
@@ -47,6 +276,29 @@ class DatabaseSchema:
             # Create tables
             cursor.execute(DatabaseSchema.USER_TABLE)
             cursor.execute(DatabaseSchema.CALORIES_TABLE)
+            cursor.execute(DatabaseSchema.SESSIONS_TABLE)
+            cursor.execute(DatabaseSchema.APP_SECRETS_TABLE)
+            cursor.execute(DatabaseSchema.RECOGNITION_JOBS_TABLE)
+            cursor.execute(DatabaseSchema.RECOGNITION_OUTCOMES_TABLE)
+            cursor.execute(DatabaseSchema.MODEL_ROUTES_TABLE)
+            cursor.execute(DatabaseSchema.IMAGE_FINGERPRINTS_TABLE)
+            cursor.execute(DatabaseSchema.REPORT_SUMMARY_TABLE)
+            cursor.execute(DatabaseSchema.CALORIE_ARCHIVES_TABLE)
+            cursor.execute(DatabaseSchema.DAILY_TOTALS_TABLE)
+            cursor.execute(DatabaseSchema.USER_VERSIONS_TABLE)
+            cursor.execute(DatabaseSchema.ALL_CALORIES_VIEW)
+            search_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'calories_fts'"
+            ).fetchone()
+            cursor.execute(DatabaseSchema.CALORIES_FTS_TABLE)
+            if not search_exists:
+                # index the entries of a database created before search existed
+                cursor.execute(DatabaseSchema.CALORIES_FTS_INDEX.format(source="all_calories"))
+            for trigger in DatabaseSchema.CALORIES_FTS_TRIGGERS:
+                cursor.execute(trigger)
+            for trigger in DatabaseSchema.USER_VERSION_TRIGGERS:
+                cursor.execute(DatabaseSchema.user_version_trigger(*trigger))
+            DatabaseSchema.add_missing_columns(cursor)
             
             # Create indexes for faster queries
             cursor.execute(
@@ -58,6 +310,29 @@ class DatabaseSchema:
             cursor.execute(
                 "CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)"
             )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_recognition_jobs_user_id ON recognition_jobs(user_id)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_recognition_jobs_status ON recognition_jobs(status)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_recognition_outcomes_kind "
+                "ON recognition_outcomes(image_kind, method)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_recognition_outcomes_user "
+                "ON recognition_outcomes(user_id, image_kind, method)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_image_fingerprints_user_id ON image_fingerprints(user_id)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_user_versions_version ON user_versions(version)"
+            )
             
             conn.commit()
             print("Database schema initialized successfully.")
@@ -0,0 +1,108 @@
+"""Full-text search over a user's entries, hot and archived.
+
+calories_fts is a contentless FTS5 index over food_name, food_type and notes,
+kept in sync by triggers on the calories table (see DatabaseSchema). Each row
+also carries an "owner" token, so a query only walks the searching user's
+postings instead of filtering every user's matches afterwards.
+
+Results are ranked by where the words matched: entries whose food name has
+every word come first, then matches in the type or notes, newest first within
+each. bm25() would need collection-wide statistics for every query word (the
+number of entries of all users containing "grain", say), which costs more
+than the whole search.
+"""
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from .connection import DatabaseConnection, get_database
+from .retention import ALL_CALORIES_VIEW, hot_boundary
+
+DEFAULT_PAGE_SIZE = 20
+SEARCHED_COLUMNS = "{food_name food_type notes}"
+
+
+@dataclass
+class SearchPage:
+    """One page of ranked search results."""
+
+    rows: list
+    total: int
+    page: int
+    page_size: int
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.page_size))
+
+
+def match_query(user_id: int, text: str, prefix: bool = False, columns: str = SEARCHED_COLUMNS) -> Optional[str]:
+    """
+    FTS5 query for a user's search box text, or None if it has no words.
+
+    Every word must match in the given columns, either as a whole (stemmed)
+    word or, with prefix=True, as a word prefix ("chick" finds "chicken").
+    FTS5 operators in the text are treated as words.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = " ".join(f'"{word}"' + ("*" if prefix else "") for word in words)
+    return f"owner : u{int(user_id)} AND {columns} : ({terms})"
+
+
+class EntrySearch:
+    """Ranked, paginated full-text search over one user's calorie entries."""
+
+    def __init__(self, db: Optional[DatabaseConnection] = None):
+        self.db = db or get_database()
+
+    def _count(self, query: str) -> int:
+        return self.db.fetch_one("SELECT COUNT(*) FROM calories_fts WHERE calories_fts MATCH ?", (query,))[0]
+
+    def search(self, user_id: int, text: str, page: int = 0, page_size: int = DEFAULT_PAGE_SIZE) -> SearchPage:
+        """
+        Entries matching every word of `text`, food name matches first, newest first.
+
+        Whole words are tried first; only if nothing matches are the words
+        taken as prefixes. A prefix query merges the postings of every user,
+        so it is several times slower than a whole-word query, which can seek
+        straight to the user's own entries.
+
+        Args:
+            user_id: Owner of the entries
+            text: Search box input
+            page: Zero-based page number
+            page_size: Results per page
+
+        Returns:
+            SearchPage with the page's entry rows and the total match count
+        """
+        query = match_query(user_id, text)
+        if query is None:
+            return SearchPage([], 0, 0, page_size)
+
+        prefix = False
+        total = self._count(query)
+        if not total:
+            prefix = True
+            query = match_query(user_id, text, prefix=True)
+            total = self._count(query)
+        page = min(max(page, 0), max(0, -(-total // page_size) - 1))
+        # archived matches are only looked up in the archives if there are any
+        table = ALL_CALORIES_VIEW if hot_boundary(self.db) is not None else "calories"
+        # the index holds no dates, so every match is looked up by id to order by logged_at
+        rows = self.db.fetch_all(
+            f"""
+            SELECT id, food_name, calories, quantity, unit, food_type,
+                   source, notes, image_path, logged_at
+            FROM {table}
+            WHERE id IN (SELECT rowid FROM calories_fts WHERE calories_fts MATCH ?) AND user_id = ?
+            ORDER BY id IN (SELECT rowid FROM calories_fts WHERE calories_fts MATCH ?) DESC,
+                     logged_at DESC, id DESC
+            LIMIT ? OFFSET ?
+            """,
+            (query, user_id, match_query(user_id, text, prefix, columns="food_name"),
+             page_size, page * page_size)
+        )
+        return SearchPage(rows, total, page, page_size)
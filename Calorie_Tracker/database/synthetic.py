@@ -0,0 +1,225 @@
+"""Seeded generator of realistic users and calorie entries for benchmarks.
+
+The same seed, user count and day count always produce the same rows. Each
+user gets their own daily calorie target and habits (how often they skip
+breakfast or snack); each day's meals follow typical meal times and foods.
+Rows are streamed into executemany in large transactions, so millions of
+entries load in seconds. See insert_dummy_data.py for the command line.
+"""
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from .calorie_repository import CalorieRepository
+from .connection import DatabaseConnection
+from .schema import DatabaseSchema
+
+# (food name, food type, calories per unit, unit, typical quantity)
+FOODS = {
+    "breakfast": [
+        ("Oatmeal", "grain", 150, "cups", 1), ("Eggs", "protein", 78, "piece", 2),
+        ("Toast", "grain", 80, "piece", 2), ("Greek Yogurt", "dairy", 130, "cups", 1),
+        ("Banana", "fruit", 105, "piece", 1), ("Granola", "grain", 120, "oz", 1),
+        ("Orange Juice", "fruit", 110, "cups", 1), ("Pancakes", "grain", 90, "piece", 3),
+    ],
+    "lunch": [
+        ("Chicken Salad", "protein", 350, "serving(s)", 1), ("Turkey Sandwich", "grain", 380, "serving(s)", 1),
+        ("Rice Bowl", "grain", 206, "cups", 1.5), ("Lentil Soup", "protein", 230, "cups", 1.5),
+        ("Pasta", "grain", 221, "cups", 1.5), ("Apple", "fruit", 95, "piece", 1),
+        ("Side Salad", "vegetable", 60, "serving(s)", 1), ("Burrito", "grain", 530, "serving(s)", 1),
+    ],
+    "dinner": [
+        ("Salmon", "protein", 58, "oz", 5), ("Steak", "protein", 70, "oz", 6),
+        ("Chicken Breast", "protein", 47, "oz", 5), ("Brown Rice", "grain", 216, "cups", 1),
+        ("Roasted Vegetables", "vegetable", 120, "cups", 1), ("Pizza Slice", "grain", 285, "piece", 2),
+        ("Pasta Bolognese", "grain", 420, "serving(s)", 1), ("Broccoli", "vegetable", 55, "cups", 1),
+    ],
+    "snack": [
+        ("Almonds", "fat", 164, "oz", 1), ("Chocolate", "fat", 235, "oz", 1),
+        ("Cheese", "dairy", 113, "oz", 1), ("Apple", "fruit", 95, "piece", 1),
+        ("Protein Bar", "protein", 200, "piece", 1), ("Chips", "fat", 152, "oz", 1),
+    ],
+}
+
+# (meal, mean hour, hour spread, share of the daily target, usual item counts)
+MEALS = [
+    ("breakfast", 7.8, 1.0, 0.25, (1, 3)),
+    ("lunch", 12.7, 0.8, 0.35, (1, 3)),
+    ("dinner", 19.2, 1.0, 0.40, (2, 4)),
+    ("snack", 15.5, 2.5, 0.10, (1, 2)),
+]
+
+SOURCES = ("estimate", "label")
+INSERT_SQL = CalorieRepository.INSERT_SQL
+
+
+@dataclass
+class LoadStats:
+    """What a synthetic load inserted and how long it took."""
+
+    users: int
+    entries: int
+    seconds: float
+    index_seconds: float = 0.0
+
+
+class SyntheticDataGenerator:
+    """Generates users and entries deterministically from a seed."""
+
+    def __init__(self, seed: int = 0, days: int = 21, end: Optional[date] = None):
+        self.seed = seed
+        self.days = days
+        self.end = end or date.today()
+
+    def users(self, count: int, password_hash: str, start: int = 0) -> List[Tuple[str, str, str]]:
+        """(username, email, password_hash) rows for synthetic users."""
+        return [
+            (f"synthetic_{self.seed}_{n}", f"synthetic_{self.seed}_{n}@example.com", password_hash)
+            for n in range(start, start + count)
+        ]
+
+    def entries(self, user_id: int, user_index: int) -> Iterator[tuple]:
+        """INSERT_SQL parameter tuples for one user, oldest day first."""
+        rng = random.Random(f"{self.seed}:{user_index}")
+        target = rng.gauss(2200, 350)  # this user's usual daily calories
+        meal_chance = {
+            "breakfast": rng.uniform(0.6, 1.0),
+            "lunch": rng.uniform(0.85, 1.0),
+            "dinner": rng.uniform(0.95, 1.0),
+            "snack": rng.uniform(0.2, 0.9),
+        }
+        label_share = rng.uniform(0.05, 0.4)
+
+        first_day = self.end - timedelta(days=self.days - 1)
+        for day_offset in range(self.days):
+            day = (first_day + timedelta(days=day_offset)).isoformat()
+            day_target = max(900.0, rng.gauss(target, target * 0.15))
+            for meal, mean_hour, spread, share, (fewest, most) in MEALS:
+                if rng.random() > meal_chance[meal]:
+                    continue
+                minute_of_day = min(max(int(rng.gauss(mean_hour, spread) * 60), 0), 24 * 60 - 1)
+                foods = rng.sample(FOODS[meal], rng.randint(fewest, most))
+                scale = day_target * share / sum(calories * quantity for _, _, calories, _, quantity in foods)
+                for position, (name, food_type, calories, unit, quantity) in enumerate(foods):
+                    amount = round(quantity * scale * rng.lognormvariate(0, 0.15), 1) or quantity
+                    # items of one meal are logged a minute or so apart
+                    logged = min(minute_of_day + position, 24 * 60 - 1)
+                    yield (
+                        user_id,
+                        round(calories * amount, 1),
+                        name,
+                        food_type,
+                        amount,
+                        unit,
+                        SOURCES[rng.random() < label_share],
+                        None,
+                        None,
+                        f"{day} {logged // 60:02d}:{logged % 60:02d}:{rng.randrange(60):02d}.000000",
+                    )
+
+
+def calorie_indexes(db: DatabaseConnection) -> List[Tuple[str, str, str]]:
+    """(type, name, CREATE sql) of the explicit indexes and the triggers on the calories table."""
+    return [
+        (row[0], row[1], row[2]) for row in db.fetch_all(
+            "SELECT type, name, sql FROM sqlite_master "
+            "WHERE type IN ('index', 'trigger') AND tbl_name = 'calories' AND sql IS NOT NULL"
+        )
+    ]
+
+
+def load(
+    db: DatabaseConnection,
+    users: int,
+    days: int,
+    seed: int = 0,
+    password_hash: str = "!",
+    user_ids: Optional[Sequence[int]] = None,
+    batch_size: int = 100_000,
+    drop_indexes: bool = False,
+    progress=None
+) -> LoadStats:
+    """
+    Create synthetic users and their entries.
+
+    Args:
+        db: Target database (schema already initialized)
+        users: Number of users to create (ignored when user_ids is given)
+        days: Days of entries per user, ending today
+        seed: Same seed, same rows
+        password_hash: Stored for every created user; the default "!" can never log in
+        user_ids: Add entries for these existing users instead of creating users
+        batch_size: Rows per transaction
+        drop_indexes: Drop the calories indexes and its search and version triggers during
+            the load and rebuild them after; much faster for large loads, but other readers
+            see no indexes meanwhile, and concurrent writes are not indexed for search nor
+            reported to other processes' caches
+        progress: Optional callable(rows inserted so far)
+
+    Returns:
+        LoadStats
+    """
+    started = time.perf_counter()
+    generator = SyntheticDataGenerator(seed, days)
+    conn = db.get_connection()
+
+    if user_ids is None:
+        # GLOB rather than LIKE: "_" is a wildcard in LIKE patterns
+        pattern = (f"synthetic_{seed}_*",)
+        offset = db.fetch_one("SELECT COUNT(*) FROM users WHERE username GLOB ?", pattern)[0]
+        rows = generator.users(users, password_hash, start=offset)
+        db.execute_many("INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)", rows)
+        ids = dict(db.fetch_all("SELECT username, id FROM users WHERE username GLOB ?", pattern))
+        user_ids = [ids[row[0]] for row in rows]
+        indexes = range(offset, offset + len(user_ids))
+    else:
+        indexes = user_ids
+
+    dropped = calorie_indexes(db) if drop_indexes else []
+    first_new_id = db.fetch_one("SELECT COALESCE(MAX(id), 0) + 1 FROM calories")[0]
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    conn.execute("PRAGMA synchronous = OFF")  # a crash mid-load only loses synthetic rows
+    inserted = 0
+    try:
+        with db.transaction() as cursor:
+            for kind, name, _ in dropped:
+                cursor.execute(f"DROP {kind.upper()} {name}")
+
+        batch: List[tuple] = []
+        for user_id, user_index in zip(user_ids, indexes):
+            batch.extend(generator.entries(user_id, user_index))
+            if len(batch) >= batch_size:
+                db.execute_many(INSERT_SQL, batch)
+                inserted += len(batch)
+                batch = []
+                if progress:
+                    progress(inserted)
+        if batch:
+            db.execute_many(INSERT_SQL, batch)
+            inserted += len(batch)
+            if progress:
+                progress(inserted)
+    finally:
+        index_started = time.perf_counter()
+        with db.transaction() as cursor:
+            if any(kind == "trigger" for kind, _, _ in dropped):
+                # the search triggers were off, so index the new rows in one pass
+                cursor.execute(
+                    DatabaseSchema.CALORIES_FTS_INDEX.format(source="calories") + " WHERE id >= ?",
+                    (first_new_id,)
+                )
+                # and the version triggers, so bump the loaded users once for other processes' caches
+                cursor.execute(
+                    DatabaseSchema.USER_VERSIONS_BUMP.format(
+                        scope="entries", source="SELECT DISTINCT user_id FROM calories WHERE id >= ?"
+                    ),
+                    (first_new_id,)
+                )
+            for _, _, sql in dropped:
+                cursor.execute(sql)
+        index_seconds = time.perf_counter() - index_started
+        conn.execute(f"PRAGMA synchronous = {int(synchronous)}")
+
+    return LoadStats(len(user_ids), inserted, time.perf_counter() - started, index_seconds)
@@ -3,7 +3,8 @@ Domain module containing shared data structures and models.
 """
 
 from .user import User
-from .calorie_entry import CalorieEntry
+from .calorie_entry import FOOD_TYPES, CalorieEntry, CompactCalorieEntry
+from .calorie_batch import CalorieBatch
 from .image_recognition_result import ImageRecognitionResult, FoodItemDetection
 
-__all__ = ["User", "CalorieEntry", "ImageRecognitionResult", "FoodItemDetection"]
+__all__ = ["User", "FOOD_TYPES", "CalorieEntry", "CompactCalorieEntry", "CalorieBatch", "ImageRecognitionResult", "FoodItemDetection"]
@@ -0,0 +1,173 @@
+"""Columnar container for many calorie entries."""
+import math
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from .calorie_entry import CalorieEntry
+
+MISSING = -1  # code for a None string
+
+
+class StringDictionary:
+    """Dictionary-encodes a string column: each distinct value is stored once."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return MISSING
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int) -> Optional[str]:
+        return None if code == MISSING else self.values[code]
+
+
+class CalorieBatch:
+    """
+    Calorie entries stored column-wise in typed arrays.
+
+    Numbers live in array('d')/array('q') buffers (missing quantities are NaN),
+    timestamps as epoch seconds, and string columns as int32 codes into a
+    per-column StringDictionary. NumPy and pandas are only imported by the
+    to_numpy/to_pandas conversions, which wrap the buffers without copying.
+    While such a view is alive the buffers cannot be resized, so append raises
+    BufferError; export with copy=True to keep adding entries afterwards.
+    """
+
+    STRING_COLUMNS = ("food_name", "food_type", "unit", "source", "image_path", "notes")
+    INSERT_COLUMNS = ("user_id", "calories", "food_name", "food_type",
+                      "quantity", "unit", "source", "image_path", "notes", "logged_at")
+
+    def __init__(self):
+        self.user_id = array("q")
+        self.calories = array("d")
+        self.quantity = array("d")
+        self.logged_at = array("d")
+        self.codes = {column: array("i") for column in self.STRING_COLUMNS}
+        self.dictionaries = {column: StringDictionary() for column in self.STRING_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.user_id)
+
+    def append(
+        self,
+        user_id: int,
+        calories: float,
+        food_name: Optional[str] = None,
+        food_type: Optional[str] = None,
+        quantity: Optional[float] = None,
+        unit: Optional[str] = None,
+        source: Optional[str] = None,
+        image_path: Optional[str] = None,
+        notes: Optional[str] = None,
+        logged_at: Union[datetime, float, None] = None
+    ):
+        """Add one entry. logged_at may be a datetime or epoch seconds; defaults to now."""
+        if logged_at is None:
+            logged_at = datetime.now()
+        if isinstance(logged_at, datetime):
+            logged_at = logged_at.timestamp()
+
+        self.user_id.append(user_id)
+        self.calories.append(calories)
+        self.quantity.append(math.nan if quantity is None else quantity)
+        self.logged_at.append(logged_at)
+        for column, value in (
+            ("food_name", food_name),
+            ("food_type", food_type),
+            ("unit", unit),
+            ("source", source),
+            ("image_path", image_path),
+            ("notes", notes),
+        ):
+            self.codes[column].append(self.dictionaries[column].encode(value))
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Union[CalorieEntry, dict]]) -> "CalorieBatch":
+        """Build a batch from CalorieEntry objects or entry dicts (e.g. convert_calorie_entires)."""
+        batch = cls()
+        for entry in entries:
+            if not isinstance(entry, dict):
+                entry = {column: getattr(entry, column) for column in cls.INSERT_COLUMNS}
+            batch.append(**{column: entry.get(column) for column in cls.INSERT_COLUMNS})
+        return batch
+
+    def string_column(self, column: str) -> List[Optional[str]]:
+        """Decode one string column."""
+        decode = self.dictionaries[column].decode
+        return [decode(code) for code in self.codes[column]]
+
+    def iter_params(self, columns: Sequence[str] = INSERT_COLUMNS) -> Iterator[tuple]:
+        """
+        Yield one parameter tuple per entry for cursor.executemany.
+
+        Rows are produced lazily straight from the column buffers, so no
+        per-row dicts or intermediate lists are built.
+        """
+        getters = []
+        for column in columns:
+            if column in self.codes:
+                values, codes = self.dictionaries[column].values, self.codes[column]
+                getters.append(lambda i, v=values, c=codes: None if c[i] == MISSING else v[c[i]])
+            elif column == "logged_at":
+                getters.append(lambda i: datetime.fromtimestamp(self.logged_at[i]))
+            elif column == "quantity":
+                getters.append(lambda i: None if math.isnan(self.quantity[i]) else self.quantity[i])
+            else:
+                buffer = getattr(self, column)
+                getters.append(lambda i, b=buffer: b[i])
+        for index in range(len(self)):
+            yield tuple(getter(index) for getter in getters)
+
+    def to_numpy(self, copy: bool = False) -> dict:
+        """
+        Columns as NumPy arrays sharing memory with the batch buffers.
+
+        The batch is frozen while the arrays are alive: append raises BufferError.
+        With copy=True the arrays are independent and the batch can keep growing.
+        """
+        import numpy as np
+
+        columns = {
+            "user_id": np.frombuffer(self.user_id, dtype=np.int64),
+            "calories": np.frombuffer(self.calories, dtype=np.float64),
+            "quantity": np.frombuffer(self.quantity, dtype=np.float64),
+            "logged_at": np.frombuffer(self.logged_at, dtype=np.float64),
+        }
+        for column, codes in self.codes.items():
+            columns[column] = np.frombuffer(codes, dtype=np.int32)
+        if copy:
+            columns = {column: values.copy() for column, values in columns.items()}
+        return columns
+
+    def to_pandas(self, copy: bool = False):
+        """
+        DataFrame view: numeric columns wrap the buffers, strings become Categoricals.
+
+        Like to_numpy, the batch is frozen while the frame is alive unless copy=True.
+        """
+        import pandas as pd
+        from dateutil.tz import tzlocal  # a pandas dependency
+
+        arrays = self.to_numpy(copy)
+        data = {
+            "user_id": arrays["user_id"],
+            "calories": arrays["calories"],
+            "quantity": arrays["quantity"],
+            # naive local time, like the logged_at values stored in the database; the local zone
+            # rather than today's offset, so entries across a DST change keep their wall time
+            "logged_at": pd.to_datetime(arrays["logged_at"], unit="s", utc=True)
+                           .tz_convert(tzlocal()).tz_localize(None),
+        }
+        for column in self.STRING_COLUMNS:
+            data[column] = pd.Categorical.from_codes(
+                arrays[column], categories=pd.Index(self.dictionaries[column].values, dtype=object)
+            )
+        return pd.DataFrame(data, copy=False)
@@ -3,6 +3,9 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
+# every food type an entry can have; pages show them title-cased
+FOOD_TYPES = ("vegetable", "protein", "grain", "fruit", "dairy", "fat", "other")
+
 
 @dataclass
 class CalorieEntry:
@@ -23,9 +26,38 @@ class CalorieEntry:
     updated_at: datetime = None
     
     def __post_init__(self):
-        if self.logged_at is None:
-            self.logged_at = datetime.now()
-        if self.created_at is None:
-            self.created_at = datetime.now()
-        if self.updated_at is None:
-            self.updated_at = datetime.now()
+        _fill_timestamps(self)
+
+
+@dataclass(slots=True)
+class CompactCalorieEntry:
+    """CalorieEntry without a per-instance __dict__, for holding many rows at once."""
+    
+    id: int = None
+    user_id: int = None
+    calories: float = None
+    food_name: str = None
+    food_type: str = None
+    quantity: float = None
+    unit: str = None
+    source: str = None
+    image_path: Optional[str] = None
+    notes: Optional[str] = None
+    logged_at: datetime = None
+    created_at: datetime = None
+    updated_at: datetime = None
+    
+    def __post_init__(self):
+        _fill_timestamps(self)
+
+
+def _fill_timestamps(entry):
+    # one clock read per entry; the three defaults should agree anyway
+    if entry.logged_at is None or entry.created_at is None or entry.updated_at is None:
+        now = datetime.now()
+        if entry.logged_at is None:
+            entry.logged_at = now
+        if entry.created_at is None:
+            entry.created_at = now
+        if entry.updated_at is None:
+            entry.updated_at = now
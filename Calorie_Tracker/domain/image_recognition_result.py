@@ -1,5 +1,5 @@
 """Image recognition result domain model."""
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from datetime import datetime
 from typing import Optional, List
 
@@ -36,8 +36,20 @@ class ImageRecognitionResult:
         if self.detected_items is None:
             self.detected_items = []
 
-    def convert_calorie_entires(self, user_id: int) -> list:
+    def to_dict(self) -> dict:
+        """Plain dict form, safe to store as JSON."""
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "ImageRecognitionResult":
+        """Rebuild a result stored with to_dict."""
+        data = dict(data)
+        data["detected_items"] = [FoodItemDetection(**item) for item in data.get("detected_items") or []]
+        return cls(**data)
+    
+    def convert_calorie_entires(self, user_id: int, image_path: Optional[str] = None) -> list:
         entries = []
+        logged_at = datetime.now()
         for item in self.detected_items:
             entries.append(
                 {
@@ -48,9 +60,15 @@ class ImageRecognitionResult:
                     "quantity": item.quantity,
                     "unit": item.unit,
                     "source": "estimate",
+                    "image_path": image_path,
                     "notes": item.notes,
-                    "logged_at": datetime.now()
+                    "logged_at": logged_at
                 }
             )
         return entries
+    
+    def to_calorie_batch(self, user_id: int, image_path: Optional[str] = None) -> "CalorieBatch":
+        """Detected items as a columnar CalorieBatch."""
+        from .calorie_batch import CalorieBatch
+        return CalorieBatch.from_entries(self.convert_calorie_entires(user_id, image_path))
 
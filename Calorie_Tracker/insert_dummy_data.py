@@ -1,88 +1,59 @@
-"""Script to insert dummy calorie data for testing metrics across multiple days and weeks."""
-import sys
-from datetime import datetime, timedelta
-from random import randint, choice
-
-# Add the Calorie_Tracker directory to path
-sys.path.insert(0, '/Users/illorente/Desktop/Hackathon/calorieCounter_python/Calorie_Tracker')
-
-from database import get_database
-
-db = get_database()
+"""Script to insert synthetic calorie data for testing metrics and benchmarks.
 
-# Sample food items with calorie values
-foods = [
-    ("Apple", 95),
-    ("Banana", 105),
-    ("Chicken Breast", 165),
-    ("Rice Bowl", 206),
-    ("Salad", 150),
-    ("Pasta", 221),
-    ("Burger", 540),
-    ("Pizza Slice", 285),
-    ("Yogurt", 120),
-    ("Almonds", 164),
-    ("Salmon", 280),
-    ("Eggs", 155),
-    ("Bread", 80),
-    ("Cheese", 115),
-    ("Chocolate", 235),
-    ("Oatmeal", 150),
-    ("Sandwich", 350),
-    ("Nuts", 200),
-]
+Run from the Calorie_Tracker directory:
+    python insert_dummy_data.py --user-id 1                  # 21 days for an existing user
+    python insert_dummy_data.py --users 1000 --days 365 --fast --db bench.db
 
-# Realistic meal times throughout the day
-meal_times = [7, 8, 9, 12, 13, 14, 18, 19, 20, 21]
-
-# Get the first user (assuming user_id = 1)
-user_id = 1
-
-# Generate data for 3 weeks (21 days)
-now = datetime.now()
-
-for day_offset in range(21):
-    current_date = now - timedelta(days=day_offset)
-    
-    # Vary daily calories between 1500-2500
-    daily_total = randint(1500, 2500)
-    
-    # Insert 3-5 food items per day
-    num_meals = randint(3, 5)
-    remaining = daily_total
-    used_times = set()
-    
-    for i in range(num_meals):
-        food_name, base_cal = choice(foods)
-        
-        # Slight variation on base calories
-        calories = base_cal + randint(-30, 30)
-        
-        # Last meal gets remaining calories
-        if i == num_meals - 1:
-            calories = max(remaining, 1)
-        else:
-            remaining -= calories
-        
-        # Pick random time that hasn't been used
-        available_times = [t for t in meal_times if t not in used_times]
-        hour = choice(available_times)
-        used_times.add(hour)
-        minute = randint(0, 59)
-        
-        # Create timestamp
-        logged_at = current_date.replace(hour=hour, minute=minute, second=0)
-        
-        # Insert into database
-        db.execute(
-            """
-            INSERT INTO calories 
-            (user_id, calories, food_name, food_type, quantity, unit, source, logged_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (user_id, calories, food_name, "food", 1, "serving", "estimate", logged_at.strftime('%Y-%m-%d %H:%M:%S.%f'))
-        )
-        
-        print(f"Inserted: {food_name} ({calories} cal) on {logged_at}")
+Data comes from database.synthetic and is the same for the same --seed.
+Created users are named synthetic_<seed>_<n>; with --password they can log in.
+"""
+import argparse
+import os
+import sys
 
-print("\n✓ Dummy data insertion complete! 21 days of data inserted.")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseSchema, get_database
+from database.synthetic import load
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Insert seeded synthetic calorie data.")
+    parser.add_argument("--db", default="calories.db", help="Path to the SQLite database")
+    parser.add_argument("--users", type=int, default=1, help="Synthetic users to create")
+    parser.add_argument("--user-id", type=int, action="append",
+                        help="Add entries for this existing user instead (repeatable)")
+    parser.add_argument("--days", type=int, default=21, help="Days of entries per user, ending today")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=100_000, help="Rows per transaction")
+    parser.add_argument("--fast", action="store_true",
+                        help="Drop the calories indexes during the load and rebuild them afterwards")
+    parser.add_argument("--password", help="Password for the created users (default: no login)")
+    args = parser.parse_args()
+
+    db = get_database(args.db)
+    DatabaseSchema.initialize_database(db)
+
+    password_hash = "!"
+    if args.password:
+        from utils.auth import PasswordManager
+        password_hash = PasswordManager.hash_password(args.password)
+
+    stats = load(
+        db,
+        users=args.users,
+        days=args.days,
+        seed=args.seed,
+        password_hash=password_hash,
+        user_ids=args.user_id,
+        batch_size=args.batch_size,
+        drop_indexes=args.fast,
+        progress=lambda rows: print(f"\r{rows:,} entries", end="", flush=True)
+    )
+    print(f"\nInserted {stats.entries:,} entries for {stats.users:,} users in {stats.seconds:.1f} s "
+          f"({stats.entries / max(stats.seconds, 1e-9):,.0f} rows/s"
+          + (f", index rebuild {stats.index_seconds:.1f} s)" if args.fast else ")"))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import streamlit as st
 from database import get_database, DatabaseSchema
 from domain import User
 from utils import SessionManager, PasswordManager, AuthValidator
+from utils.auth import HashingPoolBusy, authenticate_user
+from utils.memory import MemoryProfiler
 
 st.set_page_config(
     page_title="CalorieCam",
@@ -11,34 +13,13 @@ st.set_page_config(
 )
 
 def verify_user_credentials(username: str, password: str) -> bool:
-    """Query database and verify user credentials."""
-    db = get_database()
-    
-    # Query user by username
-    result = db.fetch_one(
-        "SELECT id, username, email, password_hash FROM users WHERE username = ?",
-        (username,)
-    )
-    
-    if not result:
-        return False
-    
-    # Verify password
-    stored_hash = result[3]  # password_hash is at index 3
-    if not PasswordManager.verify_password(password, stored_hash):
+    """Verify user credentials and log the user in."""
+    user = authenticate_user(username, password)
+    if user is None:
         return False
-    
-    # Create user object and set session
-    user = User(
-        id=result[0],
-        username=result[1],
-        email=result[2],
-        password_hash=stored_hash
-    )
-    SessionManager.set_user(user)
+    SessionManager.login(user)
     return True
 
-
 def show_login_form():
     st.title("CalorieCam")
 
@@ -61,11 +42,16 @@ def show_login_form():
                     st.error("Please enter both username and password")
                 else:
                     # Query database and verify credentials
-                    if verify_user_credentials(username, password):
-                        st.success(f"Welcome back, {username}!")
-                        st.rerun()
+                    try:
+                        authenticated = verify_user_credentials(username, password)
+                    except HashingPoolBusy:
+                        st.error("The server is busy, please try again in a moment")
                     else:
-                        st.error("Invalid username or password")
+                        if authenticated:
+                            st.success(f"Welcome back, {username}!")
+                            st.rerun()
+                        else:
+                            st.error("Invalid username or password")
 
         if st.button("Sign Up"):
             st.session_state.auth_mode = "signup"
@@ -125,7 +111,7 @@ def show_login_form():
                                         email=result[2],
                                         password_hash=result[3]
                                     )
-                                    SessionManager.set_user(user)
+                                    SessionManager.login(user)
                                     st.success(f"Welcome, {new_username}!")
                                     st.rerun()
                             except Exception as e:
@@ -160,4 +146,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with MemoryProfiler.track("Login"):
+        main()
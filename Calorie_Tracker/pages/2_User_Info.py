@@ -4,6 +4,8 @@ from datetime import datetime
 from database import get_database
 from domain import User
 from utils import SessionManager, AuthValidator, PasswordManager
+from utils.tokens import get_token_store
+from utils.memory import MemoryProfiler
 
 
 
@@ -75,6 +77,11 @@ def main():
                                 (password_hash, user.id)
                             )
                             user.password_hash = password_hash
+                            # Sign out every other browser that used the old password
+                            get_token_store().revoke_user(
+                                user.id,
+                                keep_token=st.session_state.get(SessionManager.SESSION_TOKEN_KEY)
+                            )
                             updates_made = True
                 
                 if updates_made:
@@ -101,4 +108,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with MemoryProfiler.track("User Info"):
+        main()
@@ -1,216 +1,458 @@
 import streamlit as st
+from dataclasses import asdict
 from datetime import datetime
-from backend import ImageProcessor
-from database import get_database
-from domain import CalorieEntry
+from backend import ImageProcessor, get_job_queue, get_image_store, get_similarity_index
+from database import CalorieRepository
+from domain import CalorieEntry, FoodItemDetection, ImageRecognitionResult, FOOD_TYPES as ENTRY_FOOD_TYPES
 from utils import SessionManager
+from utils.timing import timed_section, show_timings
+from utils.memory import MemoryProfiler
+from utils.tracing import span
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def main():
-    SessionManager.require_authentication()(lambda: None)()
+FOOD_TYPES = [food_type.title() for food_type in ENTRY_FOOD_TYPES]
+UNITS = ["grams", "oz", "cups", "serving(s)", "piece"]
+RECENT_EDITOR_KEY = "recent_entries_editor"
+PENDING_JOBS_KEY = "pending_recognition_jobs"
+REVIEW_JOBS_KEY = "review_recognition_jobs"  # job id -> uploaded file name
+REUSED_UPLOADS_KEY = "reused_upload_ids"  # uploads logged from a similar earlier image
+SIMILAR_MATCHES_KEY = "similar_upload_matches"  # upload id -> its similarity match, or None
+MAX_IMAGES_PER_UPLOAD = 10
+JOB_POLL_SECONDS = 2
+RECOGNITION_METHODS = {
+    "Automatic": "automatic",
+    "Label Recognition": "label",
+    "Visual Estimation": "visual",
+}
+
+
+@st.fragment
+@timed_section("Recent Entries")
+def show_recent_entries(user):
+    """Render recent entries as one editable grid and save the diff in a single transaction."""
+    repository = CalorieRepository()
+    rows = repository.recent_entries(user.id, limit=10)
     
-    st.title("Log Calories from Image")
+    if not rows:
+        st.info("No entries yet.")
+        return
     
-    user = SessionManager.get_user()
+    image_store = get_image_store()
+    entries = []
+    for row in rows:
+        # some datetime magic to make the timestamp way less specific
+        logged_at = datetime.strptime(row["logged_at"], "%Y-%m-%d %H:%M:%S.%f")
+        entries.append({
+            "id": row["id"],
+            "thumbnail": image_store.thumbnail_data_uri(row["image_path"]),
+            "food_name": row["food_name"],
+            "calories": row["calories"],
+            "quantity": row["quantity"],
+            "unit": row["unit"],
+            # types saved before the list was fixed, e.g. "snack", show as Other
+            "food_type": (row["food_type"] if row["food_type"] in ENTRY_FOOD_TYPES else "other").title(),
+            "source": row["source"],
+            "notes": row["notes"] or "",
+            "logged": logged_at.strftime("%b %d, %Y at %I:%M %p")
+                      + (" (archived, read-only)" if row["archived"] else ""),
+            "delete": False,
+            "archived": bool(row["archived"]),
+        })
     
-    if user:
-        st.write(f"Logged in as: **{user.username}**")
-        
-        st.divider()
-        
-        st.subheader("Upload Food Image")
-        
-        uploaded_file = st.file_uploader(
-            "Choose an image of food (JPG, PNG)",
-            type=["jpg", "jpeg", "png"]
+    # a form keeps cell edits client-side until the user saves
+    with st.form("recent_entries_form"):
+        st.data_editor(
+            entries,
+            key=RECENT_EDITOR_KEY,
+            hide_index=True,
+            width="stretch",
+            column_order=["thumbnail", "food_name", "calories", "quantity", "unit", "food_type",
+                          "source", "notes", "logged", "delete"],
+            disabled=["thumbnail", "source", "logged"],
+            column_config={
+                "thumbnail": st.column_config.ImageColumn(""),
+                "food_name": st.column_config.TextColumn("Food", required=True),
+                "calories": st.column_config.NumberColumn("Calories", min_value=0.0, step=0.1, format="%.1f"),
+                "quantity": st.column_config.NumberColumn("Qty", min_value=0.0, step=0.1),
+                "unit": st.column_config.SelectboxColumn("Unit", options=UNITS),
+                "food_type": st.column_config.SelectboxColumn("Type", options=FOOD_TYPES),
+                "source": st.column_config.TextColumn("Source"),
+                "notes": st.column_config.TextColumn("Notes"),
+                "logged": st.column_config.TextColumn("Logged"),
+                "delete": st.column_config.CheckboxColumn("Delete"),
+            }
         )
+        submitted = st.form_submit_button("Save Changes")
+    
+    if submitted:
+        edited_rows = st.session_state[RECENT_EDITOR_KEY]["edited_rows"]
+        updates = {}
+        deleted_ids = []
+        read_only = 0
+        for index, changes in edited_rows.items():
+            entry_id = entries[int(index)]["id"]
+            if entries[int(index)]["archived"]:
+                read_only += 1
+                continue
+            if changes.get("delete"):
+                deleted_ids.append(entry_id)
+                continue
+            changes = {column: value for column, value in changes.items() if column != "delete"}
+            if "food_type" in changes and changes["food_type"]:
+                changes["food_type"] = changes["food_type"].lower()
+            if changes:
+                updates[entry_id] = changes
         
-        if uploaded_file is not None:
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.image(uploaded_file, caption="Uploaded Image", use_column_width=True)
-            
-            with col2:
-                st.write("### Processing Options")
-                method = st.radio(
-                    "Recognition method:",
-                    ["Automatic", "Label Recognition", "Visual Estimation"]
-                )
-                
-                if st.button("Process Image", key="process_btn"):
-                    with st.spinner("Processing image..."):
-                        
-                        processor = ImageProcessor()
-                        image_bytes = uploaded_file.read()
-                        
-                        if processor.validate_image(image_bytes):
-                            if method == "Label Recognition":
-                                result = processor.label_recognizer.recognize(image_bytes)
-                            elif method == "Visual Estimation":
-                                result = processor.visual_estimator.recognize(image_bytes)
-                            else:
-                                result = processor.process_image(image_bytes)
-                            
-                            if result.success:
-                               
-                                db = get_database()
-                                for entry in result.convert_calorie_entires(user_id=user.id):
-                                    db.execute("""INSERT INTO calories (user_id, calories, food_name, 
-                                        food_type, quantity, unit, source, notes, logged_at)
-                                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                                        tuple(entry.values()))
-                                
-                                st.success("Entry saved!")
-                                db.connection.commit()
-                            else:
-                                st.warning(f"Processing error: {result.error_message}")
-                        else:
-                            st.error("Invalid image file")
-        
-        st.divider()
-        
-        st.subheader("Or Log Calories Manually")
+        if read_only:
+            st.warning(f"Archived entries are read-only; changes to {read_only} of them were not saved.")
+        if updates or deleted_ids:
+            try:
+                changed = repository.apply_changes(user.id, updates, deleted_ids)
+            except Exception as e:
+                st.error(f"Failed to save changes: {e}")
+                return
+            if changed < len(updates) + len(deleted_ids):
+                st.warning(f"Saved {changed} of {len(updates) + len(deleted_ids)} changes; "
+                           "the other entries were archived or deleted meanwhile.")
+            elif not read_only:
+                st.success("Updated!")
+                st.rerun()
+        elif not read_only:
+            st.info("No changes were made")
+
+
+@st.fragment
+@timed_section("Upload and Recognition")
+def show_upload(user):
+    """Upload and recognition section; reruns on its own when its widgets change."""
+    uploaded_files = st.file_uploader(
+        f"Choose up to {MAX_IMAGES_PER_UPLOAD} images of food (JPG, PNG)",
+        type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True
+    )
+    
+    if uploaded_files:
+        if len(uploaded_files) > MAX_IMAGES_PER_UPLOAD:
+            st.warning(f"Only the first {MAX_IMAGES_PER_UPLOAD} images will be processed.")
+            uploaded_files = uploaded_files[:MAX_IMAGES_PER_UPLOAD]
         
-        col1, col2, col3 = st.columns(3)
+        col1, col2 = st.columns(2)
         
         with col1:
-            food_name = st.text_input("Food Name")
+            st.image(
+                uploaded_files,
+                caption=[uploaded_file.name for uploaded_file in uploaded_files],
+                width=160 if len(uploaded_files) > 1 else "stretch"
+            )
         
         with col2:
-            calories = st.number_input("Calories", min_value=0.0, step=0.10)
-        
-        with col3:
-            food_type = st.selectbox(
-                "Food Type",
-                ["Vegetable", "Protein", "Grain", "Fruit", "Dairy", "Fat", "Other"]
+            st.write("### Processing Options")
+            method = st.radio(
+                "Recognition method:",
+                list(RECOGNITION_METHODS)
             )
-        
-        quantity = st.number_input("Quantity", min_value=0.0, step=0.10)
-        unit = st.selectbox("Unit", ["grams", "oz", "cups", "serving(s)", "piece"])
-        notes = st.text_area("Notes", height=80)
-        
-        if st.button("Save Entry", key="save_entry_btn"):
-            if not food_name or calories == 0:
-                st.error("Please enter food name and calories")
-            else:
-                entry = CalorieEntry(
-                    user_id=user.id,
-                    calories=calories,
-                    food_name=food_name,
-                    food_type=food_type.lower(),
-                    quantity=quantity,
-                    unit=unit,
-                    source="estimate",
-                    notes=notes
-                )
-        
-                try:
-                    db = get_database()
-                    db.execute(
-                        """
-                        INSERT INTO calories
-                        (user_id, calories, food_name, food_type,
-                         quantity, unit, source, notes, logged_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            entry.user_id,
-                            entry.calories,
-                            entry.food_name,
-                            entry.food_type,
-                            entry.quantity,
-                            entry.unit,
-                            entry.source,
-                            entry.notes,
-                            entry.created_at
-                        )
-                    )
-                    db.connection.commit()
-                    st.success("Entry saved!")
+            review = st.toggle("Review results before saving", value=len(uploaded_files) > 1)
+            
+            if st.button("Process Images" if len(uploaded_files) > 1 else "Process Image", key="process_btn"):
+                reused = st.session_state.get(REUSED_UPLOADS_KEY, set())
+                uploaded_files = [f for f in uploaded_files if f.file_id not in reused]
+                # the recognition jobs continue this trace on the worker threads
+                with span("log_meal", user_id=user.id, images=len(uploaded_files), method=method):
+                    images = []
+                    for uploaded_file in uploaded_files:
+                        with span("upload.read", size=uploaded_file.size):
+                            images.append(uploaded_file.getvalue())
+                    invalid = [
+                        uploaded_file.name
+                        for uploaded_file, image_bytes in zip(uploaded_files, images)
+                        if not ImageProcessor.validate_image(image_bytes)
+                    ]
                     
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to save entry: {e}")
+                    if invalid:
+                        st.error(f"Invalid image file: {', '.join(invalid)}")
+                    else:
+                        with span("enqueue"):
+                            # reviewed uploads wait for every result anyway, so batch their requests
+                            job_ids = get_job_queue().enqueue_many(
+                                user.id, images, RECOGNITION_METHODS[method], auto_save=not review, batch=review
+                            )
+                        st.session_state.setdefault(PENDING_JOBS_KEY, []).extend(job_ids)
+                        if review:
+                            st.session_state[REVIEW_JOBS_KEY] = {
+                                job_id: uploaded_file.name
+                                for job_id, uploaded_file in zip(job_ids, uploaded_files)
+                            }
+                        # rerun the page so the Processing fragment starts polling
+                        st.rerun()
         
-        st.divider()
-        
-        st.subheader("Recent Entries")
-        
-        db = get_database()
+        show_suggestions(user, uploaded_files)
+
+
+def show_suggestions(user, uploaded_files):
+    """Offer the earlier result for uploads that look like an image the user already logged."""
+    index = get_similarity_index()
+    reused = st.session_state.setdefault(REUSED_UPLOADS_KEY, set())
+    # looked up once per upload, not on every rerun of the fragment; removed uploads are dropped
+    cached = st.session_state.get(SIMILAR_MATCHES_KEY, {})
+    matches = st.session_state[SIMILAR_MATCHES_KEY] = {}
+    for uploaded_file in uploaded_files:
+        file_id = uploaded_file.file_id
+        if file_id in reused:
+            continue
+        if file_id in cached:
+            match = cached[file_id]
+        else:
+            try:
+                match = index.lookup(user.id, uploaded_file.getvalue())
+            except Exception:
+                match = None  # unreadable images are reported when processing
+        matches[file_id] = match
+        if match is None:
+            continue
         
-        rows = db.fetch_all(
-            """
-            SELECT food_name, calories, quantity, unit, food_type,
-                   source, notes, logged_at
-            FROM calories
-            WHERE user_id = ?
-            ORDER BY logged_at DESC
-            LIMIT 10
-            """,
-            (user.id,)
+        items = ", ".join(
+            f"{item.food_name} ({item.calories:.0f} cal)" for item in match.result.detected_items
         )
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.info(f"{uploaded_file.name} looks like an earlier photo: {items}")
+        with col2:
+            if st.button("Log the same", key=f"reuse_{uploaded_file.file_id}"):
+                with span("log_same", user_id=user.id):
+                    image_path = get_image_store().save(uploaded_file.getvalue())
+                    with span("convert_calorie_entires"):
+                        entries = match.result.convert_calorie_entires(user_id=user.id, image_path=image_path)
+                    try:
+                        with span("insert_entries", rows=len(entries)):
+                            CalorieRepository().insert_entries(entries)
+                        reused.add(uploaded_file.file_id)
+                        st.rerun(scope="app")
+                    except Exception as e:
+                        st.error(f"Failed to save entries: {e}")
+
+
+def show_jobs(user):
+    """Poll the user's recognition jobs while any of this session's jobs are pending."""
+    interval = JOB_POLL_SECONDS if st.session_state.get(PENDING_JOBS_KEY) else None
+    st.fragment(run_every=interval)(_job_status)(user)
+
+
+def _job_status(user):
+    queue = get_job_queue()
+    jobs = queue.jobs_for_user(user.id)
+    if not jobs:
+        return
+    
+    st.write("### Processing")
+    pending = st.session_state.get(PENDING_JOBS_KEY, [])
+    finished_now = False
+    for job in jobs:
+        if job["status"] in ("queued", "running"):
+            st.info(f"Image #{job['id']}: {job['status']}...")
+            continue
+        if job["status"] == "done" and not job["auto_save"]:
+            st.success(f"Image #{job['id']}: ready for review")
+        elif job["status"] == "done":
+            result = queue.parse_result(job)
+            items = ", ".join(
+                f"{item.food_name} ({item.calories:.0f} cal)" for item in result.detected_items
+            )
+            st.success(f"Image #{job['id']}: saved {items or 'no items'}")
+        else:
+            st.warning(f"Image #{job['id']}: processing error: {job['error_message']}")
+        if job["id"] in pending:
+            pending.remove(job["id"])
+            finished_now = True
+    
+    if finished_now:
+        # refresh Recent Entries and the review table with the finished jobs
+        st.rerun(scope="app")
+
+
+@st.fragment
+@timed_section("Review Results")
+def show_review(user):
+    """Per-image results with accept toggles; accepted items are saved in one transaction."""
+    review_jobs = st.session_state.get(REVIEW_JOBS_KEY)
+    if not review_jobs:
+        return
+    
+    queue = get_job_queue()
+    jobs = queue.get_jobs(list(review_jobs))
+    if any(job["status"] in ("queued", "running") for job in jobs):
+        return
+    
+    st.write("### Review Results")
+    image_store = get_image_store()
+    items = []
+    results = {}
+    for job in jobs:
+        result = queue.parse_result(job)
+        if result is None or not result.success:
+            st.warning(f"{review_jobs[job['id']]}: {job['error_message'] or 'nothing detected'}")
+            continue
+        results[job["id"]] = result
+        for entry in result.convert_calorie_entires(user_id=user.id, image_path=job["image_path"]):
+            entry.pop("logged_at")  # stamped when the user saves
+            items.append({
+                "accept": True,
+                "thumbnail": image_store.thumbnail_data_uri(job["image_path"]),
+                "image": review_jobs[job["id"]],
+                "job_id": job["id"],
+                **entry
+            })
+    
+    if items:
+        with st.form("review_results_form"):
+            reviewed = st.data_editor(
+                items,
+                hide_index=True,
+                width="stretch",
+                column_order=["accept", "thumbnail", "image", "food_name", "calories", "quantity",
+                              "unit", "food_type", "notes"],
+                disabled=["thumbnail", "image"],
+                column_config={
+                    "accept": st.column_config.CheckboxColumn("Accept"),
+                    "thumbnail": st.column_config.ImageColumn(""),
+                    "image": st.column_config.TextColumn("Image"),
+                    "food_name": st.column_config.TextColumn("Food", required=True),
+                    "calories": st.column_config.NumberColumn("Calories", min_value=0.0, step=0.1, format="%.1f"),
+                    "quantity": st.column_config.NumberColumn("Qty", min_value=0.0, step=0.1),
+                    "unit": st.column_config.TextColumn("Unit"),
+                    "food_type": st.column_config.TextColumn("Type"),
+                    "notes": st.column_config.TextColumn("Notes"),
+                }
+            )
+            save = st.form_submit_button("Save Accepted")
         
-        if rows:
-            for row in rows:
-                with st.container():
-                    col1, col2, col3 = st.columns([3, 1, 1])
-                    
-                    with col1:
-                        st.write(f"**{row['food_name']}**")
-                        st.write(
-                            f"{row['quantity']} {row['unit']} • "
-                            f"{row['food_type'].title()} • "
-                            f"Source: {row['source']}"
-                        )
-                        if row["notes"]:
-                            st.caption(row["notes"])
-                    
-                    with col2:
-                        st.metric("Calories", f"{row['calories']:.01f}")
-                    
-                    with col3:
-                        if st.button("Delete", key=f"delete_{row['logged_at']}"):
-                            db.execute("DELETE FROM calories WHERE user_id = ? AND logged_at = ?", 
-                                (user.id, row['logged_at']))
-                            db.connection.commit()
-                            st.rerun()
-
-                    with st.expander("Edit"):
-                        new_calories = st.number_input("Calories", min_value=0.0, step=0.10, value=float(row['calories']), key=f"cal_{row['logged_at']}")
-                        new_food_name = st.text_input("Food Name", value=row['food_name'], key=f"name_{row['logged_at']}")
-                        new_food_type = st.selectbox("Food Type",["Vegetable", "Protein", "Grain", "Fruit", "Dairy", "Fat", "Other"],
-                            index = unit.index(row["food_type"]) if row["food_type"] in unit else 0,
-                            key=f"type_{row['logged_at']}")
-                        new_food_qty = st.number_input("Quantity", min_value=0.0, step=0.10, value=float(row['quantity']), key=f"qty{row['logged_at']}")
-                        new_food_qty_unit = st.selectbox("Unit", ["grams", "oz", "cups", "serving(s)", "piece"],
-                            index = unit.index(row["unit"]) if row["unit"] in unit else 0, 
-                            key=f"unit{row['logged_at']}")
-                        new_notes = st.text_input("Notes", value=row["notes"] or "", key=f"notes_{row['logged_at']}")
-                
-                        if st.button("Save Changes", key=f"save_{row['logged_at']}"):
-                            db.execute("""UPDATE calories SET calories = ?, food_name = ?, food_type = ?, 
-                                       quantity = ?, unit = ?, notes = ?
-                                        WHERE user_id = ? AND logged_at = ?""",
-                                    (new_calories, new_food_name, new_food_type, new_food_qty, new_food_qty_unit,
-                                    new_notes,
-                                    user.id, row["logged_at"]))
-                            db.connection.commit()
-                            st.success("Updated!")
-                            st.rerun()
-
-                    # some datetime magic to make the timestamp caption way less specific
-                    logged_at = datetime.strptime(row["logged_at"], "%Y-%m-%d %H:%M:%S.%f")
-                    logged_at_formatted = logged_at.strftime("%b %d, %Y at %I:%M %p")
-                    st.caption(f"Logged: {logged_at_formatted}")
-
-                    st.divider()
-
-                   
+        if save:
+            if hasattr(reviewed, "to_dict"):
+                reviewed = reviewed.to_dict("records")
+            logged_at = datetime.now()
+            accepted = [{**item, "logged_at": logged_at} for item in reviewed if item["accept"]]
+            try:
+                with span("save_reviewed", user_id=user.id), span("insert_entries", rows=len(accepted)):
+                    CalorieRepository().insert_entries(accepted)
+                remember_accepted(user, results, accepted)
+                del st.session_state[REVIEW_JOBS_KEY]
+                st.success(f"Saved {len(accepted)} entries!")
+                st.rerun(scope="app")
+            except Exception as e:
+                st.error(f"Failed to save entries: {e}")
+    
+    if st.button("Discard Results"):
+        del st.session_state[REVIEW_JOBS_KEY]
+        st.rerun(scope="app")
+
+
+def remember_accepted(user, results, accepted):
+    """Fingerprint each reviewed image with just the items the user accepted, as edited."""
+    image_store = get_image_store()
+    index = get_similarity_index()
+    for job_id, result in results.items():
+        items = [item for item in accepted if item["job_id"] == job_id]
+        if not items:
+            continue
+        kept = ImageRecognitionResult(
+            success=True,
+            method=result.method,
+            detected_items=[
+                FoodItemDetection(
+                    calories=item["calories"],
+                    food_name=item["food_name"],
+                    quantity=item["quantity"],
+                    unit=item["unit"],
+                    food_type=item["food_type"],
+                    notes=item["notes"]
+                )
+                for item in items
+            ],
+            estimated_calories=sum(item["calories"] for item in items),
+            confidence_score=result.confidence_score
+        )
+        image_path = items[0]["image_path"]
+        try:
+            with span("fingerprint"):
+                index.add(user.id, image_store.read_image(image_path), kept, image_path)
+        except Exception:
+            pass  # the entries are saved; the image just won't be suggested again
+
+
+@st.fragment
+@timed_section("Manual Entry")
+def show_manual_entry(user):
+    """Manual entry section; typing here does not rerun the rest of the page."""
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        food_name = st.text_input("Food Name")
+    
+    with col2:
+        calories = st.number_input("Calories", min_value=0.0, step=0.10)
+    
+    with col3:
+        food_type = st.selectbox("Food Type", FOOD_TYPES)
+    
+    quantity = st.number_input("Quantity", min_value=0.0, step=0.10)
+    unit = st.selectbox("Unit", UNITS)
+    notes = st.text_area("Notes", height=80)
+    
+    if st.button("Save Entry", key="save_entry_btn"):
+        if not food_name or calories == 0:
+            st.error("Please enter food name and calories")
         else:
-            st.info("No entries yet.")
+            entry = CalorieEntry(
+                user_id=user.id,
+                calories=calories,
+                food_name=food_name,
+                food_type=food_type.lower(),
+                quantity=quantity,
+                unit=unit,
+                source="estimate",
+                notes=notes
+            )
+    
+            try:
+                with span("manual_entry", user_id=user.id), span("insert_entries", rows=1):
+                    CalorieRepository().insert_entry(asdict(entry))
+                st.success("Entry saved!")
+                
+                st.rerun()
+            except Exception as e:
+                st.error(f"Failed to save entry: {e}")
+
+
+def main():
+    SessionManager.require_authentication()(lambda: None)()
+    
+    st.title("Log Calories from Image")
+    
+    user = SessionManager.get_user()
+    
+    if user:
+        with timed_section("Log Calories page"):
+            st.write(f"Logged in as: **{user.username}**")
+            
+            st.divider()
+            
+            st.subheader("Upload Food Image")
+            show_upload(user)
+            show_jobs(user)
+            show_review(user)
+            
+            st.divider()
+            
+            st.subheader("Or Log Calories Manually")
+            show_manual_entry(user)
+            
+            st.divider()
+            
+            st.subheader("Recent Entries")
+            show_recent_entries(user)
+        
+        show_timings()
     
     else:
         st.warning("Please log in first")
@@ -218,4 +460,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with MemoryProfiler.track("Log Calories"):
+        main()
\ No newline at end of file
@@ -1,57 +1,19 @@
 """Metrics page."""
 import streamlit as st
-from database import get_database, DatabaseSchema
+from database import get_database, DatabaseSchema, CalorieRepository, EntrySearch
 from domain import User
 from utils import SessionManager, PasswordManager, AuthValidator
-import pandas as pd 
-from datetime import datetime, timedelta
+from utils.timing import timed_section, show_timings
+from utils.memory import MemoryProfiler
 
-user = SessionManager.get_user()
-db = get_database()
-    
-if user:
-    st.subheader(f"Entries for User: {user.username}")
-    seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
-    
-    weekly_total = db.fetch_one(
-        """
-        SELECT SUM(calories) as total_calories
-        FROM calories
-        WHERE user_id = ? AND logged_at >= ?
-        """,
-        (user.id, seven_days_ago)
-    )
-    
-    daily_calories = db.fetch_all(
-        """
-        SELECT DATE(logged_at) as day, SUM(calories) as daily_total
-        FROM calories
-        WHERE user_id = ? AND logged_at >= ?
-        GROUP BY DATE(logged_at)
-        ORDER BY day ASC
-        """,
-        (user.id, seven_days_ago)
-    )
-    
-
-    total_calories = weekly_total['total_calories'] if weekly_total and weekly_total['total_calories'] else 0
-    
 
-    chart_data = [row['daily_total'] for row in daily_calories] if daily_calories else []
-    
-    # delta calculation
-    fourteen_days_ago = (datetime.now() - timedelta(days=14)).isoformat()
-    previous_week_total = db.fetch_one(
-        """
-        SELECT SUM(calories) as total_calories
-        FROM calories
-        WHERE user_id = ? AND logged_at >= ? AND logged_at < ?
-        """,
-        (user.id, fourteen_days_ago, seven_days_ago)
-    )
-    
-    previous_total = previous_week_total['total_calories'] if previous_week_total and previous_week_total['total_calories'] else 0
-    delta = total_calories - previous_total
+@timed_section("Weekly Summary")
+def show_weekly_summary(user):
+    """Weekly total, delta against the previous week and the daily sparkline."""
+    summary = CalorieRepository().weekly_summary(user.id)
+    total_calories = summary["total"]
+    chart_data = [row['daily_total'] for row in summary["daily"]]
+    delta = total_calories - summary["previous_total"]
 
     row = st.container(horizontal=True)
     with row:
@@ -63,11 +25,59 @@ if user:
             chart_type="line", 
             border=True
         )
-       
-   
-    # db query for total calories
-    query = "SELECT * FROM calories WHERE user_id = ? ORDER BY logged_at DESC LIMIT 50"
-    df = pd.read_sql_query(query, db.connection, params=(user.id,))
+
+
+@st.fragment
+@timed_section("Search")
+def show_search(user):
+    """Search box over all of the user's entries, ranked and paginated."""
+    text = st.text_input("Search entries", placeholder="e.g. ramen, chicken salad, dinner")
+    if not text.strip():
+        return
+
+    # back to the first page whenever the search text changes
+    if st.session_state.get("search_text") != text:
+        st.session_state.search_text = text
+        st.session_state.search_page = 0
+
+    results = EntrySearch().search(user.id, text, page=st.session_state.search_page)
+    if not results.total:
+        st.info("No matching entries.")
+        return
+
+    st.dataframe(
+        [
+            {
+                "Food": row["food_name"],
+                "Calories": f"{int(row['calories'])} cal",
+                "Type": row["food_type"],
+                "Notes": row["notes"],
+                "Logged": str(row["logged_at"])[:16],
+            }
+            for row in results.rows
+        ],
+        width="stretch",
+        hide_index=True,
+    )
+
+    def turn_to(page):
+        st.session_state.search_page = page
+
+    row = st.container(horizontal=True)
+    with row:
+        st.button("Previous", disabled=results.page == 0, on_click=turn_to, args=(results.page - 1,))
+        st.caption(f"Page {results.page + 1} of {results.pages} ({results.total} entries)")
+        st.button("Next", disabled=results.page + 1 >= results.pages, on_click=turn_to, args=(results.page + 1,))
+
+
+@timed_section("Log")
+def show_log(user):
+    """Table of the user's latest 50 entries."""
+    # pandas takes longer to import than the rest of the page; load it only here
+    import pandas as pd
+    
+    rows = CalorieRepository().recent_entries(user.id, limit=50)
+    df = pd.DataFrame([dict(row) for row in rows])
     
     if not df.empty:
         
@@ -95,7 +105,7 @@ if user:
         
         st.dataframe(
             df_display,
-            use_container_width=True,
+            width="stretch",
             hide_index=True,
             column_config={
                 "Food": st.column_config.TextColumn(width="medium"),
@@ -109,7 +119,25 @@ if user:
         )
     else:
         st.info("No calorie entries yet.")
+
+
+def main():
+    """Main function for metrics page."""
+    user = SessionManager.get_user()
+    
+    if user:
+        st.subheader(f"Entries for User: {user.username}")
+        with timed_section("User Metrics page"):
+            show_weekly_summary(user)
+            show_search(user)
+            show_log(user)
+        show_timings()
     
-else:
-    st.warning("Please log in first")
-    st.switch_page("pages/1_Login.py")
\ No newline at end of file
+    else:
+        st.warning("Please log in first")
+        st.switch_page("pages/1_Login.py")
+
+
+if __name__ == "__main__":
+    with MemoryProfiler.track("User Metrics"):
+        main()
@@ -0,0 +1,61 @@
+"""Memory profile admin page."""
+import os
+import streamlit as st
+from datetime import datetime
+from utils import SessionManager
+from utils.memory import MemoryProfiler, ENABLED, BUDGET_BYTES
+
+
+def main():
+    """Main function for the memory profile page."""
+    SessionManager.require_authentication()(lambda: None)()
+    
+    st.title("Memory Profile")
+    
+    if not SessionManager.is_admin():
+        st.error("This page is only available to administrators.")
+        return
+    
+    if not ENABLED:
+        st.info("Memory profiling is off. Start the server with CALORIE_MEMORY_PROFILE=1 to enable it.")
+        return
+    
+    st.caption(f"Per-session budget: {BUDGET_BYTES / 1024 / 1024:.0f} MB of session state")
+    
+    for alarm in MemoryProfiler.alarms[-10:]:
+        st.warning(alarm)
+    
+    st.subheader("Sessions")
+    rows = []
+    for session_id, session in reversed(list(MemoryProfiler.sessions().items())):
+        for page, stats in session.pages.items():
+            rows.append({
+                "Session": session_id[:8],
+                "Page": page,
+                "Reruns": stats.reruns,
+                "Retained last rerun (KB)": round(stats.last_retained_bytes / 1024, 1),
+                "Retained total (KB)": round(stats.total_retained_bytes / 1024, 1),
+                "Session state (KB)": round(session.session_state_bytes / 1024, 1),
+                "Over budget": session.over_budget,
+                "Last seen": datetime.fromtimestamp(session.last_seen).strftime("%H:%M:%S"),
+            })
+    if rows:
+        st.dataframe(rows, width="stretch", hide_index=True)
+    else:
+        st.info("No tracked reruns yet.")
+    
+    st.subheader("Top Allocation Sites")
+    sites = MemoryProfiler.top_allocation_sites()
+    if sites:
+        st.code("\n".join(str(stat) for stat in sites), language=None)
+    
+    if st.button("Dump Snapshot"):
+        path = MemoryProfiler.dump_snapshot()
+        if path:
+            st.success(f"Snapshot written to {os.path.abspath(path)}")
+            with open(path, "rb") as snapshot:
+                st.download_button("Download snapshot", snapshot.read(), file_name=os.path.basename(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Traces admin page: where recent uploads and recognitions spent their time."""
+import os
+import streamlit as st
+from datetime import datetime
+from utils import SessionManager
+from utils.tracing import ENABLED, TRACE_FILE, flame_rows, load_traces, summarize_by_name, trace_duration
+
+MAX_TRACES = 200
+
+
+def show_trace(spans):
+    """One trace as a flame-style table: call-tree order, bars scaled to the whole trace."""
+    total = trace_duration(spans)
+    rows = []
+    for row in flame_rows(spans):
+        rows.append({
+            "Span": " " * row["depth"] + row["name"],
+            "Start (ms)": round(row["offset"] * 1000, 1),
+            "Duration (ms)": round(row["duration"] * 1000, 1),
+            "Self (ms)": round(row["self"] * 1000, 1),
+            "Share": row["duration"] / total if total else 0.0,
+            "Thread": row["thread"],
+            "Error": row["error"] or "",
+            "Attributes": ", ".join(f"{key}={value}" for key, value in row["attributes"].items()),
+        })
+    st.dataframe(
+        rows,
+        width="stretch",
+        hide_index=True,
+        column_config={
+            "Share": st.column_config.ProgressColumn("Share of trace", min_value=0.0, max_value=1.0, format="percent"),
+        }
+    )
+
+
+def main():
+    """Main function for the traces page."""
+    SessionManager.require_authentication()(lambda: None)()
+
+    st.title("Traces")
+
+    if not SessionManager.is_admin():
+        st.error("This page is only available to administrators.")
+        return
+
+    if not ENABLED:
+        st.info("Tracing is off. Start the server with CALORIE_TRACING=1 to enable it.")
+        return
+
+    st.caption(f"Reading {os.path.abspath(TRACE_FILE)}")
+    traces = load_traces(TRACE_FILE, limit=MAX_TRACES)
+    if not traces:
+        st.info("No traces recorded yet.")
+        return
+
+    st.subheader("Slowest Spans")
+    st.dataframe(
+        [
+            {
+                "Span": row["name"],
+                "Count": row["count"],
+                "Total (s)": round(row["total"], 2),
+                "p50 (ms)": round(row["p50"] * 1000, 1),
+                "p95 (ms)": round(row["p95"] * 1000, 1),
+            }
+            for row in summarize_by_name(traces)
+        ],
+        width="stretch",
+        hide_index=True
+    )
+
+    st.subheader("Trace")
+    user_filter = st.text_input("User id", help="Only traces started by this user")
+    choices = {}
+    for trace_id, spans in reversed(traces.items()):
+        root = spans[0]
+        if user_filter and str(root.attributes.get("user_id")) != user_filter.strip():
+            continue
+        started = datetime.fromtimestamp(root.start).strftime("%H:%M:%S")
+        label = f"{started}  {root.name}  {trace_duration(spans):.2f} s  ({trace_id})"
+        choices[label] = trace_id
+    if not choices:
+        st.info("No traces for that user.")
+        return
+
+    selected = st.selectbox("Recent traces, newest first", list(choices))
+    show_trace(traces[choices[selected]])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,183 @@
 """Authentication utilities."""
 import hashlib
+import hmac
+import multiprocessing
+import os
 import secrets
-from typing import Tuple
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from database import DatabaseConnection, get_database
+from domain import User
+
+HASH_ALGORITHM = "pbkdf2_sha256"
+LEGACY_ITERATIONS = 100000  # work factor of hashes stored as "salt$hash"
+DEFAULT_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", str(LEGACY_ITERATIONS)))
+DEFAULT_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+QUEUE_TIMEOUT_SECONDS = 30
+
+
+def _pbkdf2(password: str, salt: str, iterations: int) -> str:
+    """Run PBKDF2-SHA256. Module level so worker processes can unpickle it."""
+    return hashlib.pbkdf2_hmac(
+        'sha256',
+        password.encode('utf-8'),
+        salt.encode('utf-8'),
+        iterations
+    ).hex()
+
+
+class HashingPoolBusy(RuntimeError):
+    """Raised when the hashing queue stays full for too long."""
+
+
+class HashingPool:
+    """Bounded process pool that keeps PBKDF2 off the Streamlit script threads."""
+    
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_pending: Optional[int] = None):
+        self.workers = workers
+        self._executor = None
+        if workers > 0:
+            # spawn avoids forking a process that already runs server threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        # running + queued jobs; callers block once this many are in flight
+        if max_pending is None:
+            max_pending = workers * 4
+        self._slots = threading.BoundedSemaphore(max(1, workers + max_pending))
+    
+    def run(self, password: str, salt: str, iterations: int) -> str:
+        """Hash on a worker process, waiting for a queue slot if needed."""
+        if self._executor is None:
+            return _pbkdf2(password, salt, iterations)
+        if not self._slots.acquire(timeout=QUEUE_TIMEOUT_SECONDS):
+            raise HashingPoolBusy("Password hashing queue is full")
+        try:
+            return self._executor.submit(_pbkdf2, password, salt, iterations).result()
+        finally:
+            self._slots.release()
+    
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+# Global hashing pool, created on first use
+_pool: Optional[HashingPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool() -> HashingPool:
+    """Get global hashing pool instance."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool()
+        return _pool
+
+
+def configure_hashing_pool(workers: int, max_pending: Optional[int] = None) -> HashingPool:
+    """Replace the global hashing pool, e.g. to resize it."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = HashingPool(workers, max_pending)
+        return _pool
 
 
 class PasswordManager:
     """Manages password hashing and verification."""
     
     @staticmethod
-    def hash_password(password: str) -> str:
-        """Hash a password with salt."""
+    def hash_password(password: str, iterations: int = None) -> str:
+        """Hash a password with salt as "pbkdf2_sha256$iterations$salt$hash"."""
+        iterations = iterations or DEFAULT_ITERATIONS
         salt = secrets.token_hex(16)
-        pwdhash = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'),
-            salt.encode('utf-8'),
-            100000
-        )
-        return f"{salt}${pwdhash.hex()}"
+        pwdhash = get_hashing_pool().run(password, salt, iterations)
+        return f"{HASH_ALGORITHM}${iterations}${salt}${pwdhash}"
+    
+    @staticmethod
+    def parse_hash(password_hash: str) -> Tuple[int, str, str]:
+        """Split a stored hash into (iterations, salt, hash), accepting the legacy format."""
+        parts = password_hash.split('$')
+        if len(parts) == 2:
+            salt, pwdhash = parts
+            return LEGACY_ITERATIONS, salt, pwdhash
+        algorithm, iterations, salt, pwdhash = parts
+        if algorithm != HASH_ALGORITHM:
+            raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+        return int(iterations), salt, pwdhash
     
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
         """Verify a password against its hash."""
         try:
-            salt, pwdhash = password_hash.split('$')
-            pwdhash_check = hashlib.pbkdf2_hmac(
-                'sha256',
-                password.encode('utf-8'),
-                salt.encode('utf-8'),
-                100000
-            )
-            return pwdhash_check.hex() == pwdhash
+            iterations, salt, pwdhash = PasswordManager.parse_hash(password_hash)
+            pwdhash_check = get_hashing_pool().run(password, salt, iterations)
+            return hmac.compare_digest(pwdhash_check, pwdhash)
+        except HashingPoolBusy:
+            raise
+        except Exception:
+            return False
+    
+    @staticmethod
+    def needs_rehash(password_hash: str) -> bool:
+        """Check whether a stored hash uses an outdated format or work factor."""
+        try:
+            iterations, _, _ = PasswordManager.parse_hash(password_hash)
         except Exception:
             return False
+        return password_hash.count('$') != 3 or iterations != DEFAULT_ITERATIONS
+
+
+def authenticate_user(
+    username: str,
+    password: str,
+    db: Optional[DatabaseConnection] = None
+) -> Optional[User]:
+    """
+    Check a username and password against the users table.
+
+    Hashes made with an older format or work factor are upgraded while the
+    password is at hand.
+
+    Returns:
+        The User, or None if the credentials don't match
+
+    Raises:
+        HashingPoolBusy: if the hashing queue stays full
+    """
+    db = db or get_database()
+    result = db.fetch_one(
+        "SELECT id, username, email, password_hash FROM users WHERE username = ?",
+        (username,)
+    )
+    if not result:
+        return None
+
+    stored_hash = result[3]
+    if not PasswordManager.verify_password(password, stored_hash):
+        return None
+
+    if PasswordManager.needs_rehash(stored_hash):
+        stored_hash = PasswordManager.hash_password(password)
+        db.execute(
+            "UPDATE users SET password_hash = ? WHERE id = ?",
+            (stored_hash, result[0])
+        )
+
+    return User(
+        id=result[0],
+        username=result[1],
+        email=result[2],
+        password_hash=stored_hash
+    )
 
 
 class AuthValidator:
@@ -0,0 +1,161 @@
+"""Opt-in memory accounting per Streamlit session and page.
+
+Enable with CALORIE_MEMORY_PROFILE=1. Each tracked rerun records the traced
+heap growth that survived the rerun and an estimate of the session's
+st.session_state size. CALORIE_MEMORY_BUDGET_MB sets the per-session alarm.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+ENABLED = os.getenv("CALORIE_MEMORY_PROFILE", "").lower() in ("1", "true", "yes")
+BUDGET_BYTES = int(float(os.getenv("CALORIE_MEMORY_BUDGET_MB", "50")) * 1024 * 1024)
+TRACEBACK_FRAMES = 10
+MAX_SESSIONS = 500  # oldest sessions are dropped beyond this
+MAX_ALARMS = 100
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PageMemory:
+    """Memory observed for one page in one session."""
+
+    reruns: int = 0
+    last_retained_bytes: int = 0  # traced heap growth kept after the last rerun
+    total_retained_bytes: int = 0
+    last_seconds: float = 0.0
+
+
+@dataclass
+class SessionMemory:
+    """Memory observed for one browser session."""
+
+    session_state_bytes: int = 0
+    last_seen: float = 0.0
+    over_budget: bool = False
+    pages: Dict[str, PageMemory] = field(default_factory=dict)
+
+
+def _deep_sizeof(obj, seen: set) -> int:
+    """Approximate retained size of an object graph, counting shared objects once."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    # uploaded files and other buffers report their payload, not the wrapper
+    if hasattr(obj, "getbuffer"):
+        try:
+            return max(sys.getsizeof(obj), obj.getbuffer().nbytes)
+        except (TypeError, ValueError):
+            pass
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):
+        return int(obj.memory_usage(deep=True).sum())
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(_deep_sizeof(getattr(obj, name), seen)
+                    for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+class MemoryProfiler:
+    """Collects per-session, per-page memory figures across the server process."""
+
+    _lock = threading.Lock()
+    _sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+    alarms: List[str] = []
+
+    @staticmethod
+    def start():
+        """Start tracemalloc if profiling is enabled."""
+        if ENABLED and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+
+    @staticmethod
+    @contextmanager
+    def track(page: str):
+        """Measure one rerun of a page. A no-op unless profiling is enabled."""
+        if not ENABLED:
+            yield
+            return
+        MemoryProfiler.start()
+        ctx = get_script_run_ctx()
+        session_id = ctx.session_id if ctx else "unknown"
+        before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            # other sessions allocate concurrently, so this is an upper bound
+            retained = tracemalloc.get_traced_memory()[0] - before
+            state_bytes = _deep_sizeof(dict(st.session_state), set())
+            MemoryProfiler._record(session_id, page, retained, state_bytes,
+                                   time.perf_counter() - started)
+
+    @staticmethod
+    def _record(session_id: str, page: str, retained: int, state_bytes: int, seconds: float):
+        with MemoryProfiler._lock:
+            session = MemoryProfiler._sessions.pop(session_id, None) or SessionMemory()
+            MemoryProfiler._sessions[session_id] = session
+            while len(MemoryProfiler._sessions) > MAX_SESSIONS:
+                MemoryProfiler._sessions.popitem(last=False)
+
+            stats = session.pages.setdefault(page, PageMemory())
+            stats.reruns += 1
+            stats.last_retained_bytes = retained
+            stats.total_retained_bytes += retained
+            stats.last_seconds = seconds
+            session.session_state_bytes = state_bytes
+            session.last_seen = time.time()
+
+            if state_bytes > BUDGET_BYTES and not session.over_budget:
+                message = (f"Session {session_id} holds {state_bytes / 1024 / 1024:.1f} MB "
+                           f"of session state after {page} (budget "
+                           f"{BUDGET_BYTES / 1024 / 1024:.0f} MB)")
+                logger.warning(message)
+                MemoryProfiler.alarms.append(message)
+                del MemoryProfiler.alarms[:-MAX_ALARMS]
+            session.over_budget = state_bytes > BUDGET_BYTES
+
+    @staticmethod
+    def sessions() -> Dict[str, SessionMemory]:
+        """Copy of the per-session figures, most recently seen last."""
+        with MemoryProfiler._lock:
+            return dict(MemoryProfiler._sessions)
+
+    @staticmethod
+    def top_allocation_sites(limit: int = 15) -> list:
+        """Largest live allocation sites grouped by source line."""
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        return snapshot.statistics("lineno")[:limit]
+
+    @staticmethod
+    def dump_snapshot(path: Optional[str] = None) -> Optional[str]:
+        """Write a tracemalloc snapshot for offline comparison; returns its path."""
+        if not tracemalloc.is_tracing():
+            return None
+        path = path or f"memory_snapshot_{int(time.time())}.tracemalloc"
+        tracemalloc.take_snapshot().dump(path)
+        return path
@@ -1,38 +1,106 @@
 """Session management utilities."""
+import os
 import streamlit as st
+import streamlit.components.v1 as components
 from typing import Optional
 from domain import User
+from .tokens import get_token_store, SESSION_TTL
 
 
 class SessionManager:
-    """Manages user sessions via Streamlit session state."""
+    """Manages user sessions via Streamlit session state and a session cookie."""
     
     SESSION_USER_KEY = "current_user"
     SESSION_AUTHENTICATED_KEY = "authenticated"
+    SESSION_TOKEN_KEY = "session_token"
+    PENDING_COOKIE_KEY = "pending_session_cookie"
+    COOKIE_NAME = "caloriecam_session"
+    ADMIN_USERS = {
+        name.strip() for name in os.getenv("CALORIE_ADMIN_USERS", "").split(",") if name.strip()
+    }
     
     @staticmethod
     def set_user(user: User):
         """Set current logged-in user."""
         st.session_state[SessionManager.SESSION_USER_KEY] = user
         st.session_state[SessionManager.SESSION_AUTHENTICATED_KEY] = True
+        token = st.session_state.get(SessionManager.SESSION_TOKEN_KEY)
+        if token:
+            get_token_store().refresh(token, user)
+    
+    @staticmethod
+    def login(user: User):
+        """Set the user and issue a persistent session token for this browser."""
+        SessionManager.set_user(user)
+        token = get_token_store().issue(user)
+        st.session_state[SessionManager.SESSION_TOKEN_KEY] = token
+        st.session_state[SessionManager.PENDING_COOKIE_KEY] = token
     
     @staticmethod
     def get_user() -> Optional[User]:
         """Get current logged-in user."""
+        SessionManager._restore()
         return st.session_state.get(SessionManager.SESSION_USER_KEY)
     
     @staticmethod
     def is_authenticated() -> bool:
         """Check if user is authenticated."""
+        SessionManager._restore()
         return st.session_state.get(SessionManager.SESSION_AUTHENTICATED_KEY, False)
     
+    @staticmethod
+    def is_admin() -> bool:
+        """Check if the current user is listed in CALORIE_ADMIN_USERS."""
+        user = SessionManager.get_user()
+        return bool(user) and user.username in SessionManager.ADMIN_USERS
+    
     @staticmethod
     def logout():
-        """Clear user session."""
-        if SessionManager.SESSION_USER_KEY in st.session_state:
-            del st.session_state[SessionManager.SESSION_USER_KEY]
-        if SessionManager.SESSION_AUTHENTICATED_KEY in st.session_state:
-            del st.session_state[SessionManager.SESSION_AUTHENTICATED_KEY]
+        """Clear user session and revoke its token."""
+        token = st.session_state.get(SessionManager.SESSION_TOKEN_KEY)
+        if token:
+            get_token_store().revoke(token)
+        for key in (
+            SessionManager.SESSION_USER_KEY,
+            SessionManager.SESSION_AUTHENTICATED_KEY,
+            SessionManager.SESSION_TOKEN_KEY
+        ):
+            if key in st.session_state:
+                del st.session_state[key]
+        st.session_state[SessionManager.PENDING_COOKIE_KEY] = ""
+    
+    @staticmethod
+    def _restore():
+        """Write any pending cookie change and log in from the cookie if needed."""
+        pending = st.session_state.pop(SessionManager.PENDING_COOKIE_KEY, None)
+        if pending is not None:
+            SessionManager._write_cookie(pending)
+            return
+        
+        if st.session_state.get(SessionManager.SESSION_AUTHENTICATED_KEY):
+            return
+        token = st.context.cookies.get(SessionManager.COOKIE_NAME)
+        if not token:
+            return
+        user = get_token_store().validate(token)
+        if user:
+            st.session_state[SessionManager.SESSION_TOKEN_KEY] = token
+            SessionManager.set_user(user)
+    
+    @staticmethod
+    def _write_cookie(token: str):
+        """Set (or clear, for an empty token) the session cookie in the browser."""
+        max_age = int(SESSION_TTL.total_seconds()) if token else 0
+        components.html(
+            f"""
+            <script>
+            const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+            window.parent.document.cookie =
+                "{SessionManager.COOKIE_NAME}={token}; path=/; max-age={max_age}; SameSite=Strict" + secure;
+            </script>
+            """,
+            height=0
+        )
     
     @staticmethod
     def require_authentication():
@@ -0,0 +1,42 @@
+"""Per-section rerun timing for Streamlit pages."""
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+TIMINGS_KEY = "section_timings"
+SHOW_TIMINGS = os.getenv("CALORIE_SHOW_TIMINGS", "").lower() in ("1", "true", "yes")
+HISTORY = 50  # reruns remembered per section
+
+
+@contextmanager
+def timed_section(name: str):
+    """
+    Record how long a page section takes to run in this session.
+
+    Works as a context manager or as a decorator, so it can sit under
+    @st.fragment and time each fragment rerun on its own.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings = st.session_state.setdefault(TIMINGS_KEY, {})
+        timings.setdefault(name, deque(maxlen=HISTORY)).append(elapsed)
+
+
+def show_timings():
+    """Show recent section timings in the sidebar when CALORIE_SHOW_TIMINGS is set."""
+    if not SHOW_TIMINGS:
+        return
+    timings = st.session_state.get(TIMINGS_KEY, {})
+    with st.sidebar.expander("Rerun timings"):
+        for name, samples in timings.items():
+            average = sum(samples) / len(samples)
+            st.write(
+                f"**{name}**: last {samples[-1] * 1000:.0f} ms, "
+                f"avg {average * 1000:.0f} ms over {len(samples)} runs"
+            )
@@ -0,0 +1,151 @@
+"""Persistent, signed session tokens."""
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from database import CoherentCache, DatabaseSchema, get_database
+from domain import User
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = timedelta(days=int(os.getenv("SESSION_TTL_DAYS", "14")))
+CACHE_SIZE = 1024
+
+
+class SessionTokenStore:
+    """Issues, validates and revokes tokens backed by the sessions table.
+
+    A token looks like "<session id>.<user id>.<expiry>.<signature>". The HMAC
+    signature and expiry are checked before any database access, and tokens that
+    passed a database check are served from an in-memory LRU until the user's
+    sessions or profile change, in this process or any other.
+    """
+
+    def __init__(self, secret: Optional[str] = None):
+        secret = secret or os.getenv("SESSION_SECRET")
+        if not secret:
+            logger.info("SESSION_SECRET is not set; signing session tokens with the database's stored secret")
+            secret = self._stored_secret()
+        self._secret = secret.encode("utf-8")
+        self._cache = CoherentCache("profile", CACHE_SIZE)
+
+    @staticmethod
+    def _stored_secret() -> str:
+        """The secret kept in the database, generated by whichever process needs it first."""
+        with get_database().transaction() as cursor:
+            cursor.execute(DatabaseSchema.APP_SECRETS_TABLE)
+            cursor.execute(
+                "INSERT OR IGNORE INTO app_secrets (name, value) VALUES ('session_secret', ?)",
+                (secrets.token_hex(32),)
+            )
+            return cursor.execute("SELECT value FROM app_secrets WHERE name = 'session_secret'").fetchone()[0]
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self._secret, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def _parse(self, token: str) -> Optional[Tuple[str, int, int]]:
+        """Return (session id, user id, expiry) for a well-signed, unexpired token."""
+        try:
+            session_id, user_id, expires, signature = token.split(".")
+            expires_ts = int(expires)
+            user_id = int(user_id)
+        except (AttributeError, ValueError):
+            return None
+        payload = f"{session_id}.{user_id}.{expires_ts}"
+        if not hmac.compare_digest(self._sign(payload), signature):
+            return None
+        if expires_ts < time.time():
+            return None
+        return session_id, user_id, expires_ts
+
+    def issue(self, user: User) -> str:
+        """Create a session row for the user and return its token."""
+        session_id = secrets.token_urlsafe(24)
+        expires_at = datetime.now() + SESSION_TTL
+        expires_ts = int(expires_at.timestamp())
+        get_database().execute(
+            "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
+            (session_id, user.id, expires_at)
+        )
+        token = f"{session_id}.{user.id}.{expires_ts}.{self._sign(f'{session_id}.{user.id}.{expires_ts}')}"
+        self._cache.put(user.id, token, user)
+        return token
+
+    def validate(self, token: str) -> Optional[User]:
+        """Return the user for a valid token, or None."""
+        parsed = self._parse(token)
+        if parsed is None:
+            return None
+        session_id, user_id, _ = parsed
+        return self._cache.load(user_id, token, lambda: self._session_user(session_id, user_id))
+
+    def _session_user(self, session_id: str, user_id: int) -> Optional[User]:
+        """The user of a live session, or None if it is revoked, expired or unknown."""
+        row = get_database().fetch_one(
+            """
+            SELECT u.id, u.username, u.email, u.password_hash, u.created_at, u.updated_at
+            FROM sessions s JOIN users u ON u.id = s.user_id
+            WHERE s.id = ? AND s.user_id = ? AND s.revoked_at IS NULL AND s.expires_at > ?
+            """,
+            (session_id, user_id, datetime.now())
+        )
+        if row is None:
+            return None
+        return User(
+            id=row[0],
+            username=row[1],
+            email=row[2],
+            password_hash=row[3],
+            created_at=row[4],
+            updated_at=row[5]
+        )
+
+    def refresh(self, token: str, user: User):
+        """Replace the cached user for a token after a profile change."""
+        if self._cache.get(token) is not None:
+            self._cache.put(user.id, token, user)
+
+    def revoke(self, token: str):
+        """Revoke a single session, e.g. on logout."""
+        self._cache.discard(token)
+        parsed = self._parse(token)
+        if parsed is None:
+            return
+        get_database().execute(
+            "UPDATE sessions SET revoked_at = ? WHERE id = ?",
+            (datetime.now(), parsed[0])
+        )
+
+    def revoke_user(self, user_id: int, keep_token: Optional[str] = None):
+        """Revoke every session of a user except, optionally, the current one."""
+        keep = self._parse(keep_token) if keep_token else None
+        get_database().execute(
+            "UPDATE sessions SET revoked_at = ? WHERE user_id = ? AND revoked_at IS NULL AND id != ?",
+            (datetime.now(), user_id, keep[0] if keep else "")
+        )
+        # the update bumps the user's version, so every process drops the revoked tokens
+
+    def purge_expired(self) -> int:
+        """Delete expired and revoked session rows."""
+        cursor = get_database().execute(
+            "DELETE FROM sessions WHERE expires_at <= ? OR revoked_at IS NOT NULL",
+            (datetime.now(),)
+        )
+        return cursor.rowcount
+
+
+# Global token store instance
+_store: Optional[SessionTokenStore] = None
+
+
+def get_token_store() -> SessionTokenStore:
+    """Get global session token store."""
+    global _store
+    if _store is None:
+        _store = SessionTokenStore()
+    return _store
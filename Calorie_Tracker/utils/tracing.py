@@ -0,0 +1,239 @@
+"""Lightweight tracing spans written to a local JSONL file.
+
+Enable with CALORIE_TRACING=1; spans are appended to CALORIE_TRACE_FILE
+(default traces.jsonl) as they finish. The current span lives in a
+contextvar, so nested spans share a trace id. Work handed to another thread
+keeps the trace if it is wrapped with bind() before being submitted.
+The Traces page reads the file back and shows where each trace spent its time.
+"""
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+ENABLED = os.getenv("CALORIE_TRACING", "").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("CALORIE_TRACE_FILE", "traces.jsonl")
+MAX_TRACE_FILE_BYTES = 50 * 1024 * 1024  # rotated to <file>.1 beyond this
+
+
+@dataclass
+class Span:
+    """One timed operation; start is wall-clock seconds, duration is seconds."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start: float = 0.0
+    duration: float = 0.0
+    thread: str = ""
+    error: Optional[str] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    def set(self, **attributes):
+        """Attach attributes, e.g. sizes or ids known only after the span started."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Span":
+        return cls(**data)
+
+
+class _NoopSpan:
+    """Stands in for a Span while tracing is off."""
+
+    trace_id = None
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class JsonlExporter:
+    """Appends finished spans to a JSONL file, one object per line."""
+
+    def __init__(self, path: str = TRACE_FILE, max_bytes: int = MAX_TRACE_FILE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+            except OSError:
+                pass  # no file yet
+            with open(self.path, "a", encoding="utf-8") as trace_file:
+                trace_file.write(line)
+
+
+_exporter: Optional[JsonlExporter] = None
+
+
+def get_exporter() -> JsonlExporter:
+    """Get the process-wide exporter."""
+    global _exporter
+    if _exporter is None:
+        _exporter = JsonlExporter()
+    return _exporter
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span in this context, if any."""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a span of the current trace, or of a new trace at top level.
+
+    Yields the Span so attributes can be added with span.set(...). Exceptions
+    are recorded on the span and re-raised. Like timed_section it also works
+    as a decorator. Does nothing while tracing is off.
+    """
+    if not ENABLED:
+        yield _NOOP
+        return
+    parent = _current.get()
+    current = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(8),
+        span_id=secrets.token_hex(4),
+        parent_id=parent.span_id if parent else None,
+        start=time.time(),
+        thread=threading.current_thread().name,
+        attributes=attributes
+    )
+    token = _current.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:  # not BaseException: st.rerun() and st.stop() are not errors
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current.reset(token)
+        get_exporter().export(current)
+
+
+def bind(function: Callable) -> Callable:
+    """Wrap a callable so that, on whatever thread runs it, its spans join the caller's trace."""
+    parent = _current.get()
+    if parent is None:
+        return function
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+def load_traces(path: str = TRACE_FILE, limit: int = 100) -> "OrderedDict[str, List[Span]]":
+    """The most recent traces in the file, oldest first, each as its spans in start order."""
+    traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+    try:
+        with open(path, encoding="utf-8") as trace_file:
+            for line in trace_file:
+                try:
+                    item = Span.from_dict(json.loads(line))
+                except (ValueError, TypeError):
+                    continue  # a line cut short by a crash
+                traces.setdefault(item.trace_id, []).append(item)
+                traces.move_to_end(item.trace_id)
+                if len(traces) > limit:
+                    traces.popitem(last=False)
+    except FileNotFoundError:
+        pass
+    for spans in traces.values():
+        spans.sort(key=lambda item: item.start)
+    return traces
+
+
+def trace_duration(spans: List[Span]) -> float:
+    """Wall time from the first span's start to the last span's end."""
+    return max(item.start + item.duration for item in spans) - min(item.start for item in spans)
+
+
+def flame_rows(spans: List[Span]) -> List[dict]:
+    """
+    A trace as rows in call-tree order with depth, offset and self time.
+
+    Self time is a span's duration minus its children's, so the rows show
+    where time went rather than counting nested time twice. Spans whose
+    parent is not in the file (e.g. still open) are shown at the top level.
+    """
+    ids = {item.span_id for item in spans}
+    children: Dict[Optional[str], List[Span]] = defaultdict(list)
+    for item in spans:
+        children[item.parent_id if item.parent_id in ids else None].append(item)
+    trace_start = min(item.start for item in spans)
+
+    rows = []
+
+    def visit(item: Span, depth: int):
+        kids = children.get(item.span_id, [])
+        rows.append({
+            "name": item.name,
+            "depth": depth,
+            "offset": item.start - trace_start,
+            "duration": item.duration,
+            "self": max(0.0, item.duration - sum(kid.duration for kid in kids)),
+            "thread": item.thread,
+            "error": item.error,
+            "attributes": item.attributes,
+        })
+        for kid in kids:
+            visit(kid, depth + 1)
+
+    for root in children[None]:
+        visit(root, 0)
+    return rows
+
+
+def summarize_by_name(traces: Dict[str, List[Span]]) -> List[dict]:
+    """Span count, total and p50/p95 duration per span name, slowest total first."""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    for spans in traces.values():
+        for item in spans:
+            durations[item.name].append(item.duration)
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append({
+            "name": name,
+            "count": len(values),
+            "total": sum(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        })
+    rows.sort(key=lambda row: row["total"], reverse=True)
+    return rows